@@ -0,0 +1,310 @@
+"""
+A local stand-in for a BGS-Tally API server, implementing the `discovery`, `activities` and `events` endpoints as
+described by bgstally/api.py. Latency, error rate and the discovery document can be configured, and every request is
+recorded so that a harness can measure client behaviour. Used by bench_api_server.py, and can also be run on its own
+to point a development copy of BGS-Tally at.
+
+Usage: python benchmarks/apiserver.py [--port 8080] [--latency 50] [--jitter 10] [--error-rate 0.05] [--discovery file.json]
+"""
+import argparse
+import gzip
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter, sleep
+
+import benchutils
+from bgstally.api import (ENDPOINT_ACTIVITIES, ENDPOINT_DISCOVERY, ENDPOINT_EVENTS, EVENTS_FILTER_DEFAULTS, HEADER_APIKEY,
+                          HEADER_APIVERSION, HTTP_STATUS_CONFLICT)
+
+DISCOVERY_DEFAULT = {
+    'name': "BGS-Tally Benchmark Server",
+    'description': "Local stand-in API server for benchmarking BGS-Tally.",
+    'endpoints': {
+        ENDPOINT_ACTIVITIES: {'path': ENDPOINT_ACTIVITIES, 'min_period': 60, 'delta': True, 'compression': "gzip"},
+        ENDPOINT_EVENTS: {'path': ENDPOINT_EVENTS, 'min_period': 0, 'max_batch': 100, 'compression': "gzip"}
+    },
+    'events': EVENTS_FILTER_DEFAULTS
+}
+
+
+class APIServer:
+    """
+    A local API server running on a background thread. Every request is recorded in `requests`, as a dict containing
+    the endpoint, method, response status, size on the wire, decoded size, number of events and the time it completed.
+    """
+
+    def __init__(self, port:int = 0, latency_ms:float = 0, jitter_ms:float = 0, error_rate:float = 0, error_status:int = 500,
+                 discovery:dict|None = None, apikey:str|None = None, seed:int|None = None):
+        """Create the server. It doesn't start handling requests until start() is called.
+
+        Args:
+            port (int, optional): The port to listen on, 0 to pick a free port. Defaults to 0.
+            latency_ms (float, optional): Delay added to every response. Defaults to 0.
+            jitter_ms (float, optional): Maximum random delay added on top of the latency. Defaults to 0.
+            error_rate (float, optional): Fraction of activities and events requests that fail. Defaults to 0.
+            error_status (int, optional): HTTP status returned for a failed request. Defaults to 500.
+            discovery (dict | None, optional): The discovery document, None for the default. Defaults to None.
+            apikey (str | None, optional): The API key clients must send, None to accept any key. Defaults to None.
+            seed (int | None, optional): Random seed, for repeatable error injection. Defaults to None.
+        """
+        self.latency_ms:float = latency_ms
+        self.jitter_ms:float = jitter_ms
+        self.error_rate:float = error_rate
+        self.error_status:int = error_status
+        self.discovery:dict = discovery if discovery is not None else DISCOVERY_DEFAULT
+        self.apikey:str|None = apikey
+        self.random:random.Random = random.Random(seed)
+
+        # Called with (list of events, time accepted) for every events request that succeeds
+        self.on_events:callable = None
+
+        # All the following are protected by self.lock
+        self.lock:Lock = Lock()
+        self.requests:list[dict] = []
+        self.activity_sequence:int|None = None # Sequence number of the last activity we accepted, used to validate deltas
+
+        self.httpd:ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", port), APIRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api_server = self
+        self.thread:Thread|None = None
+
+
+    @property
+    def url(self) -> str:
+        """
+        The base URL of the server, as entered into the BGS-Tally API settings
+        """
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+
+    def start(self):
+        """
+        Start handling requests on a background thread
+        """
+        self.thread = Thread(target=self.httpd.serve_forever, name="BGSTally Benchmark API Server")
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stop handling requests
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def get_requests(self) -> list[dict]:
+        """
+        Get a copy of all requests recorded so far
+        """
+        with self.lock:
+            return list(self.requests)
+
+
+    def record(self, request:dict):
+        """
+        Record a completed request
+        """
+        with self.lock:
+            self.requests.append(request)
+
+
+    def delay(self):
+        """
+        Wait for the configured latency, plus jitter
+        """
+        delay_ms:float = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay_ms > 0: sleep(delay_ms / 1000)
+
+
+    def should_fail(self) -> bool:
+        """
+        Decide whether to inject an error into this request
+        """
+        with self.lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles a single request to the API server
+    """
+    protocol_version = "HTTP/1.1" # Keep-alive, as used by the real client
+
+    def do_GET(self):
+        if self._endpoint() != ENDPOINT_DISCOVERY:
+            self._respond(404)
+            return
+
+        self.server.api_server.delay()
+        self._respond(200, self.server.api_server.discovery, {'endpoint': ENDPOINT_DISCOVERY})
+
+
+    def do_POST(self):
+        if self._endpoint() != self._endpoint_path(ENDPOINT_EVENTS):
+            self._respond(404)
+            return
+
+        body:bytes|None = self._read_body()
+        if body is None: return
+
+        try:
+            events:list = json.loads(body)
+            if not isinstance(events, list): raise ValueError("Events payload is not a list")
+        except ValueError:
+            self._respond(400, None, {'endpoint': ENDPOINT_EVENTS, 'decoded_bytes': len(body)})
+            return
+
+        api_server:APIServer = self.server.api_server
+        record:dict = {'endpoint': ENDPOINT_EVENTS, 'decoded_bytes': len(body), 'events': len(events)}
+        api_server.delay()
+
+        if api_server.should_fail():
+            self._respond(api_server.error_status, None, record)
+            return
+
+        if api_server.on_events is not None: api_server.on_events(events, perf_counter())
+        self._respond(200, None, record)
+
+
+    def do_PUT(self):
+        self._activities()
+
+
+    def do_PATCH(self):
+        self._activities()
+
+
+    def log_message(self, format, *args):
+        # Silence the default logging of every request to stderr
+        pass
+
+
+    def _activities(self):
+        """
+        Handle a full activity (PUT) or activity delta (PATCH)
+        """
+        if self._endpoint() != self._endpoint_path(ENDPOINT_ACTIVITIES):
+            self._respond(404)
+            return
+
+        body:bytes|None = self._read_body()
+        if body is None: return
+
+        try:
+            activity:dict = json.loads(body)
+            if not isinstance(activity, dict): raise ValueError("Activity payload is not an object")
+        except ValueError:
+            self._respond(400, None, {'endpoint': ENDPOINT_ACTIVITIES, 'decoded_bytes': len(body)})
+            return
+
+        api_server:APIServer = self.server.api_server
+        record:dict = {'endpoint': ENDPOINT_ACTIVITIES, 'decoded_bytes': len(body), 'systems': len(activity.get('systems', []))}
+        api_server.delay()
+
+        if api_server.should_fail():
+            self._respond(api_server.error_status, None, record)
+            return
+
+        status:int = 200
+        with api_server.lock:
+            if self.command == "PATCH" and activity.get('basesequence') != api_server.activity_sequence:
+                # We don't hold the activity this delta is based on, so ask for a full snapshot
+                status = HTTP_STATUS_CONFLICT
+            else:
+                api_server.activity_sequence = activity.get('sequence')
+
+        self._respond(status, None, record)
+
+
+    def _endpoint(self) -> str:
+        """
+        Get the endpoint path of this request, without the leading slash or any query
+        """
+        return self.path.split("?", 1)[0].lstrip("/")
+
+
+    def _endpoint_path(self, endpoint:str) -> str:
+        """
+        Get the path the discovery document gives for an endpoint
+        """
+        return self.server.api_server.discovery.get('endpoints', {}).get(endpoint, {}).get('path', endpoint)
+
+
+    def _read_body(self) -> bytes|None:
+        """
+        Read and check the headers and body of the request, decompressing the body if needed. Responds with an error
+        and returns None if the request is invalid.
+        """
+        length:int = int(self.headers.get('Content-Length', 0))
+        body:bytes = self.rfile.read(length)
+        self.wire_bytes:int = length
+
+        api_server:APIServer = self.server.api_server
+        if api_server.apikey is not None and self.headers.get(HEADER_APIKEY) != api_server.apikey:
+            self._respond(401)
+            return None
+
+        if self.headers.get(HEADER_APIVERSION) is None:
+            self._respond(400)
+            return None
+
+        if self.headers.get('Content-Encoding') == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError):
+                self._respond(400)
+                return None
+
+        return body
+
+
+    def _respond(self, status:int, payload:dict|None = None, record:dict|None = None):
+        """
+        Send a response, and record the request if required
+        """
+        body:bytes = json.dumps(payload).encode('utf-8') if payload is not None else b""
+
+        self.send_response(status)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        if record is not None:
+            self.server.api_server.record(record | {'method': self.command, 'status': status,
+                                                    'wire_bytes': getattr(self, 'wire_bytes', 0), 'time': perf_counter()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in BGS-Tally API server")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on")
+    parser.add_argument('--latency', type=float, default=0, help="Latency added to every response, in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Maximum random latency added on top, in ms")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of activities and events requests that fail")
+    parser.add_argument('--discovery', help="JSON file containing the discovery document to serve")
+    parser.add_argument('--apikey', help="API key that clients must send")
+    args = parser.parse_args()
+
+    discovery:dict|None = None
+    if args.discovery:
+        with open(args.discovery) as discovery_file:
+            discovery = json.load(discovery_file)
+
+    api_server:APIServer = APIServer(args.port, args.latency, args.jitter, args.error_rate, discovery=discovery, apikey=args.apikey)
+    api_server.on_events = lambda events, accepted: print(f"Received {len(events)} events")
+    print(f"Serving BGS-Tally API at {api_server.url}, press Ctrl+C to stop")
+
+    try:
+        api_server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    api_server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark building the API activity payload for large activities. Compares a full rebuild of every system against an
+incremental build where a single system has changed since the previous build, which is the usual case when a journal
+event updates activity.
+
+Usage: python benchmarks/bench_api_activity.py [--systems 100,500,1000] [--iterations 50]
+"""
+import argparse
+
+import benchutils
+from bgstally.activity import Activity
+from bgstally.apimanager import APIManager
+from bgstally.tick import Tick
+
+FACTIONS_PER_SYSTEM = 7
+CMDR = "Benchmark Cmdr"
+
+
+def make_activity(bgstally, num_systems:int) -> Activity:
+    """
+    Create an activity containing the given number of systems, each with every type of activity
+    """
+    activity:Activity = Activity(bgstally, Tick(bgstally))
+
+    for i in range(num_systems):
+        system_address:str = str(1000000 + i)
+        factions:dict = {}
+        for f in range(FACTIONS_PER_SYSTEM):
+            faction_name:str = f"Faction {f} of System {i}"
+            factions[faction_name] = activity._get_new_faction_data(faction_name, "None", True)
+
+        system:dict = activity._get_new_system_data(f"System {i}", system_address, factions)
+        system['TWKills'] = activity._get_new_tw_kills_data(True)
+        system['TWSandR'] = activity._get_new_tw_sandr_data(True)
+        system['Totals'] = activity._calculate_system_totals(system)
+        activity._add_system(system)
+
+    activity.recalculate_zero_activity()
+    return activity
+
+
+def make_api_manager(bgstally) -> APIManager:
+    """
+    Create an API manager without loading or creating any APIs, so no worker threads or network requests are started
+    """
+    api_manager:APIManager = APIManager.__new__(APIManager)
+    api_manager.bgstally = bgstally
+    api_manager.apis = []
+    api_manager.api_systems_cache = {}
+    api_manager.api_systems_activity = None
+    api_manager.api_systems_version = 0
+    return api_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark building the API activity payload")
+    parser.add_argument('--systems', default="100,500,1000", help="Comma-separated list of system counts to test")
+    parser.add_argument('--iterations', type=int, default=50, help="Number of builds to time for each test")
+    args = parser.parse_args()
+
+    bgstally = benchutils.make_bgstally()
+    api_manager:APIManager = make_api_manager(bgstally)
+
+    print(f"{'systems':>8} {'full (ms)':>12} {'incremental (ms)':>18} {'speedup':>9}")
+
+    for num_systems in [int(n) for n in args.systems.split(",")]:
+        activity:Activity = make_activity(bgstally, num_systems)
+        system_addresses:list[str] = list(activity.systems.keys())
+        touched:int = 0
+
+        def full_build():
+            api_manager.api_systems_cache.clear()
+            api_manager._build_api_activity(activity, CMDR)
+
+        def incremental_build():
+            # Simulate a journal event updating a single system, then rebuild
+            nonlocal touched
+            system_address:str = system_addresses[touched % num_systems]
+            touched += 1
+            next(iter(activity.systems[system_address]['Factions'].values()))['Bounties'] += 1
+            activity.system_changed(system_address)
+            api_manager._build_api_activity(activity, CMDR)
+
+        full_s:float = benchutils.time_it(full_build, args.iterations)
+        api_manager._build_api_activity(activity, CMDR) # Warm the cache
+        incremental_s:float = benchutils.time_it(incremental_build, args.iterations)
+
+        # Check that the cached result matches a full rebuild
+        incremental_result:dict = api_manager._build_api_activity(activity, CMDR)
+        api_manager.api_systems_cache.clear()
+        full_result:dict = api_manager._build_api_activity(activity, CMDR)
+        if incremental_result['systems'] != full_result['systems']:
+            raise AssertionError(f"Incremental build differs from full build with {num_systems} systems")
+
+        print(f"{num_systems:>8} {full_s * 1000:>12.3f} {incremental_s * 1000:>18.3f} {full_s / incremental_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
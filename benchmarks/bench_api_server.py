@@ -0,0 +1,230 @@
+"""
+Load test the API client against the local stand-in API server in apiserver.py. Drives a real APIManager, with its
+scheduler and request manager, with a synthetic journal stream and reports event throughput, end-to-end latency from
+the journal event to the server accepting it, payload sizes, and any events lost. A full activity is sent before the
+stream and an activity delta after it, to measure activity payloads.
+
+Usage: python benchmarks/bench_api_server.py [--events 5000] [--rate 0] [--latency 20] [--jitter 0] [--error-rate 0]
+                                             [--systems 100] [--discovery file.json] [--timeout 60]
+"""
+import argparse
+import json
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from threading import Lock
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+import benchutils
+from apiserver import APIServer
+from bench_api_activity import make_activity
+from bench_event_filter import make_events
+from bgstally.activity import Activity
+from bgstally.api import API, API_VERSION, ENDPOINT_ACTIVITIES, ENDPOINT_DISCOVERY, ENDPOINT_EVENTS, EVENTS_FILTER_DEFAULTS
+from bgstally.apimanager import FILENAME, APIManager
+from bgstally.constants import FOLDER_OTHER_DATA
+from bgstally.requestmanager import RequestManager
+from bgstally.scheduler import Scheduler
+
+CMDR = "Benchmark Cmdr"
+APIKEY = "benchmark-key"
+SYSTEMS_CHANGED_FRACTION = 0.05 # Fraction of systems changed between the full activity and the delta
+TIME_POLL_S = 0.05
+
+
+class EventTracker:
+    """
+    Tracks events from the time they are passed to the API manager until the server accepts them
+    """
+
+    def __init__(self):
+        self.lock:Lock = Lock()
+        self.sent:dict[int, float] = {}      # key = event id, value = time passed to the API manager
+        self.received:dict[int, float] = {}  # key = event id, value = time accepted by the server
+        self.duplicates:int = 0
+
+
+    def event_sent(self, event_id:int):
+        with self.lock:
+            self.sent[event_id] = perf_counter()
+
+
+    def events_received(self, events:list, accepted:float):
+        with self.lock:
+            for event in events:
+                event_id:int|None = event.get('BenchmarkID')
+                if event_id is None: continue
+
+                if event_id in self.received:
+                    self.duplicates += 1
+                else:
+                    self.received[event_id] = accepted
+
+
+    def all_received(self) -> bool:
+        with self.lock:
+            return len(self.received) >= len(self.sent)
+
+
+    def get_latencies(self) -> list[float]:
+        with self.lock:
+            return [self.received[event_id] - sent for event_id, sent in self.sent.items() if event_id in self.received]
+
+
+def write_apis_file(plugin_dir:str, api_server:APIServer):
+    """
+    Write the API settings, so the API manager loads an API that is already set up and approved for our server
+    """
+    mkdir(path.join(plugin_dir, FOLDER_OTHER_DATA))
+    api_data:dict = {'url': api_server.url, 'key': APIKEY, 'activities_enabled': True, 'events_enabled': True, 'user_approved': True,
+                     'name': api_server.discovery.get('name', ""), 'version': API_VERSION, 'description': api_server.discovery.get('description', ""),
+                     'endpoints': api_server.discovery.get('endpoints', {}), 'events': api_server.discovery.get('events', EVENTS_FILTER_DEFAULTS)}
+
+    with open(path.join(plugin_dir, FOLDER_OTHER_DATA, FILENAME), 'w') as apis_file:
+        json.dump([api_data], apis_file)
+
+
+def make_bgstally(plugin_dir:str) -> SimpleNamespace:
+    """
+    Create a stand-in BGSTally object with a real scheduler and request manager
+    """
+    bgstally:SimpleNamespace = benchutils.make_bgstally(plugin_dir=plugin_dir, version="benchmark",
+                                                        config=SimpleNamespace(requests=lambda: {}),
+                                                        market=SimpleNamespace(available=lambda market_id: False))
+    bgstally.ui.update_plugin_frame = lambda: None
+    bgstally.scheduler = Scheduler(bgstally)
+    bgstally.request_manager = RequestManager(bgstally)
+    return bgstally
+
+
+def wait_for(condition:callable, timeout_s:float) -> bool:
+    """
+    Wait until a condition is true, or the timeout passes. Returns whether the condition became true.
+    """
+    end:float = perf_counter() + timeout_s
+    while perf_counter() < end:
+        if condition(): return True
+        sleep(TIME_POLL_S)
+
+    return condition()
+
+
+def count_requests(api_server:APIServer, endpoint:str) -> int:
+    """
+    Count the requests to an endpoint that the server has completed
+    """
+    return len([request for request in api_server.get_requests() if request['endpoint'] == endpoint])
+
+
+def send_activity(api_manager:APIManager, api_server:APIServer, activity:Activity, timeout_s:float):
+    """
+    Send an activity to the server straight away, rather than waiting for the next scheduled send
+    """
+    sent:int = count_requests(api_server, ENDPOINT_ACTIVITIES)
+    api_manager.send_activity(activity, CMDR)
+    for api in api_manager.apis: api.activities_job.wake()
+    wait_for(lambda: count_requests(api_server, ENDPOINT_ACTIVITIES) > sent, timeout_s)
+
+
+def report_requests(requests:list[dict]):
+    """
+    Print a summary of the requests received by the server, for each endpoint and method
+    """
+    print(f"{'endpoint':<12} {'method':<7} {'count':>6} {'ok':>6} {'wire avg (B)':>13} {'wire max (B)':>13} {'decoded avg (B)':>16} {'ratio':>6}")
+
+    for endpoint in [ENDPOINT_DISCOVERY, ENDPOINT_ACTIVITIES, ENDPOINT_EVENTS]:
+        for method in sorted({request['method'] for request in requests if request['endpoint'] == endpoint}):
+            matching:list[dict] = [request for request in requests if request['endpoint'] == endpoint and request['method'] == method]
+            ok:int = len([request for request in matching if request['status'] == 200])
+            wire:list[int] = [request['wire_bytes'] for request in matching]
+            decoded:list[int] = [request.get('decoded_bytes', 0) for request in matching]
+            ratio:float = sum(decoded) / sum(wire) if sum(wire) else 0
+
+            print(f"{endpoint:<12} {method:<7} {len(matching):>6} {ok:>6} {sum(wire) / len(matching):>13.0f} {max(wire):>13} "
+                  f"{sum(decoded) / len(matching):>16.0f} {ratio:>5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API client against a local API server")
+    parser.add_argument('--events', type=int, default=5000, help="Number of journal events in the stream")
+    parser.add_argument('--rate', type=float, default=0, help="Journal events per second, 0 for as fast as possible")
+    parser.add_argument('--latency', type=float, default=20, help="Server latency, in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="Maximum random server latency added on top, in ms")
+    parser.add_argument('--error-rate', type=float, default=0, help="Fraction of activities and events requests that fail")
+    parser.add_argument('--systems', type=int, default=100, help="Number of systems in the activity")
+    parser.add_argument('--discovery', help="JSON file containing the discovery document for the server to use")
+    parser.add_argument('--timeout', type=float, default=60, help="Longest to wait for all events to arrive, in seconds")
+    args = parser.parse_args()
+
+    discovery:dict|None = None
+    if args.discovery:
+        with open(args.discovery) as discovery_file:
+            discovery = json.load(discovery_file)
+
+    api_server:APIServer = APIServer(latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+                                     discovery=discovery, apikey=APIKEY, seed=1)
+    tracker:EventTracker = EventTracker()
+    api_server.on_events = tracker.events_received
+    api_server.start()
+
+    with TemporaryDirectory(ignore_cleanup_errors=True) as plugin_dir:
+        write_apis_file(plugin_dir, api_server)
+        bgstally = make_bgstally(plugin_dir)
+        api_manager:APIManager = APIManager(bgstally)
+        bgstally.api_manager = api_manager
+
+        if not wait_for(lambda: count_requests(api_server, ENDPOINT_DISCOVERY) > 0, args.timeout):
+            raise RuntimeError("API discovery did not complete")
+
+        activity:Activity = make_activity(bgstally, args.systems)
+        send_activity(api_manager, api_server, activity, args.timeout)
+
+        events:list[dict] = make_events(args.events)
+        start:float = perf_counter()
+
+        for event_id, event in enumerate(events):
+            if args.rate > 0:
+                delay:float = start + event_id / args.rate - perf_counter()
+                if delay > 0: sleep(delay)
+
+            event['BenchmarkID'] = event_id
+            if event['event'] in api_manager.subscribed_events: tracker.event_sent(event_id)
+            api_manager.send_event(event, activity, CMDR, None)
+
+        stream_s:float = perf_counter() - start
+        complete:bool = wait_for(tracker.all_received, args.timeout)
+
+        # Change some systems and send the activity again, which is sent as a delta
+        system_addresses:list[str] = list(activity.systems.keys())
+        for system_address in system_addresses[:max(1, int(len(system_addresses) * SYSTEMS_CHANGED_FRACTION))]:
+            next(iter(activity.systems[system_address]['Factions'].values()))['Bounties'] += 1
+            activity.system_changed(system_address)
+        send_activity(api_manager, api_server, activity, args.timeout)
+
+        api:API = api_manager.apis[0]
+        metrics:dict = api.get_metrics()
+
+        bgstally.scheduler.shut_down()
+        bgstally.request_manager.shut_down()
+        if api.outbox is not None: api.outbox.close()
+
+    api_server.stop()
+
+    latencies:list[float] = tracker.get_latencies()
+    last_received:float = max(tracker.received.values(), default=start)
+    p50, p90, p99 = benchutils.percentiles(latencies, [50, 90, 99])
+
+    print(f"{args.events} journal events in {stream_s:.2f} s, {len(tracker.sent)} wanted by the API")
+    print(f"Server latency {args.latency:.0f} ms (+{args.jitter:.0f} ms jitter), error rate {args.error_rate:.1%}")
+    print()
+    print(f"Received:    {len(tracker.received)} events ({tracker.duplicates} duplicates), {'complete' if complete else 'timed out'}")
+    print(f"Lost:        {len(tracker.sent) - len(tracker.received)} events ({metrics['dropped']} dropped from the outbox)")
+    print(f"Throughput:  {len(tracker.received) / max(last_received - start, 1e-9):.0f} events/s")
+    print(f"Latency:     p50 {p50 * 1000:.0f} ms, p90 {p90 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"Batches:     {metrics['batches_sent']} events batches sent")
+    print()
+    report_requests(api_server.get_requests())
+
+
+if __name__ == "__main__":
+    main()
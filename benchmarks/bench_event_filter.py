@@ -0,0 +1,139 @@
+"""
+Benchmark API event filtering. Compares the compiled per-event-type filters against the previous approach of looking up
+the filters and matching pattern strings for every event, over a stream of journal events with a realistic mix of
+event types and a realistic set of server filters.
+
+Usage: python benchmarks/bench_event_filter.py [--events 10000] [--iterations 20]
+"""
+import argparse
+import random
+from re import match
+
+import benchutils
+from bgstally.eventfilter import EventFilter, compile_event_filters
+from bgstally.utils import get_by_path
+
+# Server filters, similar to those used by squadron servers to restrict events to their own factions and systems
+EVENTS_FILTERS = {
+    'ApproachSettlement': {},
+    'CarrierJump': {},
+    'CommitCrime': {'filters': {'Faction': "^(The Dark Wheel|Canonn Interstellar|Sol Workers' Party)$"}},
+    'Died': {},
+    'Docked': {'filters': {'StationFaction': "{'Name': 'The Dark Wheel'"}},
+    'FactionKillBond': {'filters': {'AwardingFaction': "^The Dark Wheel$", 'Reward': "[0-9]+"}},
+    'FSDJump': {'filters': {'StarSystem': "^(Shinrarta Dezhra|Sol|Achenar|Alioth|Shinrarta.*)$"}},
+    'Location': {'filters': {'StarSystem': ".*"}},
+    'MarketBuy': {'filters': {'MarketID': "32"}},
+    'MarketSell': {'filters': {'Type': "^(gold|silver|palladium|painite)$", 'BlackMarket': "False"}},
+    'MissionAbandoned': {},
+    'MissionAccepted': {'filters': {'Faction': "The Dark Wheel"}},
+    'MissionCompleted': {'filters': {'Faction': "^The Dark Wheel$", 'Name': "Mission_"}},
+    'MissionFailed': {},
+    'MultiSellExplorationData': {},
+    'RedeemVoucher': {'filters': {'Type': "^(bounty|CombatBond)$", 'Faction': "The Dark Wheel"}},
+    'SellExplorationData': {},
+    'StartUp': {}
+}
+
+# Relative frequency of event types in a typical journal, including the many events no server is interested in
+EVENT_WEIGHTS = {
+    'Music': 20, 'ReceiveText': 15, 'Scan': 15, 'FSSSignalDiscovered': 12, 'ShipTargeted': 10, 'Bounty': 8,
+    'FSDJump': 5, 'Docked': 4, 'MarketSell': 4, 'MarketBuy': 3, 'FactionKillBond': 3, 'MissionAccepted': 2,
+    'MissionCompleted': 2, 'RedeemVoucher': 1, 'CommitCrime': 1, 'Location': 1, 'ApproachSettlement': 1
+}
+
+FACTIONS = ["The Dark Wheel", "Canonn Interstellar", "Sol Workers' Party", "Mother Gaia", "Alioth Independents"]
+SYSTEMS = ["Shinrarta Dezhra", "Sol", "Achenar", "Alioth", "Maia", "Merope", "Colonia", "Deciat"]
+COMMODITIES = ["gold", "silver", "palladium", "painite", "tritium", "water", "bertrandite"]
+
+
+def make_events(num_events:int) -> list[dict]:
+    """
+    Create a stream of synthetic journal events
+    """
+    rnd:random.Random = random.Random(1)
+    event_names:list[str] = list(EVENT_WEIGHTS.keys())
+    weights:list[int] = list(EVENT_WEIGHTS.values())
+    events:list[dict] = []
+
+    for i in range(num_events):
+        event_name:str = rnd.choices(event_names, weights)[0]
+        event:dict = {'timestamp': "2024-06-01T12:00:00Z", 'event': event_name}
+
+        match event_name:
+            case 'FSDJump' | 'Location':
+                event |= {'StarSystem': rnd.choice(SYSTEMS), 'SystemAddress': rnd.randint(1, 10**12), 'Population': rnd.randint(0, 10**9)}
+            case 'Docked':
+                event |= {'StationName': "Jameson Memorial", 'StationFaction': {'Name': rnd.choice(FACTIONS)}, 'MarketID': rnd.randint(1, 10**9)}
+            case 'MarketSell':
+                event |= {'MarketID': rnd.randint(1, 10**9), 'Type': rnd.choice(COMMODITIES), 'Count': rnd.randint(1, 700), 'BlackMarket': rnd.random() < 0.1}
+            case 'MarketBuy':
+                event |= {'MarketID': rnd.randint(1, 10**9), 'Type': rnd.choice(COMMODITIES), 'Count': rnd.randint(1, 700)}
+            case 'FactionKillBond':
+                event |= {'AwardingFaction': rnd.choice(FACTIONS), 'VictimFaction': rnd.choice(FACTIONS), 'Reward': rnd.randint(1000, 100000)}
+            case 'MissionAccepted' | 'MissionCompleted':
+                event |= {'Faction': rnd.choice(FACTIONS), 'Name': "Mission_Courier_name", 'MissionID': i}
+            case 'RedeemVoucher':
+                event |= {'Type': rnd.choice(["bounty", "CombatBond", "trade"]), 'Faction': rnd.choice(FACTIONS), 'Amount': rnd.randint(1000, 10**7)}
+            case 'CommitCrime':
+                event |= {'CrimeType': "murder", 'Faction': rnd.choice(FACTIONS)}
+            case 'ApproachSettlement':
+                event |= {'Name': "Settlement", 'MarketID': rnd.randint(1, 10**9)}
+
+        events.append(event)
+
+    return events
+
+
+def legacy_should_send(events_filters:dict, event:dict) -> bool:
+    """
+    The previous filtering approach, kept here as a reference
+    """
+    if event.get('event', '') not in events_filters: return False
+
+    filters:dict = get_by_path(events_filters, [event.get('event', ''), 'filters'], None)
+    if filters is None: return True
+
+    for field, filter in filters.items():
+        filter_str:str = str(filter)
+        value_str:str = str(event.get(field, ""))
+        if not match(filter_str, value_str): return False
+
+    return True
+
+
+def compiled_should_send(event_filters:dict[str, EventFilter], event:dict) -> bool:
+    """
+    The compiled filtering approach, as used by API.send_event()
+    """
+    event_filter:EventFilter|None = event_filters.get(event.get('event', ''))
+    return event_filter is not None and event_filter.matches(event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API event filtering")
+    parser.add_argument('--events', type=int, default=10000, help="Number of events in the stream")
+    parser.add_argument('--iterations', type=int, default=20, help="Number of times to filter the stream")
+    args = parser.parse_args()
+
+    events:list[dict] = make_events(args.events)
+    event_filters:dict[str, EventFilter] = compile_event_filters(EVENTS_FILTERS)
+
+    legacy_results:list[bool] = [legacy_should_send(EVENTS_FILTERS, event) for event in events]
+    compiled_results:list[bool] = [compiled_should_send(event_filters, event) for event in events]
+    if legacy_results != compiled_results:
+        raise AssertionError("Compiled filters give different results to the legacy filters")
+
+    compile_s:float = benchutils.time_it(lambda: compile_event_filters(EVENTS_FILTERS), args.iterations)
+    legacy_s:float = benchutils.time_it(lambda: [legacy_should_send(EVENTS_FILTERS, event) for event in events], args.iterations)
+    compiled_s:float = benchutils.time_it(lambda: [compiled_should_send(event_filters, event) for event in events], args.iterations)
+
+    print(f"{args.events} events, {sum(compiled_results)} sent")
+    print(f"Compile filters:  {compile_s * 1000:10.3f} ms")
+    print(f"Legacy filtering: {legacy_s * 1000:10.3f} ms ({legacy_s / args.events * 1000000:.3f} us per event)")
+    print(f"Compiled:         {compiled_s * 1000:10.3f} ms ({compiled_s / args.events * 1000000:.3f} us per event)")
+    print(f"Speedup:          {legacy_s / compiled_s:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark the journal event hot path, BGSTally.journal_entry() and everything it calls, end to end. Runs realistic
+synthetic journal streams through a BGSTally object with real activity, mission log, target manager and API manager,
+and stand-ins for the UI, persistence and network, so there is no Tk, disk or network activity. The activity is first
+populated with the given number of tracked systems, to show how event handling scales with the size of the activity.
+
+Reports events per second and per-event latency percentiles from a timed pass, and memory allocated per event from a
+separate pass under tracemalloc, as tracing slows everything down.
+
+Usage: python benchmarks/bench_journal.py [--systems 10,100,1000] [--events 2000] [--scenarios jumps,bounties,...] [--no-alloc]
+"""
+import argparse
+import tracemalloc
+from os import mkdir, path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from types import SimpleNamespace
+
+import semantic_version
+
+import benchutils
+from bgstally.activity import Activity
+from bgstally.apimanager import APIManager
+from bgstally.bgstally import BGSTally
+from bgstally.constants import FOLDER_OTHER_DATA
+from bgstally.journaldispatcher import JournalDispatcher
+from bgstally.missionlog import MissionLog
+from bgstally.scheduler import Scheduler
+from bgstally.targetmanager import TargetManager
+from bgstally.tick import Tick
+from journalgen import JournalGenerator
+
+CMDR = "Benchmark Cmdr"
+GAME_STATE = {'Odyssey': True}
+SCENARIOS = ["jumps", "bounties", "trade", "missions", "targeting", "mixed"]
+MISSIONS_PER_RUN = 10
+SELLS_PER_DOCK = 20
+
+
+def make_stream(generator:JournalGenerator, scenario:str, num_events:int) -> list[dict]:
+    """Generate a journal stream for a scenario
+
+    Args:
+        generator (JournalGenerator): The generator
+        scenario (str): The scenario name
+        num_events (int): The number of events to generate
+
+    Returns:
+        list[dict]: The events
+    """
+    events:list[dict] = []
+
+    while len(events) < num_events:
+        match scenario:
+            case 'jumps':
+                # Exploring, jumping from system to system
+                events.append(generator.fsd_jump())
+
+            case 'bounties':
+                # Bounty hunting in one place, targeting and scanning ships then killing them
+                events += [generator.ship_targeted(), generator.ship_targeted(), generator.bounty()]
+
+            case 'trade':
+                # Selling cargo in loops between stations
+                events += [generator.fsd_jump(), generator.docked()]
+                events += [generator.market_sell() for _ in range(SELLS_PER_DOCK)]
+
+            case 'missions':
+                # Taking a stack of missions, then completing them
+                events += [generator.fsd_jump(), generator.docked()]
+                events += [generator.mission_accepted() for _ in range(MISSIONS_PER_RUN)]
+                events += [generator.fsd_jump(), generator.docked()]
+                while (event := generator.mission_completed()) is not None: events.append(event)
+
+            case 'targeting':
+                # Sitting in a busy system, targeting everything in sight
+                events.append(generator.ship_targeted())
+
+            case 'mixed':
+                events += [generator.fsd_jump(), generator.docked()]
+                events += [generator.mission_accepted() for _ in range(3)]
+                events += [generator.market_sell() for _ in range(5)]
+                events += [generator.ship_targeted(), generator.ship_targeted(), generator.bounty()] * 3
+                while (event := generator.mission_completed()) is not None: events.append(event)
+
+    return events[:num_events]
+
+
+def make_plugin(plugin_dir:str) -> BGSTally:
+    """
+    Create a BGSTally object with the real classes used by the journal hot path, and stand-ins for everything else
+    """
+    stand_ins:SimpleNamespace = benchutils.make_bgstally()
+
+    plugin:BGSTally = BGSTally(stand_ins.plugin_name, semantic_version.Version("0.0.0-benchmark"))
+    plugin.plugin_dir = plugin_dir
+    plugin.state = stand_ins.state
+    plugin.ui = stand_ins.ui
+    plugin.config = SimpleNamespace(apikey_inara=lambda: None, requests=lambda: {})
+    plugin.request_manager = SimpleNamespace(queue_request=lambda *args, **kwargs: None, url_valid=lambda url: False)
+    plugin.persistence_manager = SimpleNamespace(mark_dirty=lambda: None)
+    plugin.market = SimpleNamespace(available=lambda market_id: False)
+    plugin.tick_detector = SimpleNamespace(check_now=lambda: None, get_new_tick_time=lambda: None)
+
+    plugin.scheduler = Scheduler(plugin)
+    plugin.tick = Tick(plugin)
+    plugin.mission_log = MissionLog(plugin)
+    plugin.target_manager = TargetManager(plugin)
+    activity:Activity = Activity(plugin, plugin.tick)
+    plugin.activity_manager = SimpleNamespace(get_current_activity=lambda: activity)
+    plugin.api_manager = APIManager(plugin)
+    plugin.journal_dispatcher = JournalDispatcher(plugin)
+
+    return plugin
+
+
+def run(num_systems:int, scenario:str, num_events:int, trace:bool) -> list[float]:
+    """Set up a plugin tracking the given number of systems, then feed it a journal stream
+
+    Args:
+        num_systems (int): The number of systems in the activity
+        scenario (str): The scenario name
+        num_events (int): The number of events in the stream
+        trace (bool): If True, measure memory allocated by each event rather than time taken
+
+    Returns:
+        list[float]: The time taken by each event in seconds, or if tracing, the peak memory allocated by each event in bytes
+    """
+    generator:JournalGenerator = JournalGenerator(num_systems)
+
+    with TemporaryDirectory(ignore_cleanup_errors=True) as plugin_dir:
+        mkdir(path.join(plugin_dir, FOLDER_OTHER_DATA))
+        plugin:BGSTally = make_plugin(plugin_dir)
+
+        # Visit every system so they are all tracked in the activity
+        for system in generator.systems:
+            plugin.journal_entry(CMDR, False, system['StarSystem'], None, generator.fsd_jump(system), GAME_STATE)
+
+        events:list[dict] = make_stream(generator, scenario, num_events)
+        results:list[float] = []
+
+        if trace: tracemalloc.start()
+
+        for event in events:
+            system_name:str = generator.system['StarSystem']
+
+            if trace:
+                tracemalloc.reset_peak()
+                before:int = tracemalloc.get_traced_memory()[0]
+                plugin.journal_entry(CMDR, False, system_name, None, event, GAME_STATE)
+                results.append(tracemalloc.get_traced_memory()[1] - before)
+            else:
+                start:float = perf_counter()
+                plugin.journal_entry(CMDR, False, system_name, None, event, GAME_STATE)
+                results.append(perf_counter() - start)
+
+        if trace: tracemalloc.stop()
+        plugin.scheduler.shut_down()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the journal event hot path")
+    parser.add_argument('--systems', default="10,100,1000", help="Comma-separated list of tracked system counts to test")
+    parser.add_argument('--events', type=int, default=2000, help="Number of journal events in each stream")
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS), help=f"Comma-separated list of scenarios to run, from {', '.join(SCENARIOS)}")
+    parser.add_argument('--no-alloc', action='store_true', help="Skip measuring memory allocations, which is slow")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<10} {'systems':>8} {'events/s':>10} {'p50 (us)':>10} {'p90 (us)':>10} {'p99 (us)':>10} {'max (us)':>10} {'alloc/event (KB)':>17}")
+
+    for scenario in args.scenarios.split(","):
+        if scenario not in SCENARIOS: raise ValueError(f"Unknown scenario {scenario}")
+
+        for num_systems in [int(n) for n in args.systems.split(",")]:
+            timings:list[float] = run(num_systems, scenario, args.events, False)
+            p50, p90, p99 = benchutils.percentiles(timings, [50, 90, 99])
+
+            alloc:str = "-"
+            if not args.no_alloc:
+                allocations:list[float] = run(num_systems, scenario, args.events, True)
+                alloc = f"{sum(allocations) / len(allocations) / 1024:.1f}"
+
+            print(f"{scenario:<10} {num_systems:>8} {len(timings) / sum(timings):>10.0f} {p50 * 1000000:>10.1f} {p90 * 1000000:>10.1f} "
+                  f"{p99 * 1000000:>10.1f} {max(timings) * 1000000:>10.1f} {alloc:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark starting a new tick. Compares building the new tick's Activity directly with Activity.carry_forward() against
+the previous approach of deep copying the whole Activity and then clearing it down, for large ticks where most systems
+are not carried forward. Reports the time taken and the peak memory allocated while building the new Activity.
+
+Usage: python benchmarks/bench_new_tick.py [--systems 100,1000,5000] [--carried 5] [--iterations 5]
+"""
+import argparse
+import tracemalloc
+from copy import deepcopy
+from datetime import datetime
+from types import SimpleNamespace
+
+import benchutils
+from bgstally.activity import Activity
+from bgstally.tick import Tick
+
+FACTIONS_PER_SYSTEM = 7
+
+
+def make_activity(bgstally, num_systems:int, carried_percent:int) -> tuple[Activity, SimpleNamespace]:
+    """Create an activity containing the given number of systems, each with every type of activity, and a mission log
+    with active missions in some of them. Of the systems that carry forward to the next tick, half have active missions
+    and half have search and rescue items scooped but not delivered.
+
+    Returns:
+        tuple[Activity, SimpleNamespace]: The activity and a stand-in for the mission log
+    """
+    activity:Activity = Activity(bgstally, Tick(bgstally))
+    mission_systems:list[str] = []
+    carry_every:int = max(1, round(100 / carried_percent)) if carried_percent > 0 else num_systems + 1
+
+    for i in range(num_systems):
+        system_address:str = str(1000000 + i)
+        factions:dict = {}
+        for f in range(FACTIONS_PER_SYSTEM):
+            faction_name:str = f"Faction {f} of System {i}"
+            factions[faction_name] = activity._get_new_faction_data(faction_name, "None", True)
+
+        system:dict = activity._get_new_system_data(f"System {i}", system_address, factions)
+        system['TWKills'] = activity._get_new_tw_kills_data(True)
+        system['TWSandR'] = activity._get_new_tw_sandr_data(True)
+
+        if i % carry_every == 0:
+            if (i // carry_every) % 2 == 0:
+                mission_systems.append(system['System'])
+            else:
+                system['TWSandR']['dp']['scooped'] = 2
+
+        system['Totals'] = activity._calculate_system_totals(system)
+        activity._add_system(system)
+
+    activity.recalculate_zero_activity()
+    bgstally.state.current_system_id = str(1000000)
+    return activity, SimpleNamespace(get_active_systems=lambda: mission_systems)
+
+
+def previous_new_tick(activity:Activity, tick, forced:bool, mission_log) -> Activity:
+    """
+    The previous approach: deep copy the whole activity, then delete the systems that don't carry forward and zero the rest
+    """
+    new_activity:Activity = deepcopy(activity)
+    new_activity.tick_id = tick.tick_id
+    new_activity.tick_time = tick.tick_time
+    new_activity.tick_forced = forced
+    new_activity.discord_webhook_data = {}
+    new_activity.discord_notes = ""
+    new_activity.dirty = True
+
+    mission_systems:list = mission_log.get_active_systems()
+
+    for system_address in list(new_activity.systems.keys()):
+        system = new_activity.systems[system_address]
+        if system['System'] in mission_systems or \
+                new_activity.bgstally.state.current_system_id == system_address or \
+                system['Totals']['TWSandRScooped'] > 0:
+            for faction_name, faction_data in system['Factions'].items():
+                system['Factions'][faction_name] = new_activity._get_new_faction_data(faction_name, faction_data['FactionState'])
+            system['TWKills'] = new_activity._get_new_tw_kills_data()
+            for d in system['TWSandR'].values():
+                d['delivered'] = 0
+            system['Totals'] = new_activity._calculate_system_totals(system)
+            new_activity.system_changed(system_address)
+        else:
+            del new_activity.systems[system_address]
+
+    new_activity.recalculate_zero_activity()
+    return new_activity
+
+
+def peak_memory(func:callable) -> int:
+    """Measure the peak memory allocated while calling a function
+
+    Returns:
+        int: The peak memory allocated, in bytes
+    """
+    tracemalloc.start()
+    before:int = tracemalloc.get_traced_memory()[0]
+    result = func()
+    peak:int = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark starting a new tick")
+    parser.add_argument('--systems', default="100,1000,5000", help="Comma-separated list of system counts to test")
+    parser.add_argument('--carried', type=int, default=5, help="Percentage of systems carried forward to the new tick")
+    parser.add_argument('--iterations', type=int, default=5, help="Number of new ticks to time for each test")
+    args = parser.parse_args()
+
+    bgstally = benchutils.make_bgstally()
+    tick:SimpleNamespace = SimpleNamespace(tick_id="benchmark-new-tick", tick_time=datetime.utcnow())
+
+    print(f"{'systems':>8} {'carried':>8} {'previous (ms)':>14} {'carry (ms)':>11} {'speedup':>8} {'previous peak (KB)':>19} {'carry peak (KB)':>16}")
+
+    for num_systems in [int(n) for n in args.systems.split(",")]:
+        activity, mission_log = make_activity(bgstally, num_systems, args.carried)
+
+        # Check that both approaches carry forward the same systems and factions
+        previous:Activity = previous_new_tick(activity, tick, False, mission_log)
+        carried:Activity = activity.carry_forward(tick, False, mission_log)
+        if list(previous.systems.keys()) != list(carried.systems.keys()) or \
+                any(previous.systems[k]['Factions'] != carried.systems[k]['Factions'] or previous.systems[k]['TWSandR'] != carried.systems[k]['TWSandR']
+                    for k in carried.systems):
+            raise AssertionError(f"Carried forward activity differs from the previous approach with {num_systems} systems")
+
+        previous_s:float = benchutils.time_it(lambda: previous_new_tick(activity, tick, False, mission_log), args.iterations)
+        carry_s:float = benchutils.time_it(lambda: activity.carry_forward(tick, False, mission_log), args.iterations)
+        previous_peak:int = peak_memory(lambda: previous_new_tick(activity, tick, False, mission_log))
+        carry_peak:int = peak_memory(lambda: activity.carry_forward(tick, False, mission_log))
+
+        print(f"{num_systems:>8} {len(carried.systems):>8} {previous_s * 1000:>14.3f} {carry_s * 1000:>11.3f} {previous_s / carry_s:>7.1f}x "
+              f"{previous_peak / 1024:>19.1f} {carry_peak / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Shared helpers for the benchmarks. Importing this module makes the plugin and the EDMC stand-in modules importable, so
+it must be imported before anything from bgstally.
+"""
+import logging
+import sys
+from math import ceil
+from os import path
+from statistics import median
+from time import perf_counter
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = path.dirname(path.abspath(__file__))
+PLUGIN_DIR = path.dirname(BENCHMARKS_DIR)
+
+sys.path.insert(0, PLUGIN_DIR)
+sys.path.insert(0, path.join(BENCHMARKS_DIR, "edmcstubs"))
+
+from bgstally.constants import CheckStates
+from bgstally.debug import Debug
+
+Debug.logger = logging.getLogger("benchmark")
+
+
+def make_bgstally(**kwargs) -> SimpleNamespace:
+    """Create a stand-in for the BGSTally object, with just enough state for the code being benchmarked
+
+    Returns:
+        SimpleNamespace: The stand-in object. Any keyword arguments are added as attributes.
+    """
+    state:SimpleNamespace = SimpleNamespace(EnableSystemActivityByDefault=SimpleNamespace(get=lambda: CheckStates.STATE_ON),
+                                            current_system_id=None, station_faction="", station_type="", discord_lang="", enable_diagnostics=False,
+                                            last_settlement_approached={}, last_spacecz_approached={}, last_megaship_approached={},
+                                            last_ships_targeted={}, last_ship_targeted={})
+    ui:SimpleNamespace = SimpleNamespace(frame=None, show_system_report=lambda system_address: None, show_warning=lambda message: None,
+                                         show_cmdr_report=lambda cmdr_data: None)
+
+    bgstally:SimpleNamespace = SimpleNamespace(plugin_dir=PLUGIN_DIR, plugin_name="BGS-Tally", state=state, ui=ui)
+    for key, value in kwargs.items(): setattr(bgstally, key, value)
+
+    return bgstally
+
+
+def time_it(func:callable, iterations:int) -> float:
+    """Time a function over a number of iterations
+
+    Args:
+        func (callable): The function to call, with no arguments
+        iterations (int): The number of times to call it
+
+    Returns:
+        float: The median time per call, in seconds
+    """
+    timings:list[float] = []
+
+    for _ in range(iterations):
+        start:float = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+
+    return median(timings)
+
+
+def percentiles(values:list[float], points:list[float]) -> list[float]:
+    """Calculate percentiles of a set of values, using the nearest rank
+
+    Args:
+        values (list[float]): The values, in any order
+        points (list[float]): The percentiles to calculate, each from 0 to 100
+
+    Returns:
+        list[float]: The value at each percentile, or 0 for each if there are no values
+    """
+    if not values: return [0 for _ in points]
+
+    ordered:list[float] = sorted(values)
+    return [ordered[min(len(ordered) - 1, max(0, ceil(point / 100 * len(ordered)) - 1))] for point in points]
@@ -0,0 +1,12 @@
+"""
+Minimal stand-in for EDMC's companion module, sufficient for running BGS-Tally code outside EDMC
+"""
+from collections import UserDict
+
+SERVER_LIVE = "https://companion.orerve.net"
+
+
+class CAPIData(UserDict):
+    def __init__(self, data:dict|None = None, source_host:str = SERVER_LIVE):
+        super().__init__(data or {})
+        self.source_host:str = source_host
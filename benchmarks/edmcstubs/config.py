@@ -0,0 +1,28 @@
+"""
+Minimal stand-in for EDMC's config module, sufficient for running BGS-Tally code outside EDMC
+"""
+
+appname = "EDMarketConnector"
+appversion = None
+
+
+class _Config:
+    shutting_down:bool = False
+
+    def __init__(self):
+        self.values:dict = {}
+
+    def get_str(self, key:str, default:str|None = None) -> str|None:
+        return self.values.get(key, default)
+
+    def get_int(self, key:str, default:int = 0) -> int:
+        return self.values.get(key, default)
+
+    def get_bool(self, key:str, default:bool = False) -> bool:
+        return self.values.get(key, default)
+
+    def set(self, key:str, value):
+        self.values[key] = value
+
+
+config = _Config()
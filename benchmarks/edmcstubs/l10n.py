@@ -0,0 +1,22 @@
+"""
+Minimal stand-in for EDMC's l10n module, sufficient for running BGS-Tally code outside EDMC
+"""
+
+LOCALISATION_DIR = "L10n"
+LANGUAGE_ID = "!Language"
+
+
+class _Translations:
+    FALLBACK = "en"
+    FALLBACK_NAME = "English"
+
+    @staticmethod
+    def translate(string:str, context:str|None = None, lang:str|None = None) -> str:
+        return string
+
+    @staticmethod
+    def contents(lang:str|None = None, plugin_path:str|None = None) -> dict:
+        return {}
+
+
+Translations = _Translations
@@ -0,0 +1,10 @@
+"""
+Minimal stand-in for EDMC's monitor module, sufficient for running BGS-Tally code outside EDMC
+"""
+
+class _Monitor:
+    def is_live_galaxy(self) -> bool:
+        return True
+
+
+monitor = _Monitor()
@@ -0,0 +1,5 @@
+"""
+Minimal stand-in for EDMC's myNotebook module, sufficient for importing BGS-Tally code outside EDMC. No widgets are
+created by the benchmarks.
+"""
+from tkinter import Checkbutton, Frame, Label, OptionMenu
@@ -0,0 +1,6 @@
+"""
+Minimal stand-in for EDMC's plug module, sufficient for running BGS-Tally code outside EDMC
+"""
+
+def show_error(err:str):
+    pass
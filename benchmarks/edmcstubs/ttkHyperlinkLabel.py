@@ -0,0 +1,9 @@
+"""
+Minimal stand-in for EDMC's ttkHyperlinkLabel module, sufficient for importing BGS-Tally code outside EDMC. No widgets
+are created by the benchmarks.
+"""
+from tkinter.ttk import Label
+
+
+class HyperlinkLabel(Label):
+    pass
@@ -0,0 +1,186 @@
+"""
+Synthetic journal generator for the benchmarks. Generates a galaxy of systems, each with a realistic set of factions,
+and realistic journal events for the common activities that BGS-Tally tracks. Output is repeatable for a given seed.
+"""
+import random
+from datetime import datetime, timedelta
+
+from bgstally.constants import DATETIME_FORMAT_JOURNAL
+
+FACTIONS_PER_SYSTEM_MIN = 4
+FACTIONS_PER_SYSTEM_MAX = 8
+FACTION_STATES = ["None", "Boom", "Expansion", "Investment", "CivilLiberty", "Outbreak", "Famine", "Lockdown", "Retreat"]
+GOVERNMENTS = ["Corporate", "Democracy", "Dictatorship", "Confederacy", "Cooperative", "Patronage", "Anarchy"]
+ALLEGIANCES = ["Federation", "Empire", "Alliance", "Independent"]
+COMMODITIES = ["gold", "silver", "palladium", "painite", "tritium", "water", "bertrandite", "agronomictreatment"]
+SHIPS = ["python", "anaconda", "federation_corvette", "cutter", "krait_mkii", "viper", "vulture", "asp"]
+PILOT_RANKS = ["Harmless", "Competent", "Expert", "Master", "Dangerous", "Deadly", "Elite"]
+INF_TRENDS = ["UpGood", "UpGood", "UpGood", "DownBad"]
+CMDR_NAMES = ["Jameson", "Nemo", "Salome", "Arcanonn", "Zoy"]
+CMDR_TARGET_FRACTION = 0.05 # Fraction of ShipTargeted events that are for a CMDR rather than an NPC
+
+
+class JournalGenerator:
+    """
+    Generates journal events for a synthetic galaxy. Events are generated with increasing timestamps, and track the
+    current system and station so that streams are self-consistent.
+    """
+
+    def __init__(self, num_systems:int, seed:int = 1):
+        """Create the galaxy
+
+        Args:
+            num_systems (int): The number of systems in the galaxy
+            seed (int, optional): Random seed. Defaults to 1.
+        """
+        self.random:random.Random = random.Random(seed)
+        self.timestamp:datetime = datetime(2024, 6, 1, 12, 0, 0)
+        self.next_mission_id:int = 900000000
+        self.missions:list[dict] = [] # Missions accepted and not yet completed
+
+        self.systems:list[dict] = []
+        for i in range(num_systems):
+            num_factions:int = self.random.randint(FACTIONS_PER_SYSTEM_MIN, FACTIONS_PER_SYSTEM_MAX)
+            factions:list[str] = [f"{self.random.choice(ALLEGIANCES)} Faction {f} of Synth {i}" for f in range(num_factions)]
+            self.systems.append({'StarSystem': f"Synth {i}", 'SystemAddress': 10000000 + i, 'Factions': factions,
+                                 'MarketID': 3200000000 + i, 'StationName': f"Synth {i} Port"})
+
+        self.system:dict = self.systems[0]
+
+
+    def fsd_jump(self, system:dict|None = None) -> dict:
+        """
+        Jump to a system, a random one if not given, with full faction information
+        """
+        if system is None: system = self.random.choice(self.systems)
+        self.system = system
+
+        factions:list[dict] = []
+        influences:list[float] = [self.random.random() for _ in system['Factions']]
+        for faction_name, influence in zip(system['Factions'], influences):
+            faction_state:str = self.random.choice(FACTION_STATES)
+            faction:dict = {'Name': faction_name, 'FactionState': faction_state, 'Government': self.random.choice(GOVERNMENTS),
+                            'Influence': influence / sum(influences), 'Allegiance': self.random.choice(ALLEGIANCES),
+                            'Happiness': "$Faction_HappinessBand2;", 'Happiness_Localised': "Happy", 'MyReputation': self.random.uniform(-100, 100)}
+            if faction_state != "None": faction['ActiveStates'] = [{'State': faction_state}]
+            if self.random.random() < 0.3: faction['PendingStates'] = [{'State': self.random.choice(FACTION_STATES), 'Trend': 0}]
+            factions.append(faction)
+
+        controlling:str = system['Factions'][0]
+        return self._event('FSDJump', {'Taxi': False, 'Multicrew': False, 'StarSystem': system['StarSystem'], 'SystemAddress': system['SystemAddress'],
+                                       'StarPos': [self.random.uniform(-1000, 1000) for _ in range(3)], 'SystemAllegiance': "Independent",
+                                       'SystemEconomy': "$economy_Industrial;", 'SystemEconomy_Localised': "Industrial",
+                                       'SystemSecondEconomy': "$economy_Refinery;", 'SystemSecondEconomy_Localised': "Refinery",
+                                       'SystemGovernment': "$government_Corporate;", 'SystemGovernment_Localised': "Corporate",
+                                       'SystemSecurity': "$SYSTEM_SECURITY_high;", 'SystemSecurity_Localised': "High Security",
+                                       'Population': self.random.randint(10**4, 10**10), 'Body': f"{system['StarSystem']} A", 'BodyID': 1,
+                                       'BodyType': "Star", 'JumpDist': self.random.uniform(5, 60), 'FuelUsed': self.random.uniform(1, 8),
+                                       'FuelLevel': 30.0, 'Factions': factions, 'SystemFaction': {'Name': controlling}})
+
+
+    def docked(self) -> dict:
+        """
+        Dock at the station in the current system
+        """
+        return self._event('Docked', {'StationName': self.system['StationName'], 'StationType': "Coriolis", 'Taxi': False, 'Multicrew': False,
+                                      'StarSystem': self.system['StarSystem'], 'SystemAddress': self.system['SystemAddress'],
+                                      'MarketID': self.system['MarketID'], 'StationFaction': {'Name': self.system['Factions'][0], 'FactionState': "None"},
+                                      'StationGovernment': "$government_Corporate;", 'StationGovernment_Localised': "Corporate",
+                                      'StationServices': ["dock", "autodock", "commodities", "contacts", "missions"],
+                                      'StationEconomy': "$economy_Industrial;", 'StationEconomy_Localised': "Industrial",
+                                      'DistFromStarLS': self.random.uniform(10, 5000)})
+
+
+    def bounty(self) -> dict:
+        """
+        Kill a wanted ship in the current system
+        """
+        faction:str = self.random.choice(self.system['Factions'])
+        reward:int = self.random.randint(10000, 500000)
+        return self._event('Bounty', {'Rewards': [{'Faction': faction, 'Reward': reward}], 'PilotName': "$npc_name_decorate:#name=Pirate;",
+                                      'PilotName_Localised': "Pirate", 'Target': self.random.choice(SHIPS), 'TotalReward': reward,
+                                      'VictimFaction': f"Pirates of {self.system['StarSystem']}"})
+
+
+    def market_sell(self) -> dict:
+        """
+        Sell a commodity at the station in the current system
+        """
+        count:int = self.random.randint(1, 720)
+        price:int = self.random.randint(1000, 100000)
+        avg_paid:int = int(price * self.random.uniform(0.5, 1.1))
+        return self._event('MarketSell', {'MarketID': self.system['MarketID'], 'Type': self.random.choice(COMMODITIES), 'Count': count,
+                                          'SellPrice': price, 'TotalSale': count * price, 'AvgPricePaid': avg_paid})
+
+
+    def mission_accepted(self) -> dict:
+        """
+        Accept a mission from a faction in the current system, with a destination in another system
+        """
+        faction:str = self.random.choice(self.system['Factions'])
+        destination:dict = self.random.choice(self.systems)
+        mission:dict = {'MissionID': self.next_mission_id, 'Faction': faction, 'SystemAddress': self.system['SystemAddress'],
+                        'Destination': destination}
+        self.next_mission_id += 1
+        self.missions.append(mission)
+
+        return self._event('MissionAccepted', {'Faction': faction, 'Name': "Mission_Courier_name", 'LocalisedName': "Courier mission",
+                                               'DestinationSystem': destination['StarSystem'], 'DestinationStation': destination['StationName'],
+                                               'Expiry': (self.timestamp + timedelta(days=1)).strftime(DATETIME_FORMAT_JOURNAL),
+                                               'Wing': False, 'Influence': "++", 'Reputation': "++", 'Reward': 500000, 'MissionID': mission['MissionID']})
+
+
+    def mission_completed(self) -> dict|None:
+        """
+        Complete the oldest accepted mission, with effects on the mission faction and a secondary faction. Returns None if
+        there are no accepted missions waiting.
+        """
+        if not self.missions: return None
+        mission:dict = self.missions.pop(0)
+        system:dict = next(system for system in self.systems if system['SystemAddress'] == mission['SystemAddress'])
+        secondary:str = self.random.choice(system['Factions'])
+
+        faction_effects:list[dict] = [
+            {'Faction': mission['Faction'], 'Effects': [{'Effect': "$MISSIONUTIL_Interaction_Summary_EP_up;", 'Effect_Localised': "The economic status of $#MinorFaction; has improved in the $#System; system.", 'Trend': "UpGood"}],
+             'Influence': [{'SystemAddress': system['SystemAddress'], 'Trend': self.random.choice(INF_TRENDS), 'Influence': "+" * self.random.randint(1, 5)}],
+             'ReputationTrend': "UpGood", 'Reputation': "++"},
+            {'Faction': secondary, 'Effects': [],
+             'Influence': [{'SystemAddress': system['SystemAddress'], 'Trend': self.random.choice(INF_TRENDS), 'Influence': "+" * self.random.randint(1, 5)}],
+             'ReputationTrend': "UpGood", 'Reputation': "+"}
+        ]
+
+        return self._event('MissionCompleted', {'Faction': mission['Faction'], 'Name': "Mission_Courier_name", 'LocalisedName': "Courier mission",
+                                                'MissionID': mission['MissionID'], 'DestinationSystem': mission['Destination']['StarSystem'],
+                                                'DestinationStation': mission['Destination']['StationName'], 'Reward': 500000,
+                                                'FactionEffects': faction_effects})
+
+
+    def ship_targeted(self) -> dict:
+        """
+        Target a ship, going through the scan stages. Mostly NPCs, occasionally a CMDR.
+        """
+        scan_stage:int = self.random.randint(0, 3)
+        data:dict = {'TargetLocked': True, 'Ship': self.random.choice(SHIPS), 'ScanStage': scan_stage}
+        if scan_stage < 1: return self._event('ShipTargeted', data)
+
+        if self.random.random() < CMDR_TARGET_FRACTION:
+            cmdr_name:str = self.random.choice(CMDR_NAMES)
+            data |= {'PilotName': f"$cmdr_decorate:#name={cmdr_name};", 'PilotName_Localised': f"CMDR {cmdr_name}", 'PilotRank': "Elite"}
+        else:
+            pilot_name:str = f"Pilot {self.random.randint(1, 10000)}"
+            data |= {'PilotName': f"$npc_name_decorate:#name={pilot_name};", 'PilotName_Localised': pilot_name,
+                     'PilotRank': self.random.choice(PILOT_RANKS)}
+
+        if scan_stage >= 3:
+            data |= {'ShieldHealth': 100.0, 'HullHealth': 100.0, 'Faction': self.random.choice(self.system['Factions']),
+                     'LegalStatus': self.random.choice(["Clean", "Wanted"])}
+
+        return self._event('ShipTargeted', data)
+
+
+    def _event(self, event_name:str, data:dict) -> dict:
+        """
+        Create an event with the next timestamp
+        """
+        self.timestamp += timedelta(seconds=self.random.randint(1, 20))
+        return {'timestamp': self.timestamp.strftime(DATETIME_FORMAT_JOURNAL), 'event': event_name} | data
@@ -2,14 +2,18 @@ import json
 import re
 from copy import deepcopy
 from datetime import datetime, timedelta
+from itertools import count
+from threading import RLock
 from typing import Dict
 
+from bgstally.activitymigration import SCHEMA_VERSION, migrate
 from bgstally.constants import FILE_SUFFIX, CheckStates
 from bgstally.debug import Debug
 from bgstally.missionlog import MissionLog
+from bgstally.persistencemanager import PersistentStore
 from bgstally.state import State
 from bgstally.tick import Tick
-from bgstally.utils import _, __
+from bgstally.utils import _, __, write_json_text
 from thirdparty.colors import *
 
 DATETIME_FORMAT_ACTIVITY = "%Y-%m-%dT%H:%M:%S.%fZ"
@@ -106,8 +110,12 @@ TW_CBS = {
     60000000: 'h'                   # Hydra - 60m v18.06
 }
 
+# Source of per-system version numbers. Shared by all Activity instances so a version number is never reused, even
+# across ticks, which means anything cached against a version can never be mistaken for current when it isn't.
+SYSTEM_VERSIONS = count(1)
 
-class Activity:
+
+class Activity(PersistentStore):
     """
     User activity for a single tick
 
@@ -140,7 +148,13 @@ class Activity:
             self.systems: dict = {}
 
         # Non-stored instance data. Remember to modify __deepcopy__() if these are changed or new data added.
+        self.lock:RLock = RLock() # Held while changing or serialising stored data, as saves are made on the scheduler thread
         self.megaship_pat:re.Pattern = re.compile("^[a-z]{3}-[0-9]{3} ")  # e.g. kar-314 aquarius-class tanker
+        self.system_names:dict[str, str] = {} # key = system name, value = system address. Index of self.systems, kept in step by _add_system()
+        self.system_versions:dict[str, int] = {} # key = system address, value = version number, changed every time the system's activity changes. Ordered by version.
+        self.zero_activity_changed:set[str] = set() # Addresses of systems changed since their zero_system_activity flag was last calculated
+
+        self._index_systems()
 
 
     def load_legacy_data(self, filepath: str):
@@ -161,8 +175,11 @@ class Activity:
                     for faction in legacysystem['Factions']:
                         factions[faction['Faction']] = faction  # Just convert List to Dict, with faction name as key
 
-                    self.systems[str(legacysystem['SystemAddress'])] = self._get_new_system_data(legacysystem['System'], str(legacysystem['SystemAddress']), factions)
-            self.recalculate_zero_activity()
+                    self._add_system(self._get_new_system_data(legacysystem['System'], str(legacysystem['SystemAddress']), factions))
+
+            # The legacy factions predate schema versions, and _as_dict() refers to our systems, so this migrates them in place
+            migrate(self._as_dict() | {'schema_version': 0})
+            self._recalculate_all_zero_activity()
 
 
     def load(self, filepath: str):
@@ -171,21 +188,37 @@ class Activity:
         """
         try:
             with open(filepath) as activityfile:
-                self._from_dict(json.load(activityfile))
-                self.recalculate_zero_activity()
+                activity_data:dict = json.load(activityfile)
+
+            # Bring data saved by older versions up to date once, here, so the rest of the code can rely on the current schema
+            migrated:bool = migrate(activity_data)
+            self._from_dict(activity_data)
+
+            # Running totals can only be wrong if the file has been edited by hand, but check as it's cheap to do here
+            problems:list[str] = self.check_totals(repair=True)
+            for problem in problems:
+                Debug.logger.warning(f"Corrected running totals in {filepath}. {problem}")
+
+            self._recalculate_all_zero_activity()
+            if migrated or problems: self.dirty = True
         except Exception as e:
             Debug.logger.info(f"Unable to load {filepath}")
 
 
-    def save(self, filepath: str):
+    def save(self, filepath: str) -> int:
         """
-        Save to an activity file
+        Save to an activity file, returning the number of bytes written
         """
-        if not self.dirty: return
+        if not self.dirty: return 0
+
+        # Serialise with the lock held, so we save a consistent snapshot of the activity, but write the file without it
+        with self.lock:
+            version:int = self.version
+            json_data:str = json.dumps(self._as_dict())
 
-        with open(filepath, 'w') as activityfile:
-            json.dump(self._as_dict(), activityfile)
-            self.dirty = False
+        bytes_written:int = write_json_text(filepath, json_data)
+        self.mark_saved(version)
+        return bytes_written
 
 
     def get_filename(self) -> str:
@@ -223,10 +256,10 @@ class Activity:
         """
         Retrieve the data for a system by its name, or None if system not found
         """
-        for system in self.systems.values():
-            if system['System'] == system_name: return system
+        system_address:str|None = self.system_names.get(system_name)
+        if system_address is None: return None
 
-        return None
+        return self.systems.get(system_address)
 
 
     def get_system_by_address(self, system_address:str) -> dict | None:
@@ -253,32 +286,98 @@ class Activity:
         return result
 
 
-    def clear_activity(self, mission_log: MissionLog):
+    def system_changed(self, system_address:str):
+        """Record that the activity in a system has changed. Must be called by anything that modifies a system's data, so
+        that anything cached against the system's version is rebuilt, and its zero activity flag is recalculated by the
+        next call to recalculate_zero_activity().
+
+        Args:
+            system_address (str): The system address
+        """
+        # Remove before re-adding, so the dict stays ordered by version for get_changed_systems()
+        self.system_versions.pop(str(system_address), None)
+        self.system_versions[str(system_address)] = next(SYSTEM_VERSIONS)
+        self.zero_activity_changed.add(str(system_address))
+
+
+    def get_latest_system_version(self) -> int:
+        """Get the version of the most recently changed system, or 0 if no systems have been changed
+
+        Returns:
+            int: The version number
         """
-        Clear down all activity. If there is a currently active mission in a system or it's the current system the player is in,
-        or the system has had search and rescue items collected there, only zero the activity, otherwise delete the system completely.
+        return next(reversed(self.system_versions.values()), 0)
+
+
+    def get_changed_systems(self, since_version:int) -> list[str]:
+        """Get the systems changed since a given version. The cost depends only on the number of changed systems, not on
+        the number of systems tracked, so this can be called after every journal event.
+
+        Args:
+            since_version (int): A version previously returned by get_latest_system_version()
+
+        Returns:
+            list[str]: The addresses of systems changed since that version, most recently changed first
         """
-        self.dirty = True
-        mission_systems = mission_log.get_active_systems()
+        while True:
+            changed:list[str] = []
+
+            try:
+                for system_address, version in reversed(self.system_versions.items()):
+                    if version <= since_version: break
+                    changed.append(system_address)
+            except RuntimeError:
+                # The activity window marked a system changed from the Tk thread while we were iterating, start again
+                continue
+
+            return changed
+
+
+    def carry_forward(self, tick: Tick, forced: bool, mission_log: MissionLog) -> 'Activity':
+        """Create the Activity for a new tick, carrying forward only what is still needed from this one. A system is kept
+        if there is a currently active mission in it, it's the current system the player is in, or it has had search and
+        rescue items collected there, otherwise it is left behind. Kept systems carry forward their faction states and
+        conflict opponents, search and rescue items collected but not yet delivered, Thargoid war status and overlay
+        pinning, and all other activity starts from zero. Only the kept systems are built, so this is quick however many
+        systems had activity in this tick.
 
-        # Need to convert keys to list so we can delete as we iterate
-        for system_address in list(self.systems.keys()):
-            system = self.systems[system_address]
+        Args:
+            tick (Tick): The new tick
+            forced (bool): True if the new tick was forced by the user
+            mission_log (MissionLog): The mission log, to find systems with active missions
+
+        Returns:
+            Activity: The new Activity
+        """
+        new_activity:Activity = Activity(self.bgstally, tick)
+        new_activity.tick_forced = forced
+        new_activity.dirty = True
+        mission_systems:set = set(mission_log.get_active_systems())
+
+        for system_address, system in self.systems.items():
             # Note that the missions log historically stores system name so we check for that, not system address.
             # Potential for very rare bug here for systems with duplicate names.
-            if system['System'] in mission_systems or \
-                    self.bgstally.state.current_system_id == system_address or \
-                    sum(int(d['scooped']) for d in system['TWSandR'].values()) > 0:
-                # The system has a current mission, or it's the current system, or it has TWSandR scoops - zero, don't delete
-                for faction_name, faction_data in system['Factions'].items():
-                    system['Factions'][faction_name] = self._get_new_faction_data(faction_name, faction_data['FactionState'])
-                system['TWKills'] = self._get_new_tw_kills_data()
-                # Note: system['TWSandR'] scooped data is carried forward, delivered data is cleared
-                for d in system['TWSandR'].values():
-                    d['delivered'] = 0
-            else:
-                # Delete the whole system
-                del self.systems[system_address]
+            if system['System'] not in mission_systems and \
+                    self.bgstally.state.current_system_id != system_address and \
+                    system['Totals']['TWSandRScooped'] == 0:
+                continue
+
+            factions:dict = {}
+            for faction_name, faction_data in system['Factions'].items():
+                factions[faction_name] = new_activity._get_new_faction_data(faction_name, faction_data['FactionState'])
+                if 'Opponent' in faction_data: factions[faction_name]['Opponent'] = faction_data['Opponent']
+
+            new_system:dict = new_activity._get_new_system_data(system['System'], system['SystemAddress'], factions)
+            new_system['PinToOverlay'] = system.get('PinToOverlay', CheckStates.STATE_OFF)
+            if 'tw_status' in system: new_system['tw_status'] = deepcopy(system['tw_status'])
+
+            # TWSandR scooped data is carried forward, delivered data is cleared
+            for key, sandr_data in system['TWSandR'].items():
+                new_activity._add_tw_sandr(new_system, key, scooped=int(sandr_data['scooped']))
+
+            new_activity._add_system(new_system)
+
+        return new_activity
 
 
     #
@@ -293,20 +392,14 @@ class Activity:
         if journal_entry.get('SystemAddress') == None or journal_entry.get('StarSystem') == None: return
 
         self.dirty = True
-        current_system = None
-
-        for system_address in self.systems:
-            if system_address == str(journal_entry['SystemAddress']):
-                # We already have an entry for this system
-                current_system = self.systems[system_address]
-                break
+        current_system:dict|None = self.systems.get(str(journal_entry['SystemAddress']))
 
         if current_system is None:
             # We don't have this system yet
             current_system = self._get_new_system_data(journal_entry['StarSystem'], journal_entry['SystemAddress'], {})
-            self.systems[str(journal_entry['SystemAddress'])] = current_system
+            self._add_system(current_system)
 
-        self._update_system_data(current_system)
+        self.system_changed(journal_entry['SystemAddress'])
 
         if 'Factions' in journal_entry:
             for faction in journal_entry['Factions']:
@@ -317,8 +410,7 @@ class Activity:
 
                 if faction['Name'] in current_system['Factions']:
                     # We have this faction, ensure it's up to date with latest state
-                    faction_data = current_system['Factions'][faction['Name']]
-                    self._update_faction_data(faction_data, faction_state)
+                    current_system['Factions'][faction['Name']]['FactionState'] = faction_state
                 else:
                     # We do not have this faction, create a new clean entry
                     current_system['Factions'][faction['Name']] = self._get_new_faction_data(faction['Name'], faction_state)
@@ -359,53 +451,53 @@ class Activity:
             if faction_effect['Influence'] != []:
                 inf_index: str = str(len(faction_effect['Influence'][0]['Influence'])) # Index into dict containing detailed INF breakdown
                 inftrend = faction_effect['Influence'][0]['Trend']
-                for system_address, system in self.systems.items():
-                    if str(faction_effect['Influence'][0]['SystemAddress']) != system_address: continue
+                system_address:str = str(faction_effect['Influence'][0]['SystemAddress'])
+                system:dict|None = self.systems.get(system_address)
+                faction:dict|None = system['Factions'].get(effect_faction_name) if system else None
 
-                    faction = system['Factions'].get(effect_faction_name)
-                    if not faction: continue
+                if faction:
+                    self.system_changed(system_address)
 
                     if inftrend == "UpGood" or inftrend == "DownGood":
                         if effect_faction_name == journal_entry['Faction']:
-                            faction['MissionPoints'][inf_index] += 1
+                            self._add_mission_points(faction, inf_index, 1)
                             self.bgstally.ui.show_system_report(system_address) # Only show system report for primary INF
                         else:
-                            faction['MissionPointsSecondary'][inf_index] += 1
+                            self._add_mission_points(faction, inf_index, 1, primary=False)
                     else:
                         if effect_faction_name == journal_entry['Faction']:
-                            faction['MissionPoints'][inf_index] -= 1
+                            self._add_mission_points(faction, inf_index, -1)
                             self.bgstally.ui.show_system_report(system_address) # Only show system report for primary INF
                         else:
-                            faction['MissionPointsSecondary'][inf_index] -= 1
+                            self._add_mission_points(faction, inf_index, -1, primary=False)
 
             elif mission is not None:  # No influence specified for faction effect
-                for system_address, system in self.systems.items():
-                    if mission['System'] != system['System']: continue
-
-                    faction = system['Factions'].get(effect_faction_name)
-                    if not faction: continue
+                system:dict|None = self.get_system_by_name(mission['System'])
+                faction:dict|None = system['Factions'].get(effect_faction_name) if system else None
 
-                    if effect_faction_name == journal_entry['Faction']:
-                        inf_index: str|None = None
+                if faction and effect_faction_name == journal_entry['Faction']:
+                    inf_index: str|None = None
 
-                        if faction['FactionState'] in STATES_ELECTION and journal_entry['Name'] in MISSIONS_ELECTION:
-                            inf_index = 1 # Default to +1 INF for election missions
-                        elif faction['FactionState'] in STATES_WAR and journal_entry['Name'] in MISSIONS_WAR:
-                            inf_index = 2 # Default to +2 INF for war missions
+                    if faction['FactionState'] in STATES_ELECTION and journal_entry['Name'] in MISSIONS_ELECTION:
+                        inf_index = 1 # Default to +1 INF for election missions
+                    elif faction['FactionState'] in STATES_WAR and journal_entry['Name'] in MISSIONS_WAR:
+                        inf_index = 2 # Default to +2 INF for war missions
 
-                        if inf_index is not None:
-                            faction['MissionPoints'][inf_index] += 1
-                            self.bgstally.ui.show_system_report(system_address) # Only show system report for primary INF
+                    if inf_index is not None:
+                        self._add_mission_points(faction, inf_index, 1)
+                        self.system_changed(system['SystemAddress'])
+                        self.bgstally.ui.show_system_report(system['SystemAddress']) # Only show system report for primary INF
 
         # Thargoid War
         if journal_entry['Name'] in MISSIONS_TW_COLLECT + MISSIONS_TW_EVAC_LOW + MISSIONS_TW_EVAC_MED + MISSIONS_TW_EVAC_HIGH + MISSIONS_TW_MASSACRE + MISSIONS_TW_REACTIVATE and mission is not None:
             mission_station = mission.get('Station', "")
             if mission_station != "":
-                for system_address, system in self.systems.items():
-                    if mission['System'] != system['System']: continue
-                    faction = system['Factions'].get(journal_entry['Faction'])
-                    if not faction: continue
+                system:dict|None = self.get_system_by_name(mission['System'])
+                faction:dict|None = system['Factions'].get(journal_entry['Faction']) if system else None
 
+                if faction:
+                    system_address:str = str(system['SystemAddress'])
+                    self.system_changed(system_address)
                     tw_stations = faction['TWStations']
                     if mission_station not in tw_stations:
                         tw_stations[mission_station] = self._get_new_tw_station_data(mission_station)
@@ -418,6 +510,7 @@ class Activity:
                         destination_system = self.get_system_by_name(mission['DestinationSystem'])
                         if destination_system is not None:
                             destination_system['TWReactivate'] += 1
+                            self.system_changed(destination_system['SystemAddress'])
                     elif mission.get('PassengerCount', -1) > -1:
                         self.bgstally.ui.show_system_report(system_address)
 
@@ -482,17 +575,18 @@ class Activity:
         if mission is None: return
         self.dirty = True
 
-        for system in self.systems.values():
-            if mission['System'] != system['System']: continue
+        system:dict|None = self.get_system_by_name(mission['System'])
+        if system is None: return
 
-            self.bgstally.ui.show_system_report(system['SystemAddress'])
+        self.bgstally.ui.show_system_report(system['SystemAddress'])
 
-            faction = system['Factions'].get(mission['Faction'])
-            if faction: faction['MissionFailed'] += 1
+        faction = system['Factions'].get(mission['Faction'])
+        if faction:
+            faction['MissionFailed'] += 1
+            self.system_changed(system['SystemAddress'])
 
-            mission_log.delete_mission_by_id(mission['MissionID'])
-            self.recalculate_zero_activity()
-            break
+        mission_log.delete_mission_by_id(mission['MissionID'])
+        self.recalculate_zero_activity()
 
 
     def exploration_data_sold(self, journal_entry: Dict, state: State):
@@ -513,6 +607,7 @@ class Activity:
             if total_earnings < base_value + bonus: total_earnings = base_value + bonus
 
             faction['CartData'] += total_earnings
+            self.system_changed(current_system['SystemAddress'])
             self.recalculate_zero_activity()
 
 
@@ -530,6 +625,7 @@ class Activity:
 
             for e in journal_entry['BioData']:
                 faction['ExoData'] += e['Value'] + e['Bonus']
+            self.system_changed(current_system['SystemAddress'])
             self.recalculate_zero_activity()
 
 
@@ -569,6 +665,7 @@ class Activity:
                     faction['Bounties'] += (bv_info['Amount'] / 2)
                 else:
                     faction['Bounties'] += bv_info['Amount']
+                self.system_changed(current_system['SystemAddress'])
                 self.recalculate_zero_activity()
 
 
@@ -620,6 +717,7 @@ class Activity:
             self.bgstally.ui.show_system_report(current_system['SystemAddress'])
 
             faction['CombatBonds'] += journal_entry['Amount']
+            self.system_changed(current_system['SystemAddress'])
             self.recalculate_zero_activity()
 
 
@@ -639,6 +737,7 @@ class Activity:
             self.dirty = True
 
             faction['SpaceCZ']['cs'] = int(faction['SpaceCZ'].get('cs', '0')) + 1
+            self.system_changed(current_system['SystemAddress'])
 
             self.bgstally.ui.show_system_report(current_system['SystemAddress'])
             self.recalculate_zero_activity()
@@ -662,8 +761,8 @@ class Activity:
                 market_data:dict = self.bgstally.market.get_commodity(journal_entry['Type'])
                 bracket = market_data.get('StockBracket', 0)
 
-            faction['TradeBuy'][bracket]['value'] += journal_entry['TotalCost']
-            faction['TradeBuy'][bracket]['items'] += journal_entry['Count']
+            self._add_trade_purchase(faction, bracket, journal_entry['Count'], journal_entry['TotalCost'])
+            self.system_changed(current_system['SystemAddress'])
 
             self.recalculate_zero_activity()
 
@@ -697,10 +796,9 @@ class Activity:
                     market_data:dict = self.bgstally.market.get_commodity(journal_entry['Type'])
                     bracket = market_data.get('DemandBracket', 0)
 
-                faction['TradeSell'][bracket]['profit'] += profit
-                faction['TradeSell'][bracket]['value'] += journal_entry['TotalSale']
-                faction['TradeSell'][bracket]['items'] += journal_entry['Count']
+                self._add_trade_sale(faction, bracket, journal_entry['Count'], journal_entry['TotalSale'], profit)
 
+            self.system_changed(current_system['SystemAddress'])
             self.recalculate_zero_activity()
 
 
@@ -750,6 +848,7 @@ class Activity:
 
                 if faction:
                     faction['Murdered'] += 1
+                    self.system_changed(current_system['SystemAddress'])
                     self.recalculate_zero_activity()
 
                     self.bgstally.ui.show_system_report(current_system['SystemAddress'])
@@ -759,6 +858,7 @@ class Activity:
                 faction = current_system['Factions'].get(journal_entry['Faction'])
                 if faction:
                     faction['GroundMurdered'] += 1
+                    self.system_changed(current_system['SystemAddress'])
                     self.recalculate_zero_activity()
 
                     self.bgstally.ui.show_system_report(current_system['SystemAddress'])
@@ -791,7 +891,7 @@ class Activity:
 
         if key is None: return
 
-        current_system['TWSandR'][key]['scooped'] += 1
+        self._add_tw_sandr(current_system, key, scooped=1)
         self.dirty = True
 
 
@@ -848,6 +948,7 @@ class Activity:
             self.bgstally.ui.show_system_report(current_system['SystemAddress'])
 
             faction['SandR'][key] += count
+            self.system_changed(current_system['SystemAddress'])
             self.recalculate_zero_activity()
 
         # Handle TW S&R
@@ -910,38 +1011,177 @@ class Activity:
 
     def recalculate_zero_activity(self):
         """
-        For efficiency at display time, we store whether each system has had any activity in the data structure
+        For efficiency at display time, we store whether each system has had any activity in the data structure. Only
+        the systems passed to system_changed() since the last recalculation are checked, so the cost doesn't depend on
+        how many systems we are tracking.
         """
-        for system in self.systems.values():
-            self._update_system_data(system)
-            system['zero_system_activity'] = True
+        # Pop one at a time, as the activity window can mark systems changed from the Tk thread
+        while self.zero_activity_changed:
+            system:dict|None = self.systems.get(self.zero_activity_changed.pop())
+            if system is not None: self._update_zero_activity(system)
 
-            for faction_data in system['Factions'].values():
-                self._update_faction_data(faction_data)
-                if not self._is_faction_data_zero(faction_data):
-                    system['zero_system_activity'] = False
 
-            if system['zero_system_activity'] == False: continue
+    def set_manual_mission_points(self, faction:dict, value:int, primary:bool = True):
+        """Set the manually entered INF for a faction, as opposed to INF from completed missions at each level
 
-            if sum(system['TWKills'].values()) > 0: system['zero_system_activity'] = False
+        Args:
+            faction (dict): The faction data
+            value (int): The new manual INF
+            primary (bool, optional): True for primary INF, False for secondary INF. Defaults to True.
+        """
+        mission_points:dict = faction['MissionPoints'] if primary else faction['MissionPointsSecondary']
+        self._add_mission_points(faction, 'm', value - int(mission_points['m']), primary)
 
-            if system['zero_system_activity'] == False: continue
 
-            if sum(int(d['delivered']) for d in system['TWSandR'].values()) > 0: system['zero_system_activity'] = False
+    def check_totals(self, repair:bool = False) -> list[str]:
+        """Check the running totals stored against every system and faction by recalculating them all from the detailed
+        data. The totals are kept up to date as activity is recorded, so any differences mean something has changed the
+        detailed data directly.
 
-            if system['zero_system_activity'] == False: continue
+        Args:
+            repair (bool, optional): Replace any totals that are wrong with the recalculated values. Defaults to False.
+
+        Returns:
+            list[str]: A description of each set of totals that is wrong, empty if all are correct
+        """
+        problems:list[str] = []
+
+        for system in self.systems.values():
+            totals:dict = self._calculate_system_totals(system)
+            if system.get('Totals') != totals:
+                problems.append(f"System {system['System']}: {system.get('Totals')} should be {totals}")
+                if repair: system['Totals'] = totals
+
+            for faction in system['Factions'].values():
+                totals = self._calculate_faction_totals(faction)
+                if faction.get('Totals') != totals:
+                    problems.append(f"Faction {faction['Faction']} in {system['System']}: {faction.get('Totals')} should be {totals}")
+                    if repair: faction['Totals'] = totals
+
+        return problems
 
 
     #
     # Private functions
     #
 
+    def _add_system(self, system:dict):
+        """
+        Add a new system to the activity, keeping the name index in step
+        """
+        system_address:str = str(system['SystemAddress'])
+        self.systems[system_address] = system
+        self.system_names[system['System']] = system_address
+
+
+    def _index_systems(self):
+        """
+        Rebuild the name index from scratch. Only needed when systems are replaced wholesale, e.g. on load.
+        """
+        self.system_names = {system['System']: system_address for system_address, system in self.systems.items()}
+
+
+    def _add_mission_points(self, faction:dict, inf_index:str, amount:int, primary:bool = True):
+        """
+        Add INF to a faction at a given level, '1' - '5' or 'm' for manually entered INF, keeping its running totals in step
+        """
+        inf_index = str(inf_index)
+
+        if primary:
+            faction['MissionPoints'][inf_index] += amount
+            faction['Totals']['Inf'] += (1 if inf_index == 'm' else int(inf_index)) * amount
+        else:
+            faction['MissionPointsSecondary'][inf_index] += amount
+            faction['Totals']['InfSecondary'] += (1 if inf_index == 'm' else int(inf_index)) * amount
+
+
+    def _add_trade_purchase(self, faction:dict, bracket:int, items:int, value:int):
+        """
+        Add a trade purchase to a faction in a given supply bracket, keeping its running totals in step
+        """
+        faction['TradeBuy'][bracket]['items'] += items
+        faction['TradeBuy'][bracket]['value'] += value
+        faction['Totals']['TradeBuy'] += value
+
+
+    def _add_trade_sale(self, faction:dict, bracket:int, items:int, value:int, profit:int):
+        """
+        Add a trade sale to a faction in a given demand bracket, keeping its running totals in step
+        """
+        faction['TradeSell'][bracket]['items'] += items
+        faction['TradeSell'][bracket]['value'] += value
+        faction['TradeSell'][bracket]['profit'] += profit
+        faction['Totals']['TradeSell'] += value
+        faction['Totals']['TradeProfit'] += profit
+
+
+    def _add_tw_kill(self, system:dict, tw_ship:str):
+        """
+        Add a Thargoid kill to a system, keeping its running totals in step
+        """
+        system['TWKills'][tw_ship] = system['TWKills'].get(tw_ship, 0) + 1
+        system['Totals']['TWKills'] += 1
+
+
+    def _add_tw_sandr(self, system:dict, key:str, scooped:int = 0, delivered:int = 0):
+        """
+        Add to the TW search and rescue items scooped and delivered in a system, keeping its running totals in step.
+        Either can be negative.
+        """
+        system['TWSandR'][key]['scooped'] += scooped
+        system['TWSandR'][key]['delivered'] += delivered
+        system['Totals']['TWSandRScooped'] += scooped
+        system['Totals']['TWSandRDelivered'] += delivered
+
+
+    def _calculate_system_totals(self, system:dict) -> dict:
+        """
+        Calculate the running totals for a system from scratch
+        """
+        return {'TWKills': sum(int(v) for v in system['TWKills'].values()),
+                'TWSandRScooped': sum(int(d['scooped']) for d in system['TWSandR'].values()),
+                'TWSandRDelivered': sum(int(d['delivered']) for d in system['TWSandR'].values())}
+
+
+    def _calculate_faction_totals(self, faction:dict) -> dict:
+        """
+        Calculate the running totals for a faction from scratch
+        """
+        return {'Inf': sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction['MissionPoints'].items()),
+                'InfSecondary': sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction['MissionPointsSecondary'].items()),
+                'TradeBuy': sum(int(d['value']) for d in faction['TradeBuy']),
+                'TradeSell': sum(int(d['value']) for d in faction['TradeSell']),
+                'TradeProfit': sum(int(d['profit']) for d in faction['TradeSell'])}
+
+
+    def _recalculate_all_zero_activity(self):
+        """
+        Recalculate the zero activity flags for every system. Only needed when data is loaded, all later changes are
+        tracked by system_changed().
+        """
+        for system in self.systems.values():
+            self._update_zero_activity(system)
+
+        self.zero_activity_changed.clear()
+
+
+    def _update_zero_activity(self, system:dict):
+        """
+        Calculate the zero activity flag for a single system
+        """
+        system['zero_system_activity'] = all(self._is_faction_data_zero(faction_data) for faction_data in system['Factions'].values()) and \
+                                         system['Totals']['TWKills'] == 0 and \
+                                         system['Totals']['TWSandRDelivered'] == 0
+
     def _cb_tw(self, journal_entry:dict, current_system:dict):
         """
         We are logging a Thargoid kill
         """
         tw_ship:str = TW_CBS.get(journal_entry.get('Reward', 0))
-        if tw_ship: current_system['TWKills'][tw_ship] = current_system['TWKills'].get(tw_ship, 0) + 1
+        if tw_ship:
+            self._add_tw_kill(current_system, tw_ship)
+            self.system_changed(current_system['SystemAddress'])
+            self.recalculate_zero_activity()
 
         self.bgstally.ui.show_system_report(current_system['SystemAddress'])
 
@@ -954,6 +1194,7 @@ class Activity:
         if not faction: return
 
         self.dirty = True
+        self.system_changed(current_system['SystemAddress'])
 
         self.bgstally.ui.show_system_report(current_system['SystemAddress'])
 
@@ -1020,6 +1261,9 @@ class Activity:
 
         # Check for side objectives detected by CBs
         if state.last_ship_targeted != {} and journal_entry.get('VictimFaction') != state.last_spacecz_approached.get('ally_faction'):
+            # May or may not tally a side objective below, but this is far cheaper than checking each case
+            self.system_changed(current_system['SystemAddress'])
+
             if state.last_ship_targeted.get('PilotName', "") in SPACECZ_PILOTNAMES_CAPTAIN and not state.last_spacecz_approached.get('capt'):
                 # Tally a captain kill. Unreliable because of journal order unpredictability.
                 state.last_spacecz_approached['capt'] = True
@@ -1047,6 +1291,7 @@ class Activity:
 
         type:str = state.last_spacecz_approached.get('type', 'l')
         faction['SpaceCZ'][type] = int(faction['SpaceCZ'].get(type, '0')) + 1
+        self.system_changed(current_system['SystemAddress'])
 
         self.bgstally.ui.show_system_report(current_system['SystemAddress'])
         self.recalculate_zero_activity()
@@ -1069,6 +1314,7 @@ class Activity:
 
         # The scenario should be counted against the opponent faction of the ship just killed
         opponent_faction['Scenarios'] += 1
+        self.system_changed(current_system['SystemAddress'])
 
         self.bgstally.ui.show_system_report(current_system['SystemAddress'])
         self.recalculate_zero_activity()
@@ -1088,10 +1334,10 @@ class Activity:
 
             allocatable:int = min(count, system['TWSandR'][key]['scooped'])
             if allocatable > 0:
-                system['TWSandR'][key]['scooped'] -= allocatable
-                if tally: system['TWSandR'][key]['delivered'] += allocatable
+                self._add_tw_sandr(system, key, scooped=-allocatable, delivered=allocatable if tally else 0)
                 count -= allocatable
                 self.dirty = True
+                self.system_changed(system['SystemAddress'])
 
                 if tally: self.bgstally.ui.show_system_report(system['SystemAddress'])
 
@@ -1109,6 +1355,7 @@ class Activity:
             system['TWSandR']['tp']['scooped'] = 0
             system['TWSandR']['bb']['scooped'] = 0
             system['TWSandR']['t']['scooped'] = 0
+            system['Totals']['TWSandRScooped'] = 0
 
         self.dirty = True
 
@@ -1119,15 +1366,17 @@ class Activity:
         Returns:
             dict: The sample system data
         """
-        return {'System': "Sample System Name",
-                'SystemAddress': 1,
-                'zero_system_activity': False,
-                'Factions': {"Sample Faction Name 1": self._get_new_faction_data("Sample Faction Name 1", "None", True),
-                             "Sample Faction Name 2": self._get_new_faction_data("Sample Faction Name 2", "None", True),
-                             "Sample Faction Name 3": self._get_new_faction_data("Sample Faction Name 3", "None", True)},
-                'TWKills': self._get_new_tw_kills_data(True),
-                'TWSandR': self._get_new_tw_sandr_data(True),
-                'TWReactivate': 5}
+        system_data:dict = {'System': "Sample System Name",
+                            'SystemAddress': 1,
+                            'zero_system_activity': False,
+                            'Factions': {"Sample Faction Name 1": self._get_new_faction_data("Sample Faction Name 1", "None", True),
+                                         "Sample Faction Name 2": self._get_new_faction_data("Sample Faction Name 2", "None", True),
+                                         "Sample Faction Name 3": self._get_new_faction_data("Sample Faction Name 3", "None", True)},
+                            'TWKills': self._get_new_tw_kills_data(True),
+                            'TWSandR': self._get_new_tw_sandr_data(True),
+                            'TWReactivate': 5}
+        system_data['Totals'] = self._calculate_system_totals(system_data)
+        return system_data
 
 
     def _get_new_system_data(self, system_name: str, system_address: str, faction_data: dict) -> dict:
@@ -1147,7 +1396,9 @@ class Activity:
                 'Factions': faction_data,
                 'TWKills': self._get_new_tw_kills_data(),
                 'TWSandR': self._get_new_tw_sandr_data(),
-                'TWReactivate': 0}
+                'TWReactivate': 0,
+                'PinToOverlay': CheckStates.STATE_OFF,
+                'Totals': {'TWKills': 0, 'TWSandRScooped': 0, 'TWSandRDelivered': 0}}
 
 
     def _get_new_faction_data(self, faction_name: str, faction_state: str, sample: bool = False) -> dict:
@@ -1162,20 +1413,22 @@ class Activity:
             dict: The faction data
         """
         s: bool = sample # Shorter
-        return {'Faction': faction_name, 'FactionState': faction_state, 'Enabled': self.bgstally.state.EnableSystemActivityByDefault.get(),
-                'MissionPoints': {'1': 3 if s else 0, '2': 4 if s else 0, '3': 5 if s else 0, '4': 6 if s else 0, '5': 7 if s else 0, 'm': 8 if s else 0},
-                'MissionPointsSecondary': {'1': 3 if s else 0, '2': 4 if s else 0, '3': 5 if s else 0, '4': 6 if s else 0, '5': 7 if s else 0, 'm': 8 if s else 0},
-                'BlackMarketProfit': 50000 if s else 0, 'Bounties': 1000000 if s else 0, 'CartData': 2000000 if s else 0, 'ExoData': 3000000 if s else 0,
-                'TradeBuy': [{'items': 100 if s else 0, 'value': 100000 if s else 0}, {'items': 200 if s else 0, 'value': 200000 if s else 0}, {'items': 300 if s else 0, 'value': 300000 if s else 0}, {'items': 400 if s else 0, 'value': 400000 if s else 0}],
-                'TradeSell': [{'items': 100 if s else 0, 'value': 100000 if s else 0, 'profit': 1000 if s else 0}, {'items': 200 if s else 0, 'value': 200000 if s else 0, 'profit': 2000 if s else 0}, {'items': 300 if s else 0, 'value': 300000 if s else 0, 'profit': 3000 if s else 0}, {'items': 400 if s else 0, 'value': 400000 if s else 0, 'profit': 4000 if s else 0}],
-                'CombatBonds': 1000000 if s else 0, 'MissionFailed': 10 if s else 0, 'Murdered': 30 if s else 0, 'GroundMurdered': 20 if s else 0,
-                'SpaceCZ': {'l': 3 if s else 0, 'm': 4 if s else 0, 'h': 5 if s else 0, 'cs': 1 if s else 0, 'cp': 2 if s else 0, 'so': 3 if s else 0, 'pr': 4 if s else 0},
-                'GroundCZ': {'l': 3 if s else 0, 'm': 4 if s else 0, 'h': 5 if s else 0},
-                'GroundCZSettlements': {"Sample Ground Settlement Name": self._get_new_groundcz_settlement_data('l', s)} if s else {},
-                'Scenarios': 5 if s else 0,
-                'SandR': {'dp': 3 if s else 0, 'op': 4 if s else 0, 'tp': 5 if s else 0, 'bb': 6 if s else 0, 'wc': 7 if s else 0, 'pe': 8 if s else 0, 'pp': 9 if s else 0, 'h': 10 if s else 0},
-                'TWStations': {"Sample Station Name": self._get_new_tw_station_data("Station Name", s)} if s else {}
-                }
+        faction_data:dict = {'Faction': faction_name, 'FactionState': faction_state, 'Enabled': self.bgstally.state.EnableSystemActivityByDefault.get(),
+                             'MissionPoints': {'1': 3 if s else 0, '2': 4 if s else 0, '3': 5 if s else 0, '4': 6 if s else 0, '5': 7 if s else 0, 'm': 8 if s else 0},
+                             'MissionPointsSecondary': {'1': 3 if s else 0, '2': 4 if s else 0, '3': 5 if s else 0, '4': 6 if s else 0, '5': 7 if s else 0, 'm': 8 if s else 0},
+                             'BlackMarketProfit': 50000 if s else 0, 'Bounties': 1000000 if s else 0, 'CartData': 2000000 if s else 0, 'ExoData': 3000000 if s else 0,
+                             'TradeBuy': [{'items': 100 if s else 0, 'value': 100000 if s else 0}, {'items': 200 if s else 0, 'value': 200000 if s else 0}, {'items': 300 if s else 0, 'value': 300000 if s else 0}, {'items': 400 if s else 0, 'value': 400000 if s else 0}],
+                             'TradeSell': [{'items': 100 if s else 0, 'value': 100000 if s else 0, 'profit': 1000 if s else 0}, {'items': 200 if s else 0, 'value': 200000 if s else 0, 'profit': 2000 if s else 0}, {'items': 300 if s else 0, 'value': 300000 if s else 0, 'profit': 3000 if s else 0}, {'items': 400 if s else 0, 'value': 400000 if s else 0, 'profit': 4000 if s else 0}],
+                             'CombatBonds': 1000000 if s else 0, 'MissionFailed': 10 if s else 0, 'Murdered': 30 if s else 0, 'GroundMurdered': 20 if s else 0,
+                             'SpaceCZ': {'l': 3 if s else 0, 'm': 4 if s else 0, 'h': 5 if s else 0, 'cs': 1 if s else 0, 'cp': 2 if s else 0, 'so': 3 if s else 0, 'pr': 4 if s else 0},
+                             'GroundCZ': {'l': 3 if s else 0, 'm': 4 if s else 0, 'h': 5 if s else 0},
+                             'GroundCZSettlements': {"Sample Ground Settlement Name": self._get_new_groundcz_settlement_data('l', s)} if s else {},
+                             'Scenarios': 5 if s else 0,
+                             'SandR': {'dp': 3 if s else 0, 'op': 4 if s else 0, 'tp': 5 if s else 0, 'bb': 6 if s else 0, 'wc': 7 if s else 0, 'pe': 8 if s else 0, 'pp': 9 if s else 0, 'h': 10 if s else 0},
+                             'TWStations': {"Sample Station Name": self._get_new_tw_station_data("Station Name", s)} if s else {}
+                             }
+        faction_data['Totals'] = self._calculate_faction_totals(faction_data)
+        return faction_data
 
 
     def _get_new_tw_station_data(self, station_name: str, sample: bool = False) -> dict:
@@ -1242,86 +1495,14 @@ class Activity:
         return {'count': 5 if s else 0, 'enabled': CheckStates.STATE_ON, 'type': type}
 
 
-    def _update_system_data(self, system_data:dict):
-        """
-        Update system data structure for elements not present in previous versions of plugin
-        """
-        # From < v3.1.0 to 3.1.0
-        if not 'TWKills' in system_data: system_data['TWKills'] = self._get_new_tw_kills_data()
-        if not 'TWSandR' in system_data: system_data['TWSandR'] = self._get_new_tw_sandr_data()
-        # From < 3.2.0 to 3.2.0
-        if not 'TWReactivate' in system_data: system_data['TWReactivate'] = 0
-        # From < 3.6.0 to 3.6.0
-        if not 'PinToOverlay' in system_data: system_data['PinToOverlay'] = CheckStates.STATE_OFF
-        if not 'tp' in system_data['TWSandR']: system_data['TWSandR']['tp'] = {'scooped': 0, 'delivered': 0}
-
-
-    def _update_faction_data(self, faction_data: Dict, faction_state: str = None):
-        """
-        Update faction data structure for elements not present in previous versions of plugin
-        """
-        # Update faction state as it can change at any time post-tick
-        if faction_state: faction_data['FactionState'] = faction_state
-
-        # From < v1.2.0 to 1.2.0
-        if not 'SpaceCZ' in faction_data: faction_data['SpaceCZ'] = {}
-        if not 'GroundCZ' in faction_data: faction_data['GroundCZ'] = {}
-        # From < v1.3.0 to 1.3.0
-        if not 'Enabled' in faction_data: faction_data['Enabled'] = CheckStates.STATE_ON
-        # From < v1.6.0 to 1.6.0
-        if not 'MissionPointsSecondary' in faction_data: faction_data['MissionPointsSecondary'] = 0
-        # From < v1.7.0 to 1.7.0
-        if not 'ExoData' in faction_data: faction_data['ExoData'] = 0
-        if not 'GroundCZSettlements' in faction_data: faction_data['GroundCZSettlements'] = {}
-        # From < v1.8.0 to 1.8.0
-        if not 'BlackMarketProfit' in faction_data: faction_data['BlackMarketProfit'] = 0
-        if not 'TradePurchase' in faction_data: faction_data['TradePurchase'] = 0
-        # From < v1.9.0 to 1.9.0
-        if not 'Scenarios' in faction_data: faction_data['Scenarios'] = 0
-        # From < v2.2.0 to 2.2.0
-        if not 'TWStations' in faction_data: faction_data['TWStations'] = {}
-        # 2.2.0-a1 - 2.2.0-a3 stored a single integer for passengers,  escapepods and cargo in TW station data. 2.2.0-a4 onwards has a dict for each.
-        # Put the previous values for passengers and escapepods into the 'm' 'sum' entries in the dict, for want of a better place.
-        # Put the previous value for cargo into the 'sum' entry in the dict.
-        # The previous mission count value was aggregate across all passengers, escape pods and cargo so just plonk in escapepods for want of a better place.
-        # We can remove all this code on release of final 2.2.0
-        for station in faction_data['TWStations'].values():
-            if not type(station.get('passengers')) == dict:
-                station['passengers'] = {'l': {'count': 0, 'sum': 0}, 'm': {'count': 0, 'sum': station['passengers']}, 'h': {'count': 0, 'sum': 0}}
-            if not type(station.get('escapepods')) == dict:
-                station['escapepods'] = {'l': {'count': 0, 'sum': 0}, 'm': {'count': station['missions'], 'sum': station['escapepods']}, 'h': {'count': 0, 'sum': 0}}
-            if not type(station.get('cargo')) == dict:
-                station['cargo'] = {'count': 0, 'sum': station['cargo']}
-            if not type(station.get('massacre')) == dict:
-                station['massacre'] = {'s': {'count': 0, 'sum': 0}, 'c': {'count': 0, 'sum': 0}, 'b': {'count': 0, 'sum': 0}, 'm': {'count': 0, 'sum': 0}, 'h': {'count': 0, 'sum': 0}, 'o': {'count': 0, 'sum': 0}}
-        # From < 3.0.0 to 3.0.0
-        if not 'GroundMurdered' in faction_data: faction_data['GroundMurdered'] = 0
-        if not 'TradeBuy' in faction_data:
-            faction_data['TradeBuy'] = [{'items': 0, 'value': 0}, {'items': 0, 'value': 0}, {'items': 0, 'value': 0}, {'items': 0, 'value': 0}]
-        if not 'TradeSell' in faction_data:
-            faction_data['TradeSell'] = [{'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}]
-        # From < 3.2.0 to 3.2.0
-        for station in faction_data['TWStations'].values():
-            if not 'reactivate' in station: station['reactivate'] = 0
-        # From < 3.5.0 to 3.5.0
-        if not type(faction_data.get('MissionPoints', 0)) == dict:
-            faction_data['MissionPoints'] = {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, 'm': int(faction_data.get('MissionPoints', 0))}
-        if not type(faction_data.get('MissionPointsSecondary', 0)) == dict:
-            faction_data['MissionPointsSecondary'] = {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, 'm': int(faction_data.get('MissionPointsSecondary', 0))}
-        # From < 4.0.0 to 4.0.0
-        if not 'SandR' in faction_data: faction_data['SandR'] = {'dp': 0, 'op': 0, 'tp': 0, 'bb': 0, 'wc': 0, 'pe': 0, 'pp': 0, 'h': 0}
-
-
     def _is_faction_data_zero(self, faction_data: Dict):
         """
-        Check whether all information is empty or zero for a faction. _update_faction_data() is always called before this
-        so we can always assume here that the data is in the very latest structure.
+        Check whether all information is empty or zero for a faction. Data is always migrated to the current schema when it
+        is loaded, so we can always assume here that the data is in the very latest structure.
         """
-        return sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPoints'].items()) == 0 and \
-                sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPointsSecondary'].items()) == 0 and \
-                int(faction_data['BlackMarketProfit']) == 0 and \
-                sum(int(d['value']) for d in faction_data['TradeBuy']) == 0 and \
-                sum(int(d['value']) for d in faction_data['TradeSell']) == 0 and \
+        totals:dict = faction_data['Totals']
+        return totals['Inf'] == 0 and totals['InfSecondary'] == 0 and \
+                totals['TradeBuy'] == 0 and totals['TradeSell'] == 0 and \
                 int(faction_data['BlackMarketProfit']) == 0 and \
                 int(faction_data['Bounties']) == 0 and int(faction_data['CartData']) == 0 and int(faction_data['ExoData']) == 0 and \
                 int(faction_data['CombatBonds']) == 0 and int(faction_data['MissionFailed']) == 0 and int(faction_data['Murdered']) == 0 and int(faction_data['GroundMurdered']) == 0 and \
@@ -1343,6 +1524,7 @@ class Activity:
             'tickforced': self.tick_forced,
             'discordwebhookdata': self.discord_webhook_data,
             'discordnotes': self.discord_notes,
+            'schema_version': SCHEMA_VERSION,
             'systems': self.systems}
 
 
@@ -1356,6 +1538,8 @@ class Activity:
         self.discord_webhook_data = dict.get('discordwebhookdata', {})
         self.discord_notes = dict.get('discordnotes', "")
         self.systems = dict.get('systems', {})
+        self.system_versions = {}
+        self._index_systems()
 
 
 
@@ -1394,6 +1578,10 @@ class Activity:
 
         # Copied items
         setattr(result, 'bgstally', self.bgstally)
+        setattr(result, 'lock', RLock()) # The copy is a separate set of data, so has its own lock
+        setattr(result, 'system_names', dict(self.system_names))
+        setattr(result, 'system_versions', {}) # The copy is a separate set of data, so starts with fresh versions
+        setattr(result, 'zero_activity_changed', set(self.zero_activity_changed))
         setattr(result, 'tick_id', self.tick_id)
         setattr(result, 'tick_time', self.tick_time)
         setattr(result, 'tick_forced', self.tick_forced)
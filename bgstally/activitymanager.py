@@ -1,17 +1,14 @@
-from copy import deepcopy
 from os import listdir, mkdir, path, remove, rename
 
 from config import config
 
 from bgstally.activity import Activity
-from bgstally.constants import FILE_SUFFIX
+from bgstally.constants import FILE_SUFFIX, FOLDER_ACTIVITYDATA, FOLDER_ACTIVITYDATA_ARCHIVE
 from bgstally.debug import Debug
 from bgstally.tick import Tick
 
 FILE_LEGACY_CURRENTDATA = "Today Data.txt"
 FILE_LEGACY_PREVIOUSDATA = "Yesterday Data.txt"
-FOLDER_ACTIVITYDATA = "activitydata"
-FOLDER_ACTIVITYDATA_ARCHIVE = "archive"
 KEEP_CURRENT_ACTIVITIES = 20
 
 
@@ -37,13 +34,18 @@ class ActivityManager:
             self.activity_data.sort(reverse=True)
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save all activity data
+        Save all activity data, returning the number of bytes written
         """
-        for activity in self.activity_data:
+        bytes_written:int = 0
+
+        # Saves are made on the scheduler thread, so iterate a copy in case a new tick adds an activity meanwhile
+        for activity in list(self.activity_data):
             if activity.tick_id is None: continue
-            activity.save(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+            bytes_written += activity.save(path.join(self.bgstally.plugin_dir, FOLDER_ACTIVITYDATA, activity.get_filename()))
+
+        return bytes_written
 
 
     def get_current_activity(self) -> Activity|None:
@@ -71,14 +73,7 @@ class ActivityManager:
             return False
         else:
             # An inbound tick is newer than the current tick. Create a new Activity object.
-            # Note Activity uses a customised __deepcopy__ that only deep copies data, not class instances.
-            new_activity:Activity = deepcopy(self.current_activity)
-            new_activity.tick_id = tick.tick_id
-            new_activity.tick_time = tick.tick_time
-            new_activity.tick_forced = forced
-            new_activity.discord_webhook_data = {}
-            new_activity.discord_notes = ""
-            new_activity.clear_activity(self.bgstally.mission_log)
+            new_activity:Activity = self.current_activity.carry_forward(tick, forced, self.bgstally.mission_log)
             self.activity_data.append(new_activity)
             self.activity_data.sort(reverse=True)
             self.current_activity = new_activity
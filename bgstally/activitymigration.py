@@ -0,0 +1,212 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from os import listdir, path
+
+from bgstally.constants import FILE_SUFFIX, FOLDER_ACTIVITYDATA, FOLDER_ACTIVITYDATA_ARCHIVE, CheckStates
+
+# The schema version of activity data written by this version of the plugin. Increment this and add a migration
+# function to MIGRATIONS whenever the structure of stored activity data changes.
+SCHEMA_VERSION = 2
+
+
+def migrate(activity_data:dict) -> bool:
+    """Bring deserialised activity data up to the current schema version, in place, by running every migration from the
+    version it was saved with. Data saved before schema versions were introduced is treated as version 0. Data saved by
+    a newer version of the plugin is left alone.
+
+    Args:
+        activity_data (dict): The activity data, as loaded from an activity file
+
+    Returns:
+        bool: True if the data was changed and should be saved
+    """
+    schema_version:int = activity_data.get('schema_version', 0)
+    if schema_version >= SCHEMA_VERSION: return False
+
+    while schema_version < SCHEMA_VERSION:
+        MIGRATIONS[schema_version](activity_data)
+        schema_version += 1
+
+    activity_data['schema_version'] = SCHEMA_VERSION
+    return True
+
+
+def migrate_file(filepath:str) -> bool:
+    """Migrate a single activity file to the current schema version, rewriting it only if it changes
+
+    Args:
+        filepath (str): The full path to the activity file
+
+    Returns:
+        bool: True if the file was migrated and rewritten
+    """
+    with open(filepath) as activity_file:
+        activity_data:dict = json.load(activity_file)
+
+    if not migrate(activity_data): return False
+
+    # Serialise fully before opening the file, so a failure never leaves a truncated file behind
+    json_data:str = json.dumps(activity_data)
+    with open(filepath, 'w') as activity_file:
+        activity_file.write(json_data)
+
+    return True
+
+
+def migrate_all(plugin_dir:str, max_workers:int|None = None) -> tuple[int, int, dict[str, str]]:
+    """Migrate every activity file, current and archived, to the current schema version. Files are migrated in parallel
+    across a pool of processes, as each one is independent and the work is CPU bound.
+
+    Args:
+        plugin_dir (str): The plugin folder
+        max_workers (int | None, optional): The maximum number of worker processes. Defaults to None, one per CPU.
+
+    Returns:
+        tuple[int, int, dict[str, str]]: The number of files found, the number migrated, and the error for each file that failed
+    """
+    filepaths:list[str] = []
+    for folder in [path.join(plugin_dir, FOLDER_ACTIVITYDATA), path.join(plugin_dir, FOLDER_ACTIVITYDATA, FOLDER_ACTIVITYDATA_ARCHIVE)]:
+        if not path.isdir(folder): continue
+        filepaths += [path.join(folder, filename) for filename in listdir(folder) if filename.endswith(FILE_SUFFIX)]
+
+    migrated:int = 0
+    errors:dict[str, str] = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for filepath, result in zip(filepaths, executor.map(_migrate_file_safely, filepaths, chunksize=8)):
+            if isinstance(result, str):
+                errors[filepath] = result
+            elif result:
+                migrated += 1
+
+    return len(filepaths), migrated, errors
+
+
+def _migrate_file_safely(filepath:str) -> bool|str:
+    """
+    Migrate a single activity file in a worker process, returning the error message rather than raising if it fails
+    """
+    try:
+        return migrate_file(filepath)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+#
+# Migrations. Each takes activity data at one schema version and modifies it in place to the next. These describe
+# historical data structures, so must never change once released, and must not depend on code that may change.
+#
+
+def _migrate_0_to_1(activity_data:dict):
+    """
+    Bring data from any version of the plugin before schema versions were introduced up to date. Elements added to the
+    data structure over time were patched in at every load, so data can be at any mix of old structures.
+    """
+    for system_data in activity_data.get('systems', {}).values():
+        # From < v3.1.0 to 3.1.0
+        if not 'TWKills' in system_data: system_data['TWKills'] = {'r': 0, 's': 0, 'ba': 0, 'sg': 0, 'c': 0, 'b': 0, 'm': 0, 'h': 0, 'o': 0}
+        if not 'TWSandR' in system_data: system_data['TWSandR'] = {'dp': {'scooped': 0, 'delivered': 0}, 'op': {'scooped': 0, 'delivered': 0}, 'tp': {'scooped': 0, 'delivered': 0}, 'bb': {'scooped': 0, 'delivered': 0}, 't': {'scooped': 0, 'delivered': 0}}
+        # From < 3.2.0 to 3.2.0
+        if not 'TWReactivate' in system_data: system_data['TWReactivate'] = 0
+        # From < 3.6.0 to 3.6.0
+        if not 'PinToOverlay' in system_data: system_data['PinToOverlay'] = CheckStates.STATE_OFF
+        if not 'tp' in system_data['TWSandR']: system_data['TWSandR']['tp'] = {'scooped': 0, 'delivered': 0}
+
+        for faction_data in system_data.get('Factions', {}).values():
+            _migrate_faction_0_to_1(faction_data)
+
+
+def _migrate_faction_0_to_1(faction_data:dict):
+    """
+    Bring faction data from any version of the plugin before schema versions were introduced up to date
+    """
+    # From < v1.2.0 to 1.2.0
+    if not 'SpaceCZ' in faction_data: faction_data['SpaceCZ'] = {}
+    if not 'GroundCZ' in faction_data: faction_data['GroundCZ'] = {}
+    # From < v1.3.0 to 1.3.0
+    if not 'Enabled' in faction_data: faction_data['Enabled'] = CheckStates.STATE_ON
+    # From < v1.6.0 to 1.6.0
+    if not 'MissionPointsSecondary' in faction_data: faction_data['MissionPointsSecondary'] = 0
+    # From < v1.7.0 to 1.7.0
+    if not 'ExoData' in faction_data: faction_data['ExoData'] = 0
+    if not 'GroundCZSettlements' in faction_data: faction_data['GroundCZSettlements'] = {}
+    # From < v1.8.0 to 1.8.0
+    if not 'BlackMarketProfit' in faction_data: faction_data['BlackMarketProfit'] = 0
+    if not 'TradePurchase' in faction_data: faction_data['TradePurchase'] = 0
+    # From < v1.9.0 to 1.9.0
+    if not 'Scenarios' in faction_data: faction_data['Scenarios'] = 0
+    # From < v2.2.0 to 2.2.0
+    if not 'TWStations' in faction_data: faction_data['TWStations'] = {}
+    # 2.2.0-a1 - 2.2.0-a3 stored a single integer for passengers,  escapepods and cargo in TW station data. 2.2.0-a4 onwards has a dict for each.
+    # Put the previous values for passengers and escapepods into the 'm' 'sum' entries in the dict, for want of a better place.
+    # Put the previous value for cargo into the 'sum' entry in the dict.
+    # The previous mission count value was aggregate across all passengers, escape pods and cargo so just plonk in escapepods for want of a better place.
+    for station in faction_data['TWStations'].values():
+        if not type(station.get('passengers')) == dict:
+            station['passengers'] = {'l': {'count': 0, 'sum': 0}, 'm': {'count': 0, 'sum': station['passengers']}, 'h': {'count': 0, 'sum': 0}}
+        if not type(station.get('escapepods')) == dict:
+            station['escapepods'] = {'l': {'count': 0, 'sum': 0}, 'm': {'count': station['missions'], 'sum': station['escapepods']}, 'h': {'count': 0, 'sum': 0}}
+        if not type(station.get('cargo')) == dict:
+            station['cargo'] = {'count': 0, 'sum': station['cargo']}
+        if not type(station.get('massacre')) == dict:
+            station['massacre'] = {'s': {'count': 0, 'sum': 0}, 'c': {'count': 0, 'sum': 0}, 'b': {'count': 0, 'sum': 0}, 'm': {'count': 0, 'sum': 0}, 'h': {'count': 0, 'sum': 0}, 'o': {'count': 0, 'sum': 0}}
+    # From < 3.0.0 to 3.0.0
+    if not 'GroundMurdered' in faction_data: faction_data['GroundMurdered'] = 0
+    if not 'TradeBuy' in faction_data:
+        faction_data['TradeBuy'] = [{'items': 0, 'value': 0}, {'items': 0, 'value': 0}, {'items': 0, 'value': 0}, {'items': 0, 'value': 0}]
+    if not 'TradeSell' in faction_data:
+        faction_data['TradeSell'] = [{'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}, {'items': 0, 'value': 0, 'profit': 0}]
+    # From < 3.2.0 to 3.2.0
+    for station in faction_data['TWStations'].values():
+        if not 'reactivate' in station: station['reactivate'] = 0
+    # From < 3.5.0 to 3.5.0
+    if not type(faction_data.get('MissionPoints', 0)) == dict:
+        faction_data['MissionPoints'] = {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, 'm': int(faction_data.get('MissionPoints', 0))}
+    if not type(faction_data.get('MissionPointsSecondary', 0)) == dict:
+        faction_data['MissionPointsSecondary'] = {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, 'm': int(faction_data.get('MissionPointsSecondary', 0))}
+    # From < 4.0.0 to 4.0.0
+    if not 'SandR' in faction_data: faction_data['SandR'] = {'dp': 0, 'op': 0, 'tp': 0, 'bb': 0, 'wc': 0, 'pe': 0, 'pp': 0, 'h': 0}
+
+
+def _migrate_1_to_2(activity_data:dict):
+    """
+    Add running totals of INF, trade, TW kills and TW search and rescue to every system and faction, so they don't need
+    to be summed from the detailed data every time they are used
+    """
+    for system_data in activity_data.get('systems', {}).values():
+        system_data['Totals'] = {'TWKills': sum(int(v) for v in system_data['TWKills'].values()),
+                                 'TWSandRScooped': sum(int(d['scooped']) for d in system_data['TWSandR'].values()),
+                                 'TWSandRDelivered': sum(int(d['delivered']) for d in system_data['TWSandR'].values())}
+
+        for faction_data in system_data.get('Factions', {}).values():
+            faction_data['Totals'] = {'Inf': sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPoints'].items()),
+                                      'InfSecondary': sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction_data['MissionPointsSecondary'].items()),
+                                      'TradeBuy': sum(int(d['value']) for d in faction_data['TradeBuy']),
+                                      'TradeSell': sum(int(d['value']) for d in faction_data['TradeSell']),
+                                      'TradeProfit': sum(int(d['profit']) for d in faction_data['TradeSell'])}
+
+
+# key = schema version migrated from, value = function migrating to the next version
+MIGRATIONS = {
+    0: _migrate_0_to_1,
+    1: _migrate_1_to_2
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade all BGS-Tally activity files, current and archived, to the latest data structure. "
+                                                 "Close EDMC before running this, so the plugin isn't writing to the same files.")
+    parser.add_argument('plugin_dir', help="The BGS-Tally plugin folder")
+    parser.add_argument('--workers', type=int, default=None, help="Maximum number of worker processes, defaults to one per CPU")
+    args = parser.parse_args()
+
+    total, migrated, errors = migrate_all(args.plugin_dir, args.workers)
+
+    print(f"{total} activity files found, {migrated} migrated to schema version {SCHEMA_VERSION}, {total - migrated - len(errors)} already up to date")
+    for filepath, error in errors.items():
+        print(f"Failed to migrate {filepath}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,19 @@
 
 from json import JSONDecodeError
-from queue import Queue
-from re import match
-from threading import Thread
-from time import sleep
+from threading import Lock
+from time import monotonic
 
 import semantic_version
 from requests import Response
 
-from bgstally.constants import RequestMethod
+from bgstally.apioutbox import APIOutbox, CircuitBreaker
+from bgstally.constants import RequestMethod, RequestPriority
 from bgstally.debug import Debug
+from bgstally.eventfilter import EventFilter, compile_event_filters
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import get_by_path
 
-API_VERSION = "1.5.0"
+API_VERSION = "1.6.0"
 
 ENDPOINT_ACTIVITIES = "activities" # Used as both the dict key and default path
 ENDPOINT_DISCOVERY = "discovery"   # Used as the path
@@ -27,10 +27,12 @@ EVENTS_FILTER_DEFAULTS = {'ApproachSettlement': {}, 'CarrierJump': {}, 'CommitCr
     'FSDJump': {}, 'Location': {}, 'MarketBuy': {}, 'MarketSell': {}, 'MissionAbandoned': {}, 'MissionAccepted': {}, 'MissionCompleted': {},
     'MissionFailed': {}, 'MultiSellExplorationData': {}, 'RedeemVoucher': {}, 'SellExplorationData': {}, 'StartUp': {}}
 
+HTTP_STATUS_CONFLICT = 409 # Returned by a server that can't apply an activities delta and needs a full snapshot
+
 HEADER_APIKEY = "apikey"
 HEADER_APIVERSION = "apiversion"
 TIME_ACTIVITIES_WORKER_PERIOD_S = 60
-TIME_EVENTS_WORKER_PERIOD_S = 5
+TIME_EVENTS_LINGER_S = 5      # How long a partial batch of events may wait for more events before it is sent anyway
 BATCH_EVENTS_MAX_SIZE = 10
 
 
@@ -59,19 +61,27 @@ class API:
             # Default API discovery state. Overridden by response from /discovery endpoint if it exists
             self._revert_discovery_to_defaults()
 
-        # Used to store a single dict containing BGS activity when it's been updated.
-        self.activity:dict = None
+        # Durable outbox holding events and the latest activity until the server has accepted them. Created on demand,
+        # and replaced if the URL changes.
+        self.outbox:APIOutbox|None = None
+        self.outbox_lock:Lock = Lock()
+
+        # Backoff and circuit breaker state for each endpoint, and whether a send to each endpoint is in progress
+        self.activities_breaker:CircuitBreaker = CircuitBreaker(f"{ENDPOINT_ACTIVITIES} API")
+        self.events_breaker:CircuitBreaker = CircuitBreaker(f"{ENDPOINT_EVENTS} API")
+        self.activities_in_flight:bool = False
+        self.events_in_flight:bool = False
 
-        # Events queue is used to batch up events API messages. All batched messages are sent when the worker works.
-        self.events_queue:Queue = Queue()
+        # The most recent activity accepted by the server, used as the base for sending activity deltas. Held in memory
+        # only, so after a restart the first send is always a full snapshot.
+        self.activities_baseline:dict|None = None
 
-        self.activities_thread: Thread = Thread(target=self._activities_worker, name=f"BGSTally Activities API Worker ({self.url})")
-        self.activities_thread.daemon = True
-        self.activities_thread.start()
+        self.events_last_sent:float|None = None # Monotonic time of the most recent events send
+        self.events_batches_sent:int = 0
 
-        self.events_thread: Thread = Thread(target=self._events_worker, name=f"BGSTally Events API Worker ({self.url})")
-        self.events_thread.daemon = True
-        self.events_thread.start()
+        # Jobs on the shared scheduler. The events job is woken when a batch fills, a send completes or our settings change.
+        self.activities_job = self.bgstally.scheduler.add_job(f"Activities API ({self.url})", self._send_activity_if_due)
+        self.events_job = self.bgstally.scheduler.add_job(f"Events API ({self.url})", self._send_events_if_due)
 
         self.discover(self.discovery_received)
 
@@ -114,6 +124,7 @@ class API:
         self.description:str = data['description']
         self.endpoints:dict = data['endpoints']
         self.events:dict = data['events']
+        self.event_filters:dict[str, EventFilter] = compile_event_filters(self.events)
 
 
     def discover(self, callback:callable):
@@ -130,6 +141,7 @@ class API:
         if not success:
             Debug.logger.info(f"Unable to discover API capabilities, falling back to defaults")
             self._revert_discovery_to_defaults()
+            self._set_dirty()
             return
 
         discovery_data:dict = None
@@ -139,11 +151,13 @@ class API:
         except JSONDecodeError:
             Debug.logger.warning(f"Event discovery data is invalid, falling back to defaults")
             self._revert_discovery_to_defaults()
+            self._set_dirty()
             return
 
         if not isinstance(discovery_data, dict):
             Debug.logger.warning(f"Event discovery data is invalid, falling back to defaults")
             self._revert_discovery_to_defaults()
+            self._set_dirty()
             return
 
         self.name = discovery_data.get('name', NAME_DEFAULT)
@@ -157,38 +171,133 @@ class API:
             if self.bgstally.ui.frame: self.bgstally.ui.frame.after(1000, self.bgstally.ui.update_plugin_frame())
 
         self.events = discovery_data.get('events', EVENTS_FILTER_DEFAULTS)
+        self.event_filters = compile_event_filters(self.events)
+        self._set_dirty()
 
 
     def send_activity(self, activity:dict):
         """
-        Activity data has been updated. Store it ready for the next send via the worker.
+        Activity data has been updated. Store it in the outbox ready for the next send via the worker. It is saved to
+        disk later, by the persistence manager.
         """
-        if not self.user_approved \
-                or not self.activities_enabled \
-                or not ENDPOINT_ACTIVITIES in self.endpoints \
-                or not self.bgstally.request_manager.url_valid(self.url):
-            self.activity = None
+        if not self._activities_active():
+            self._clear_outbox(activity=True)
             return
 
-        self.activity = activity
+        self._get_outbox().set_activity(activity)
+
+
+    def save_outbox(self) -> int:
+        """
+        Save any unsaved activity in the outbox, returning the number of bytes written
+        """
+        with self.outbox_lock:
+            outbox:APIOutbox|None = self.outbox
+
+        if outbox is None: return 0
+        return outbox.save()
+
+
+    def get_subscribed_events(self) -> set[str]:
+        """
+        Get the event types this API wants to receive, which is none at all if events are not active
+        """
+        if not self._events_active(): return set()
+        return set(self.events.keys())
 
 
     def send_event(self, event:dict):
         """
-        Event has been received. Add it to the events queue.
+        Event has been received. Add it to the outbox ready for the next send via the worker.
         """
-        if not self.user_approved \
-                or not self.events_enabled \
-                or not ENDPOINT_EVENTS in self.endpoints \
-                or not self.bgstally.request_manager.url_valid(self.url):
-            with self.events_queue.mutex:
-                self.events_queue.queue.clear()
+        if not self._events_active():
+            self._clear_outbox(events=True)
             return
 
-        if event.get('event', '') not in self.events or self._is_filtered(event):
+        event_filter:EventFilter|None = self.event_filters.get(event.get('event', ''))
+        if event_filter is None or not event_filter.matches(event):
             return
 
-        self.events_queue.put(event)
+        outbox:APIOutbox = self._get_outbox()
+        outbox.add_event(event)
+
+        # Wake the worker to start the linger timer for a new batch, or to send a batch that has just filled
+        depth:int = outbox.get_depth()
+        if depth == 1 or depth >= self._get_events_batch_size(): self._wake_events_worker()
+
+
+    def settings_changed(self):
+        """
+        Our user or discovery state has changed. The events job stays idle while events are not active, so wake it to
+        pick up the change.
+        """
+        self._wake_events_worker()
+
+
+    def get_metrics(self) -> dict:
+        """Get metrics for data waiting to be sent to this API
+
+        Returns:
+            dict: The outbox metrics (see APIOutbox.get_metrics()), plus the number of event batches sent and whether a
+            batch is currently in flight
+        """
+        with self.outbox_lock:
+            outbox:APIOutbox|None = self.outbox
+
+        metrics:dict = outbox.get_metrics() if outbox is not None else {'depth': 0, 'oldest_age_s': 0, 'dropped': 0, 'activity_waiting': False}
+        metrics['batches_sent'] = self.events_batches_sent
+        metrics['in_flight'] = self.events_in_flight
+        return metrics
+
+
+    def _activities_active(self) -> bool:
+        """
+        Return True if activities should be sent to this API. Need to check settings every time in case the user has changed them.
+        """
+        return self.user_approved \
+                and self.activities_enabled \
+                and ENDPOINT_ACTIVITIES in self.endpoints \
+                and self.bgstally.request_manager.url_valid(self.url)
+
+
+    def _events_active(self) -> bool:
+        """
+        Return True if events should be sent to this API. Need to check settings every time in case the user has changed them.
+        """
+        return self.user_approved \
+                and self.events_enabled \
+                and ENDPOINT_EVENTS in self.endpoints \
+                and self.bgstally.request_manager.url_valid(self.url)
+
+
+    def _get_outbox(self) -> APIOutbox:
+        """
+        Get the outbox for our current URL, loading it from disk if needed
+        """
+        with self.outbox_lock:
+            if self.outbox is not None and self.outbox.url != self.url:
+                # URL has changed. Anything left in the old outbox stays on disk in case the user changes back.
+                self.outbox.close()
+                self.outbox = None
+                self.activities_baseline = None
+
+            if self.outbox is None:
+                self.outbox = APIOutbox(self.bgstally, self.url)
+
+            return self.outbox
+
+
+    def _clear_outbox(self, events:bool = False, activity:bool = False):
+        """
+        Discard outbox contents for an endpoint that is no longer active
+        """
+        with self.outbox_lock:
+            outbox:APIOutbox|None = self.outbox
+
+        if outbox is None or outbox.url != self.url: return
+
+        if events: outbox.clear_events()
+        if activity: outbox.clear_activity()
 
 
     def _revert_discovery_to_defaults(self):
@@ -200,6 +309,20 @@ class API:
         self.description:str = DESCRIPTION_DEFAULT
         self.endpoints:dict = ENDPOINTS_DEFAULT
         self.events:dict = EVENTS_FILTER_DEFAULTS
+        self.event_filters:dict[str, EventFilter] = compile_event_filters(self.events)
+
+
+    def _set_dirty(self):
+        """
+        Our user or discovery state has changed and needs saving
+        """
+        # Discovery can complete before the API manager has finished being created. Discovery runs on every launch, so
+        # nothing is lost by skipping the save in that case, but our events job still needs to pick up the change.
+        api_manager = getattr(self.bgstally, 'api_manager', None)
+        if api_manager is not None:
+            api_manager.api_changed()
+        else:
+            self.settings_changed()
 
 
     def _discovery_events_changed(self, discovery_events:dict) -> bool:
@@ -214,72 +337,210 @@ class API:
         return hash(tuple(previous_events)) != hash(tuple(latest_events))
 
 
-    def _is_filtered(self, event:dict) -> bool:
+    def _send_activity_if_due(self) -> float:
+        """Scheduled job handling the activities API. If there's activity waiting in the outbox, this triggers a call to
+        the activities endpoint on a regular time period. The activity stays in the outbox until the server has accepted it.
+
+        Returns:
+            float: The number of seconds until the next run
+        """
+        if not self._activities_active():
+            self._clear_outbox(activity=True)
+        elif not self.activities_in_flight and self.activities_breaker.allow_request():
+            outbox:APIOutbox = self._get_outbox()
+            outbox_activity:tuple[int, dict]|None = outbox.get_activity()
+
+            if outbox_activity is not None:
+                self._send_activity(outbox, *outbox_activity)
+
+        return max(int(get_by_path(self.endpoints, [ENDPOINT_ACTIVITIES, 'min_period'], 0)), TIME_ACTIVITIES_WORKER_PERIOD_S)
+
+
+    def _send_activity(self, outbox:APIOutbox, seq:int, activity:dict):
+        """
+        Send an activity from the outbox. If the server supports deltas and has already accepted an activity for this
+        tick, only the systems and factions that have changed since are sent, otherwise the full activity is sent.
+        Either way, the outbox sequence number of the activity is included so the server can detect gaps.
         """
-        Return True if this event should be filtered (omitted from sending to the API).
+        url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_ACTIVITIES, 'path'], ENDPOINT_ACTIVITIES)
+        method:RequestMethod = RequestMethod.PUT
+        payload:dict = activity
+
+        if self._activities_delta_supported():
+            delta:dict|None = self._get_activity_delta(seq, activity)
+
+            if delta is None:
+                payload = dict(activity, sequence=seq)
+            elif not delta['systems']:
+                # Nothing the server cares about has changed since it last accepted an activity
+                outbox.remove_activity(seq)
+                return
+            else:
+                method = RequestMethod.PATCH
+                payload = delta
+
+        self.activities_in_flight = True
+        self.bgstally.request_manager.queue_request(url, method, callback=self._activity_sent, headers=self._get_headers(), payload=payload,
+                                                    data={'outbox': outbox, 'seq': seq, 'activity': activity}, priority=RequestPriority.BACKGROUND,
+                                                    compress=self._compression_supported(ENDPOINT_ACTIVITIES))
+
+
+    def _activities_delta_supported(self) -> bool:
         """
-        filters:dict = get_by_path(self.events, [event.get('event', ''), 'filters'], None)
-        if filters is None: return False
+        Return True if the server has advertised support for activity deltas in its discovery data
+        """
+        return get_by_path(self.endpoints, [ENDPOINT_ACTIVITIES, 'delta'], False) == True
+
+
+    def _compression_supported(self, endpoint:str) -> bool:
+        """
+        Return True if the server has advertised in its discovery data that an endpoint accepts gzip compressed payloads.
+        The 'compression' property of the endpoint can be a single encoding or a list of encodings.
+        """
+        compression:str|list|None = get_by_path(self.endpoints, [endpoint, 'compression'], None)
+        if isinstance(compression, list): return "gzip" in compression
+        return compression == "gzip"
 
-        for field, filter in filters.items():
-            filter_str:str = str(filter)
-            value_str:str = str(event.get(field, ""))
-            if not match(filter_str, value_str): return True
 
-        # All fields matched, don't filter out this event
-        return False
+    def _get_activity_delta(self, seq:int, activity:dict) -> dict|None:
+        """Build a delta containing only the systems and factions that have changed since the last activity accepted by
+        the server. Changed systems include all their system-level data, but only the factions that have changed.
 
+        Args:
+            seq (int): The outbox sequence number of the activity
+            activity (dict): The full activity
 
-    def _activities_worker(self) -> None:
+        Returns:
+            dict | None: The delta, or None if a full snapshot must be sent instead because the server hasn't yet
+            accepted an activity for this tick
         """
-        Handle activities API. If there's updated activity, this worker triggers a call to the activities endpoint
-        on a regular time period.
+        baseline:dict|None = self.activities_baseline
+        if baseline is None or baseline['tickid'] != activity.get('tickid'): return None
+
+        delta_systems:list = []
+
+        for api_system in activity.get('systems', []):
+            baseline_system:dict|None = baseline['systems'].get(str(api_system.get('address')))
+
+            # Unchanged systems are usually the very same object, because the API manager caches them
+            if baseline_system is api_system: continue
+
+            if baseline_system is None:
+                delta_systems.append(api_system)
+            elif baseline_system != api_system:
+                baseline_factions:dict = {faction.get('name'): faction for faction in baseline_system.get('factions', [])}
+                delta_system:dict = {k: v for k, v in api_system.items() if k != 'factions'}
+                delta_system['factions'] = [faction for faction in api_system.get('factions', []) if baseline_factions.get(faction.get('name')) != faction]
+                delta_systems.append(delta_system)
+
+        delta:dict = {k: v for k, v in activity.items() if k != 'systems'}
+        delta['sequence'] = seq
+        delta['basesequence'] = baseline['sequence']
+        delta['systems'] = delta_systems
+        return delta
+
+
+    def _activity_sent(self, success:bool, response:Response, request:BGSTallyRequest):
+        """
+        An activities request has completed
+        """
+        if success:
+            request.data['outbox'].remove_activity(request.data['seq'])
+            self.activities_breaker.record_success()
+
+            activity:dict = request.data['activity']
+            self.activities_baseline = {'tickid': activity.get('tickid'),
+                                        'sequence': request.data['seq'],
+                                        'systems': {str(api_system.get('address')): api_system for api_system in activity.get('systems', [])}}
+        elif request.method == RequestMethod.PATCH and response is not None and response.status_code == HTTP_STATUS_CONFLICT:
+            # The server can't apply our delta, e.g. it has lost track of our activity or missed a send. The activity stays
+            # in the outbox and is resent as a full snapshot.
+            Debug.logger.info(f"Activities API requested a full snapshot")
+            self.activities_baseline = None
+        else:
+            self.activities_breaker.record_failure()
+
+        self.activities_in_flight = False
+
+
+    def _send_events_if_due(self) -> float|None:
+        """Scheduled job handling the events API. Events are sent in batches as soon as a full batch is waiting, and
+        back-to-back while the outbox keeps filling, with the server's min_period respected as the minimum interval between
+        sends. A partial batch is sent once its oldest event has waited TIME_EVENTS_LINGER_S. Only one batch is in flight at
+        a time, and events stay in the outbox until the server has accepted them. While events are not active the job
+        stays idle, and is woken by settings_changed() when that might have changed.
+
+        Returns:
+            float | None: The number of seconds until it is worth checking again, or None to wait until woken
         """
-        Debug.logger.debug("Starting Activities API Worker...")
+        if not self._events_active():
+            self._clear_outbox(events=True)
+            return None
+
+        # A completed send wakes us, so no need to poll while one is in flight
+        if self.events_in_flight: return None
 
-        while True:
-            # Need to check settings every time in case the user has changed them
-            if not self.user_approved \
-                    or not self.activities_enabled \
-                    or not ENDPOINT_ACTIVITIES in self.endpoints \
-                    or not self.bgstally.request_manager.url_valid(self.url):
-                self.activity = None
+        now:float = monotonic()
+        if not self.events_breaker.allow_request(): return max(self.events_breaker.retry_time - now, 0)
 
-            if self.activity is not None:
-                url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_ACTIVITIES, 'path'], ENDPOINT_ACTIVITIES)
+        if self.events_last_sent is not None:
+            min_period:float = float(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'min_period'], 0))
+            rate_delay:float = self.events_last_sent + min_period - now
+            if rate_delay > 0: return rate_delay
 
-                self.bgstally.request_manager.queue_request(url, RequestMethod.PUT, headers=self._get_headers(), payload=self.activity)
+        outbox:APIOutbox = self._get_outbox()
+        batch_size:int = self._get_events_batch_size()
+        depth:int = outbox.get_depth()
 
-                self.activity = None
+        # The first event into an empty outbox wakes us
+        if depth == 0: return None
 
-            sleep(max(int(get_by_path(self.endpoints, [ENDPOINT_ACTIVITIES, 'min_period'], 0)), TIME_ACTIVITIES_WORKER_PERIOD_S))
+        if depth < batch_size:
+            # Partial batch, give it a chance to fill up
+            linger_delay:float = TIME_EVENTS_LINGER_S - outbox.get_oldest_event_age()
+            if linger_delay > 0: return linger_delay
 
+        batch:list[tuple[int, dict]] = outbox.get_events(batch_size)
+        url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'path'], ENDPOINT_EVENTS)
 
-    def _events_worker(self) -> None:
+        self.events_in_flight = True
+        self.events_last_sent = now
+        self.events_batches_sent += 1
+        self.bgstally.request_manager.queue_request(url, RequestMethod.POST, callback=self._events_sent, headers=self._get_headers(), payload=[event for seq, event in batch],
+                                                    data={'outbox': outbox, 'seqs': [seq for seq, event in batch]}, priority=RequestPriority.BACKGROUND,
+                                                    compress=self._compression_supported(ENDPOINT_EVENTS))
+
+        return None
+
+
+    def _events_sent(self, success:bool, response:Response, request:BGSTallyRequest):
         """
-        Handle events API. If there's queued events, this worker triggers a call to the events endpoint
-        on a regular time period, sending the currently queued batch of events.
+        An events request has completed
         """
-        Debug.logger.debug("Starting Events API Worker...")
+        if success:
+            request.data['outbox'].remove_events(request.data['seqs'])
+            self.events_breaker.record_success()
+        else:
+            self.events_breaker.record_failure()
+
+        self.events_in_flight = False
 
-        while True:
-            # Need to check settings every time in case the user has changed them
-            if not self.user_approved \
-                    or not self.events_enabled \
-                    or not ENDPOINT_EVENTS in self.endpoints \
-                    or not self.bgstally.request_manager.url_valid(self.url):
-                with self.events_queue.mutex:
-                    self.events_queue.queue.clear()
+        # Carry on draining straight away if there's more waiting
+        self._wake_events_worker()
 
-            if self.events_queue.qsize() > 0:
-                url:str = self.url + get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'path'], ENDPOINT_EVENTS)
 
-                # Grab all available events in the queue up to a maximum batch size
-                batch_size:int = max(int(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'max_batch'], 0)), BATCH_EVENTS_MAX_SIZE)
-                queued_events:list = [self.events_queue.get(block=False) for _ in range(min(batch_size, self.events_queue.qsize()))]
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, headers=self._get_headers(), payload=queued_events)
+    def _wake_events_worker(self):
+        """
+        Wake the events job so it re-evaluates whether a batch is due
+        """
+        self.events_job.wake()
+
 
-            sleep(max(int(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'min_period'], 0)), TIME_EVENTS_WORKER_PERIOD_S))
+    def _get_events_batch_size(self) -> int:
+        """
+        Get the maximum number of events to send in a single batch
+        """
+        return max(int(get_by_path(self.endpoints, [ENDPOINT_EVENTS, 'max_batch'], 0)), BATCH_EVENTS_MAX_SIZE)
 
 
     def _get_headers(self) -> dict:
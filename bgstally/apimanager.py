@@ -1,17 +1,19 @@
 import json
 from datetime import datetime
 from os import path
+from queue import Empty, Queue
 
 from bgstally.activity import Activity
 from bgstally.api import API
 from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA
 from bgstally.debug import Debug
-from bgstally.utils import get_by_path
+from bgstally.persistencemanager import PersistentStore
+from bgstally.utils import get_by_path, write_json_file
 
 FILENAME = "apis.json"
 
 
-class APIManager:
+class APIManager(PersistentStore):
     """
     Handles a list of API objects.
     """
@@ -22,12 +24,29 @@ class APIManager:
         self.apis:list[API] = []
         self.api_updated:bool = False
 
+        # Cache of API system data, so only systems that have changed are rebuilt. key = system address, value = API
+        # system dict. Valid for the activity it was built from, up to the given system version.
+        self.api_systems_cache:dict[str, dict] = {}
+        self.api_systems_activity:Activity|None = None
+        self.api_systems_version:int = 0
+
+        # Union of the event types wanted by all active APIs, so that events no API wants are skipped without any work
+        self.subscribed_events:frozenset[str] = frozenset()
+
+        # Events waiting to be built and passed to the APIs. Each entry is a tuple of (journal entry, context).
+        self.events_queue:Queue = Queue()
+
         self.load()
 
         if len(self.apis) == 0:
             # TODO: For the moment, ensure one API is created. Will need to manage multiple in the UI, and likely
             # not create one by default.
             self.apis.append(API(self.bgstally))
+            self.dirty = True
+
+        self.update_subscribed_events()
+
+        self.events_job = self.bgstally.scheduler.add_job("API Event Builder", self._build_queued_events, None)
 
 
     def load(self):
@@ -46,18 +65,26 @@ class APIManager:
                 Debug.logger.info(f"Unable to load {file}")
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save all APIs to disk
+        Save all APIs and any unsaved activity in their outboxes to disk, returning the number of bytes written
         """
+        bytes_written:int = 0
+        for api in self.apis:
+            bytes_written += api.save_outbox()
+
+        if not self.dirty: return bytes_written
+
+        version:int = self.version
         apis_json:list = []
 
         for api in self.apis:
             apis_json.append(api.as_dict())
 
         file:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(apis_json, outfile)
+        bytes_written += write_json_file(file, apis_json)
+        self.mark_saved(version)
+        return bytes_written
 
 
     def send_activity(self, activity:Activity, cmdr:str):
@@ -71,16 +98,63 @@ class APIManager:
 
     def send_event(self, event:dict, activity:Activity, cmdr:str, mission:dict):
         """
-        Event has been received. Add it to the events queue.
+        Event has been received. If any API wants this type of event, take a snapshot of the current state needed to
+        build the API event and queue it. The API event itself is built on the scheduler thread. Events that no API wants
+        are ignored straight away, which is the case for most journal events.
+        """
+        if event.get('event') not in self.subscribed_events: return
+
+        context:dict = self._get_api_event_context(event, activity, cmdr, mission)
+
+        # Copy the top level of the event, as the journal entry may be reused after we return
+        self.events_queue.put((dict(event), context))
+        self.events_job.wake()
+
+
+    def api_changed(self):
+        """
+        The user or discovery state of an API has changed
+        """
+        self.update_subscribed_events()
+        for api in self.apis:
+            api.settings_changed()
+        self.dirty = True
+
+
+    def update_subscribed_events(self):
+        """
+        Recalculate the event types wanted by all active APIs
         """
-        api_event:dict = self._build_api_event(event, activity, cmdr, mission)
+        subscribed_events:set[str] = set()
         for api in self.apis:
-            api.send_event(api_event)
+            subscribed_events.update(api.get_subscribed_events())
+
+        self.subscribed_events = frozenset(subscribed_events)
+
+
+    def _build_queued_events(self) -> None:
+        """
+        Scheduled job. Build API events from all queued journal events and pass them to the APIs. Woken when an event is queued.
+        """
+        while True:
+            try:
+                event, context = self.events_queue.get_nowait()
+            except Empty:
+                return None
+
+            try:
+                api_event:dict = self._build_api_event(event, context)
+                for api in self.apis:
+                    api.send_event(api_event)
+            except Exception as e:
+                Debug.logger.error(f"Unable to build API event {event.get('event')}", exc_info=e)
 
 
     def _build_api_activity(self, activity:Activity, cmdr:str):
         """
         Build an API-ready activity ready for sending. A dict matching the API spec is built from the Activity data.
+        The data for each system is cached, and only the systems that have changed since the last build are rebuilt, so
+        the cost doesn't depend on how many systems we are tracking.
         """
         api_activity:dict = {
             'cmdr': cmdr,
@@ -90,204 +164,256 @@ class APIManager:
             'systems': []
         }
 
-        for system in activity.systems.values():
-            api_system:dict = {
-                'name': system.get('System', ""),
-                'address': system.get('SystemAddress', ""),
-                'factions': [],
-                'twkills': {}
+        if activity is not self.api_systems_activity or not self.api_systems_cache:
+            # A different activity, e.g. after a tick, so build every system
+            self.api_systems_cache = {}
+            self.api_systems_activity = activity
+            self.api_systems_version = activity.get_latest_system_version()
+            changed_systems:list[str] = list(activity.systems.keys())
+        else:
+            # Take the latest version first, so nothing changed while we are building is missed next time
+            latest_version:int = activity.get_latest_system_version()
+            changed_systems:list[str] = activity.get_changed_systems(self.api_systems_version)
+            self.api_systems_version = latest_version
+
+        for system_address in changed_systems:
+            system:dict|None = activity.systems.get(system_address)
+
+            if system is None:
+                self.api_systems_cache.pop(system_address, None)
+            else:
+                self.api_systems_cache[system_address] = self._build_api_system(system)
+
+        # Drop cached systems that are no longer in the activity
+        if len(self.api_systems_cache) > len(activity.systems):
+            for system_address in [k for k in self.api_systems_cache if k not in activity.systems]:
+                del self.api_systems_cache[system_address]
+
+        api_activity['systems'] = list(self.api_systems_cache.values())
+        return api_activity
+
+
+    def _build_api_system(self, system:dict) -> dict:
+        """
+        Build the API-ready data for a single system. The result is cached and compared against previous results, so it
+        must not share any mutable data with the activity.
+        """
+        api_system:dict = {
+            'name': system.get('System', ""),
+            'address': system.get('SystemAddress', ""),
+            'factions': [],
+            'twkills': {}
+        }
+
+        for faction in system.get('Factions', {}).values():
+            api_faction:dict = {
+                'name': faction.get('Faction', ""),
+                'state': faction.get('FactionState', ""),
+                'stations': []
             }
 
-            for faction in system.get('Factions', {}).values():
-                api_faction:dict = {
-                    'name': faction.get('Faction', ""),
-                    'state': faction.get('FactionState', ""),
-                    'stations': []
+            if faction.get('Bounties', "0") != "0": api_faction['bvs'] = faction['Bounties']
+            if faction.get('CombatBonds', "0") != "0": api_faction['cbs'] = faction['CombatBonds']
+            if faction.get('ExoData', "0") != "0": api_faction['exobiology'] = faction['ExoData']
+            if faction.get('CartData', "0") != "0": api_faction['exploration'] = faction['CartData']
+            if faction.get('Scenarios', "0") != "0": api_faction['scenarios'] = faction['Scenarios']
+            if faction['Totals']['Inf'] != 0: api_faction['infprimary'] = str(faction['Totals']['Inf'])
+            if faction['Totals']['InfSecondary'] != 0: api_faction['infsecondary'] = str(faction['Totals']['InfSecondary'])
+            if faction.get('MissionFailed', "0") != "0": api_faction['missionfails'] = faction['MissionFailed']
+            if faction.get('GroundMurdered', "0") != "0": api_faction['murdersground'] = faction['GroundMurdered']
+            if faction.get('Murdered', "0") != "0": api_faction['murdersspace'] = faction['Murdered']
+            if faction.get('BlackMarketProfit', "0") != "0": api_faction['tradebm'] = faction['BlackMarketProfit']
+
+            if faction['Totals']['TradeBuy'] > 0:
+                api_faction['tradebuy'] = {
+                    'low': {
+                        'items': faction['TradeBuy'][2]['items'],
+                        'value': faction['TradeBuy'][2]['value']
+                    },
+                    'high': {
+                        'items': faction['TradeBuy'][3]['items'],
+                        'value': faction['TradeBuy'][3]['value']
+                    }
                 }
 
-                if faction.get('Bounties', "0") != "0": api_faction['bvs'] = faction['Bounties']
-                if faction.get('CombatBonds', "0") != "0": api_faction['cbs'] = faction['CombatBonds']
-                if faction.get('ExoData', "0") != "0": api_faction['exobiology'] = faction['ExoData']
-                if faction.get('CartData', "0") != "0": api_faction['exploration'] = faction['CartData']
-                if faction.get('Scenarios', "0") != "0": api_faction['scenarios'] = faction['Scenarios']
-                inf_primary:int = sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction['MissionPoints'].items())
-                inf_secondary:int = sum((1 if k == 'm' else int(k)) * int(v) for k, v in faction['MissionPointsSecondary'].items())
-                if inf_primary != 0: api_faction['infprimary'] = str(inf_primary)
-                if inf_secondary != 0: api_faction['infsecondary'] = str(inf_secondary)
-                if faction.get('MissionFailed', "0") != "0": api_faction['missionfails'] = faction['MissionFailed']
-                if faction.get('GroundMurdered', "0") != "0": api_faction['murdersground'] = faction['GroundMurdered']
-                if faction.get('Murdered', "0") != "0": api_faction['murdersspace'] = faction['Murdered']
-                if faction.get('BlackMarketProfit', "0") != "0": api_faction['tradebm'] = faction['BlackMarketProfit']
-
-                if sum(int(d['value']) for d in faction['TradeBuy']) > 0:
-                    api_faction['tradebuy'] = {
-                        'low': {
-                            'items': faction['TradeBuy'][2]['items'],
-                            'value': faction['TradeBuy'][2]['value']
-                        },
-                        'high': {
-                            'items': faction['TradeBuy'][3]['items'],
-                            'value': faction['TradeBuy'][3]['value']
-                        }
+            if faction['Totals']['TradeSell'] > 0:
+                api_faction['tradesell'] = {
+                    'zero': {
+                        'items': faction['TradeSell'][0]['items'],
+                        'value': faction['TradeSell'][0]['value'],
+                        'profit': faction['TradeSell'][0]['profit']
+                    },
+                    'low': {
+                        'items': faction['TradeSell'][2]['items'],
+                        'value': faction['TradeSell'][2]['value'],
+                        'profit': faction['TradeSell'][2]['profit']
+                    },
+                    'high': {
+                        'items': faction['TradeSell'][3]['items'],
+                        'value': faction['TradeSell'][3]['value'],
+                        'profit': faction['TradeSell'][3]['profit']
                     }
+                }
 
-                if sum(int(d['value']) for d in faction['TradeSell']) > 0:
-                    api_faction['tradesell'] = {
-                        'zero': {
-                            'items': faction['TradeSell'][0]['items'],
-                            'value': faction['TradeSell'][0]['value'],
-                            'profit': faction['TradeSell'][0]['profit']
-                        },
-                        'low': {
-                            'items': faction['TradeSell'][2]['items'],
-                            'value': faction['TradeSell'][2]['value'],
-                            'profit': faction['TradeSell'][2]['profit']
-                        },
-                        'high': {
-                            'items': faction['TradeSell'][3]['items'],
-                            'value': faction['TradeSell'][3]['value'],
-                            'profit': faction['TradeSell'][3]['profit']
+            if sum(faction.get('SandR', {}).values()) > 0:
+                api_faction['sandr'] = {
+                    'damagedpods': get_by_path(faction, ['SandR', 'dp'], 0),
+                    'occupiedpods': get_by_path(faction, ['SandR', 'op'], 0),
+                    'thargoidpods': get_by_path(faction, ['SandR', 'tp'], 0),
+                    'blackboxes': get_by_path(faction, ['SandR', 'bb'], 0),
+                    'wreckagecomponents': get_by_path(faction, ['SandR', 'wc'], 0),
+                    'personaleffects': get_by_path(faction, ['SandR', 'pe'], 0),
+                    'politicalprisoners': get_by_path(faction, ['SandR', 'pp'], 0),
+                    'hostages': get_by_path(faction, ['SandR', 'h'], 0)
+                }
+
+            if faction.get('GroundCZ', {}) != {}:
+                api_faction['czground'] = {
+                    'low': faction['GroundCZ'].get('l', 0),
+                    'medium': faction['GroundCZ'].get('m', 0),
+                    'high': faction['GroundCZ'].get('h', 0),
+                    'settlements': []
+                }
+                if faction.get('GroundCZSettlements', {}) != {}:
+                    for settlement_name, settlement_data in faction['GroundCZSettlements'].items():
+                        api_settlement:dict = {
+                            'name': settlement_name,
+                            'type': settlement_data.get('type', ""),
+                            'count': settlement_data.get('count', 0)
                         }
-                    }
+                        api_faction['czground']['settlements'].append(api_settlement)
 
-                if sum(faction.get('SandR', {}).values()) > 0:
-                    api_faction['sandr'] = {
-                        'damagedpods': get_by_path(faction, ['SandR', 'dp'], 0),
-                        'occupiedpods': get_by_path(faction, ['SandR', 'op'], 0),
-                        'thargoidpods': get_by_path(faction, ['SandR', 'tp'], 0),
-                        'blackboxes': get_by_path(faction, ['SandR', 'bb'], 0),
-                        'wreckagecomponents': get_by_path(faction, ['SandR', 'wc'], 0),
-                        'personaleffects': get_by_path(faction, ['SandR', 'pe'], 0),
-                        'politicalprisoners': get_by_path(faction, ['SandR', 'pp'], 0),
-                        'hostages': get_by_path(faction, ['SandR', 'h'], 0)
-                    }
+            if faction.get('SpaceCZ', {}) != {}:
+                api_faction['czspace'] = {
+                    'low': faction['SpaceCZ'].get('l', 0),
+                    'medium': faction['SpaceCZ'].get('m', 0),
+                    'high': faction['SpaceCZ'].get('h', 0)
+                }
 
-                if faction.get('GroundCZ', {}) != {}:
-                    api_faction['czground'] = {
-                        'low': faction['GroundCZ'].get('l', 0),
-                        'medium': faction['GroundCZ'].get('m', 0),
-                        'high': faction['GroundCZ'].get('h', 0),
-                        'settlements': []
-                    }
-                    if faction.get('GroundCZSettlements', {}) != {}:
-                        for settlement_name, settlement_data in faction['GroundCZSettlements'].items():
-                            api_settlement:dict = {
-                                'name': settlement_name,
-                                'type': settlement_data.get('type', ""),
-                                'count': settlement_data.get('count', 0)
-                            }
-                            api_faction['czground']['settlements'].append(api_settlement)
-
-                if faction.get('SpaceCZ', {}) != {}:
-                    api_faction['czspace'] = {
-                        'low': faction['SpaceCZ'].get('l', 0),
-                        'medium': faction['SpaceCZ'].get('m', 0),
-                        'high': faction['SpaceCZ'].get('h', 0)
+            if faction.get('TWStations', {}) != {}:
+                for station in faction.get('TWStations', {}).values():
+                    api_station:dict = {
+                        'name': station.get('name', "")
                     }
-
-                if faction.get('TWStations', {}) != {}:
-                    for station in faction.get('TWStations', {}).values():
-                        api_station:dict = {
-                            'name': station.get('name', "")
+                    if station.get('cargo', {}).get('count', 0) > 0:
+                        api_station['twcargo'] = dict(station['cargo']) # dict containing 'count' and 'sum'
+
+                    if sum(int(d['count']) for d in station['escapepods'].values()) > 0:
+                        api_station['twescapepods'] = {
+                            'low': dict(station['escapepods']['l']),    # dict containing 'count' and 'sum'
+                            'medium': dict(station['escapepods']['m']), # dict containing 'count' and 'sum'
+                            'high': dict(station['escapepods']['h'])    # dict containing 'count' and 'sum'
                         }
-                        if station.get('cargo', {}).get('count', 0) > 0:
-                            api_station['twcargo'] = station['cargo'] # dict containing 'count' and 'sum'
-
-                        if sum(int(d['count']) for d in station['escapepods'].values()) > 0:
-                            api_station['twescapepods'] = {
-                                'low': station['escapepods']['l'],    # dict containing 'count' and 'sum'
-                                'medium': station['escapepods']['m'], # dict containing 'count' and 'sum'
-                                'high': station['escapepods']['h']    # dict containing 'count' and 'sum'
-                            }
-                        if sum(int(d['count']) for d in station['massacre'].values()) > 0:
-                            api_station['twmassacre'] = {
-                                'basilisk': station['massacre']['b'], # dict containing 'count' and 'sum'
-                                'cyclops': station['massacre']['c'],  # dict containing 'count' and 'sum'
-                                'hydra': station['massacre']['h'],    # dict containing 'count' and 'sum'
-                                'medusa': station['massacre']['m'],   # dict containing 'count' and 'sum'
-                                'orthrus': station['massacre']['o'],  # dict containing 'count' and 'sum'
-                                'scout': station['massacre']['s']     # dict containing 'count' and 'sum'
-                            }
-                        if sum(int(d['count']) for d in station['passengers'].values()) > 0:
-                            api_station['twpassengers'] = {
-                                'low': station['passengers']['l'],    # dict containing 'count' and 'sum'
-                                'medium': station['passengers']['m'], # dict containing 'count' and 'sum'
-                                'high': station['passengers']['h']    # dict containing 'count' and 'sum'
-                            }
-                        # TW settlement reactivation missions
-                        if station.get('reactivate', 0) > 0:
-                            api_station['twreactivate'] = station['reactivate'] # int
-
-                    api_faction['stations'].append(api_station)
-
-                api_system['factions'].append(api_faction)
-
-            if sum(system.get('TWKills', {}).values()) > 0:
-                api_system['twkills'] = {
-                    'banshee': system['TWKills'].get('ba', 0),
-                    'basilisk': system['TWKills'].get('b', 0),
-                    'cyclops': system['TWKills'].get('c', 0),
-                    'hydra': system['TWKills'].get('h', 0),
-                    'medusa': system['TWKills'].get('m', 0),
-                    'orthrus': system['TWKills'].get('o', 0),
-                    'revenant': system['TWKills'].get('r', 0),
-                    'scout': system['TWKills'].get('s', 0),
-                    'scythe-glaive': system['TWKills'].get('sg', 0)
-                }
+                    if sum(int(d['count']) for d in station['massacre'].values()) > 0:
+                        api_station['twmassacre'] = {
+                            'basilisk': dict(station['massacre']['b']), # dict containing 'count' and 'sum'
+                            'cyclops': dict(station['massacre']['c']),  # dict containing 'count' and 'sum'
+                            'hydra': dict(station['massacre']['h']),    # dict containing 'count' and 'sum'
+                            'medusa': dict(station['massacre']['m']),   # dict containing 'count' and 'sum'
+                            'orthrus': dict(station['massacre']['o']),  # dict containing 'count' and 'sum'
+                            'scout': dict(station['massacre']['s'])     # dict containing 'count' and 'sum'
+                        }
+                    if sum(int(d['count']) for d in station['passengers'].values()) > 0:
+                        api_station['twpassengers'] = {
+                            'low': dict(station['passengers']['l']),    # dict containing 'count' and 'sum'
+                            'medium': dict(station['passengers']['m']), # dict containing 'count' and 'sum'
+                            'high': dict(station['passengers']['h'])    # dict containing 'count' and 'sum'
+                        }
+                    # TW settlement reactivation missions
+                    if station.get('reactivate', 0) > 0:
+                        api_station['twreactivate'] = station['reactivate'] # int
+
+                api_faction['stations'].append(api_station)
+
+            api_system['factions'].append(api_faction)
+
+        if system['Totals']['TWKills'] > 0:
+            api_system['twkills'] = {
+                'banshee': system['TWKills'].get('ba', 0),
+                'basilisk': system['TWKills'].get('b', 0),
+                'cyclops': system['TWKills'].get('c', 0),
+                'hydra': system['TWKills'].get('h', 0),
+                'medusa': system['TWKills'].get('m', 0),
+                'orthrus': system['TWKills'].get('o', 0),
+                'revenant': system['TWKills'].get('r', 0),
+                'scout': system['TWKills'].get('s', 0),
+                'scythe-glaive': system['TWKills'].get('sg', 0)
+            }
 
-            if sum(int(d['delivered']) for d in system.get('TWSandR', {}).values()) > 0:
-                api_system['twsandr'] = {
-                    'damagedpods': system['TWSandR']['dp']['delivered'],
-                    'occupiedpods': system['TWSandR']['op']['delivered'],
-                    'thargoidpods': system['TWSandR']['tp']['delivered'],
-                    'blackboxes': system['TWSandR']['bb']['delivered'],
-                    'tissuesamples': system['TWSandR']['t']['delivered']
-                }
+        if system['Totals']['TWSandRDelivered'] > 0:
+            api_system['twsandr'] = {
+                'damagedpods': system['TWSandR']['dp']['delivered'],
+                'occupiedpods': system['TWSandR']['op']['delivered'],
+                'thargoidpods': system['TWSandR']['tp']['delivered'],
+                'blackboxes': system['TWSandR']['bb']['delivered'],
+                'tissuesamples': system['TWSandR']['t']['delivered']
+            }
 
-            # TW Reactivated settlements in system
-            if system.get('TWReactivate', 0) > 0:
-                api_system['twreactivate'] = system.get('TWReactivate', 0)
+        # TW Reactivated settlements in system
+        if system.get('TWReactivate', 0) > 0:
+            api_system['twreactivate'] = system.get('TWReactivate', 0)
 
-            api_activity['systems'].append(api_system)
+        return api_system
 
-        return api_activity
 
+    def _get_api_event_context(self, event:dict, activity:Activity, cmdr:str, mission:dict) -> dict:
+        """
+        Take a snapshot of the state needed to build an API event. This must run when the event is received, as the state
+        may have changed by the time the event is built.
+        """
+        context:dict = {
+            'cmdr': cmdr,
+            'tickid': activity.tick_id,
+            'ticktime': activity.tick_time.strftime(DATETIME_FORMAT_JOURNAL),
+            'station_faction': self.bgstally.state.station_faction,
+            'system_name': get_by_path(activity.systems, [self.bgstally.state.current_system_id, 'System'], ""),
+            'system_address': self.bgstally.state.current_system_id
+        }
 
-    def _build_api_event(self, event:dict, activity:Activity, cmdr:str, mission:dict):
+        match event.get('event'):
+            case 'MarketBuy' | 'MarketSell':
+                if self.bgstally.market.available(event['MarketID']):
+                    context['market_data'] = self.bgstally.market.get_commodity(event['Type'])
+
+            case 'MissionFailed' | 'MissionAbandoned':
+                context['mission_faction'] = mission.get('Faction', "") if mission is not None else ""
+
+        return context
+
+
+    def _build_api_event(self, event:dict, context:dict):
         """
         Build an API-ready event ready for sending. This just involves enhancing the event with some
-        additional data
+        additional data, taken from the context captured when the event was received
         """
 
         # Remove all '_Localised' event parameters
         event = self._filter_localised(event)
 
         # BGS-Tally specific global enhancements
-        event['cmdr'] = cmdr
-        event['tickid'] = activity.tick_id
-        event['ticktime']: activity.tick_time.strftime(DATETIME_FORMAT_JOURNAL)
+        event['cmdr'] = context['cmdr']
+        event['tickid'] = context['tickid']
+        event['ticktime'] = context['ticktime']
 
         # Other global enhancements
-        if 'StationFaction' not in event: event['StationFaction'] = {'Name': self.bgstally.state.station_faction}
-        if 'StarSystem' not in event: event['StarSystem'] = get_by_path(activity.systems, [self.bgstally.state.current_system_id, 'System'], "")
-        if 'SystemAddress' not in event: event['SystemAddress'] = self.bgstally.state.current_system_id
+        if 'StationFaction' not in event: event['StationFaction'] = {'Name': context['station_faction']}
+        if 'StarSystem' not in event: event['StarSystem'] = context['system_name']
+        if 'SystemAddress' not in event: event['SystemAddress'] = context['system_address']
 
         # Event-specific enhancements
         match event.get('event'):
             case 'MarketBuy':
-                if self.bgstally.market.available(event['MarketID']):
-                    market_data:dict = self.bgstally.market.get_commodity(event['Type'])
-                    event['StockBracket'] = market_data.get('StockBracket', 0)
-                    event['Stock'] = market_data.get('Stock', 0)
+                if 'market_data' in context:
+                    event['StockBracket'] = context['market_data'].get('StockBracket', 0)
+                    event['Stock'] = context['market_data'].get('Stock', 0)
 
             case 'MarketSell':
-                if self.bgstally.market.available(event['MarketID']):
-                    market_data:dict = self.bgstally.market.get_commodity(event['Type'])
-                    event['DemandBracket'] = market_data.get('DemandBracket', 0)
-                    event['Demand'] = market_data.get('Demand', 0)
+                if 'market_data' in context:
+                    event['DemandBracket'] = context['market_data'].get('DemandBracket', 0)
+                    event['Demand'] = context['market_data'].get('Demand', 0)
 
             case 'MissionFailed' | 'MissionAbandoned':
-                event['StationFaction'] = {'Name': mission.get('Faction', "")}
+                event['StationFaction'] = {'Name': context['mission_faction']}
 
         return event
 
@@ -0,0 +1,469 @@
+import json
+from collections import OrderedDict
+from hashlib import sha1
+from os import path, remove, replace
+from random import uniform
+from threading import Lock
+from time import monotonic, time
+
+from bgstally.constants import FOLDER_OTHER_DATA
+from bgstally.debug import Debug
+from bgstally.persistencemanager import PersistentStore
+
+FILENAME_PREFIX = "apioutbox-"
+FILENAME_SUFFIX = ".jsonl"
+FILENAME_ACTIVITY_SUFFIX = "-activity.json"
+COMPACT_MIN_DEAD_RECORDS = 100  # Don't bother compacting until there are at least this many dead records in the file...
+COMPACT_DEAD_RATIO = 2          # ... and there are this many times more dead records than live ones
+MAX_EVENTS = 10000              # When the outbox holds this many events, the oldest is dropped to make room for each new one
+
+TIME_BACKOFF_BASE_S = 5
+TIME_BACKOFF_MAX_S = 300
+CIRCUIT_FAILURE_THRESHOLD = 5
+TIME_CIRCUIT_OPEN_S = 600
+
+RECORD_EVENT = "event"
+RECORD_DELETE = "del"
+
+
+class APIOutbox(PersistentStore):
+    """
+    A durable outbox for data waiting to be sent to an API, so that nothing is lost if a send fails or EDMC exits before
+    it completes. Entries are only removed once the server has accepted them.
+
+    Events are held in memory and also written to an append-only file as they arrive. The file is replayed on startup and
+    compacted once it contains enough records that are no longer needed. Only the latest activity snapshot matters, and a
+    new one is built on every journal event that changes activity, so it is held in memory and written to its own file
+    by the persistence manager, which batches up changes and saves them on the scheduler thread.
+
+    Each API URL has its own outbox, so data queued for one server is never sent to another. The number of events held
+    is bounded, and once full the oldest events are dropped in favour of new ones.
+    """
+
+    def __init__(self, bgstally, url:str):
+        self.bgstally = bgstally
+        self.url:str = url
+        filename_base:str = FILENAME_PREFIX + sha1(url.encode('utf-8')).hexdigest()[:12]
+        self.filepath:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, filename_base + FILENAME_SUFFIX)
+        self.activity_filepath:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, filename_base + FILENAME_ACTIVITY_SUFFIX)
+
+        self.lock:Lock = Lock()
+        self.save_lock:Lock = Lock() # Held while the activity file is being written, so saves never overlap
+        self.events:OrderedDict[int, dict] = OrderedDict() # key = sequence number, value = event
+        self.event_times:dict[int, float] = {} # key = sequence number, value = time the event was added (seconds since epoch, so survives a restart)
+        self.activity:dict|None = None
+        self.activity_seq:int|None = None
+        self.next_seq:int = 1
+        self.dead_records:int = 0 # Records in the events file that have been deleted
+        self.dropped_events:int = 0 # Events discarded because the outbox was full
+        self.file = None
+
+        self._load()
+
+
+    def add_event(self, event:dict) -> int:
+        """Add an event to the outbox
+
+        Args:
+            event (dict): The event
+
+        Returns:
+            int: The sequence number of the event in the outbox
+        """
+        with self.lock:
+            if len(self.events) >= MAX_EVENTS: self._drop_oldest_events(len(self.events) - MAX_EVENTS + 1)
+
+            seq:int = self._get_next_seq()
+            event_time:float = time()
+            self.events[seq] = event
+            self.event_times[seq] = event_time
+            self._append({'op': RECORD_EVENT, 'seq': seq, 'time': event_time, 'data': event})
+            return seq
+
+
+    def set_activity(self, activity:dict) -> int:
+        """Store an activity snapshot in the outbox, replacing any previous snapshot that hasn't been sent yet. The snapshot
+        isn't written here, it is saved later by the persistence manager.
+
+        Args:
+            activity (dict): The activity
+
+        Returns:
+            int: The sequence number of the activity in the outbox
+        """
+        with self.lock:
+            seq:int = self._get_next_seq()
+            self.activity = activity
+            self.activity_seq = seq
+
+        self.dirty = True
+        return seq
+
+
+    def get_events(self, max_events:int) -> list[tuple[int, dict]]:
+        """Get the oldest events in the outbox, without removing them
+
+        Args:
+            max_events (int): The maximum number of events to return
+
+        Returns:
+            list[tuple[int, dict]]: A list of (sequence number, event) tuples, oldest first
+        """
+        with self.lock:
+            result:list[tuple[int, dict]] = []
+
+            for seq, event in self.events.items():
+                if len(result) >= max_events: break
+                result.append((seq, event))
+
+            return result
+
+
+    def get_activity(self) -> tuple[int, dict]|None:
+        """Get the activity snapshot waiting to be sent, without removing it
+
+        Returns:
+            tuple[int, dict] | None: A (sequence number, activity) tuple, or None if there is no activity waiting
+        """
+        with self.lock:
+            if self.activity is None: return None
+            return self.activity_seq, self.activity
+
+
+    def remove_events(self, seqs:list[int]):
+        """Remove sent events from the outbox
+
+        Args:
+            seqs (list[int]): The sequence numbers of the events to remove
+        """
+        with self.lock:
+            removed:list[int] = [seq for seq in seqs if self.events.pop(seq, None) is not None]
+            if not removed: return
+
+            for seq in removed: self.event_times.pop(seq, None)
+
+            self._append({'op': RECORD_DELETE, 'seq': removed})
+            self.dead_records += len(removed) + 1
+            self._compact_if_needed()
+
+
+    def remove_activity(self, seq:int):
+        """Remove a sent activity snapshot from the outbox, unless it has since been replaced by a newer one
+
+        Args:
+            seq (int): The sequence number of the activity that was sent
+        """
+        with self.lock:
+            if self.activity_seq != seq: return
+
+            self.activity = None
+            self.activity_seq = None
+
+        self.dirty = True
+
+
+    def clear_events(self):
+        """
+        Discard all events in the outbox
+        """
+        with self.lock:
+            if not self.events: return
+
+            self.events.clear()
+            self.event_times.clear()
+            self._compact()
+
+
+    def clear_activity(self):
+        """
+        Discard any activity snapshot in the outbox
+        """
+        with self.lock:
+            if self.activity is None: return
+
+            self.activity = None
+            self.activity_seq = None
+
+        self.dirty = True
+
+
+    def get_depth(self) -> int:
+        """
+        Get the number of events waiting to be sent
+        """
+        with self.lock:
+            return len(self.events)
+
+
+    def get_oldest_event_age(self) -> float:
+        """
+        Get the number of seconds the oldest waiting event has been in the outbox, or 0 if there are no events waiting
+        """
+        with self.lock:
+            if not self.events: return 0
+
+            return max(time() - self.event_times.get(next(iter(self.events)), time()), 0)
+
+
+    def get_metrics(self) -> dict:
+        """Get outbox metrics
+
+        Returns:
+            dict: The number of events waiting, the age in seconds of the oldest waiting event, the number of events dropped
+            because the outbox was full and whether there is an activity snapshot waiting
+        """
+        return {'depth': self.get_depth(),
+                'oldest_age_s': self.get_oldest_event_age(),
+                'dropped': self.dropped_events,
+                'activity_waiting': self.activity is not None}
+
+
+    def save(self) -> int:
+        """
+        Save the activity snapshot to file, or remove the file if there is no snapshot waiting, returning the number of
+        bytes written. The new file is written alongside and then moved into place, so it is never left half-written.
+        """
+        if not self.dirty: return 0
+
+        with self.save_lock:
+            with self.lock:
+                version:int = self.version
+                activity:dict|None = self.activity
+                activity_seq:int|None = self.activity_seq
+
+            bytes_written:int = 0
+
+            try:
+                if activity is None:
+                    if path.exists(self.activity_filepath): remove(self.activity_filepath)
+                else:
+                    # Activity snapshots are never modified once built, so it's safe to serialise this one outside the lock
+                    json_data:str = json.dumps({'seq': activity_seq, 'data': activity})
+                    temp_filepath:str = self.activity_filepath + ".tmp"
+                    with open(temp_filepath, 'w', encoding='utf-8') as file:
+                        file.write(json_data)
+                    replace(temp_filepath, self.activity_filepath)
+                    bytes_written = len(json_data)
+            except OSError as e:
+                # The snapshot is still held in memory, it just won't survive a restart. Left dirty so the next save retries.
+                Debug.logger.warning(f"Unable to save API outbox activity {self.activity_filepath}", exc_info=e)
+                return 0
+
+            self.mark_saved(version)
+            return bytes_written
+
+
+    def close(self):
+        """
+        Save any unsaved activity snapshot and close the events file, deleting it if there is nothing left in it
+        """
+        self.save()
+
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+            if not self.events and path.exists(self.filepath):
+                try:
+                    remove(self.filepath)
+                except OSError as e:
+                    Debug.logger.info(f"Unable to remove {self.filepath}")
+
+
+    def _get_next_seq(self) -> int:
+        """
+        Allocate the next sequence number. Must be called with self.lock held.
+        """
+        seq:int = self.next_seq
+        self.next_seq += 1
+        return seq
+
+
+    def _drop_oldest_events(self, count:int):
+        """
+        Discard the oldest events to make room for new ones. Must be called with self.lock held.
+        """
+        dropped:list[int] = []
+
+        while self.events and len(dropped) < count:
+            seq, event = self.events.popitem(last=False)
+            self.event_times.pop(seq, None)
+            dropped.append(seq)
+
+        if not dropped: return
+
+        # Only log the start of an overflow, not every single event dropped while it lasts
+        if self.dropped_events == 0 or self.dropped_events % MAX_EVENTS == 0:
+            Debug.logger.warning(f"API outbox for {self.url} is full, dropping oldest events")
+
+        self.dropped_events += len(dropped)
+        self._append({'op': RECORD_DELETE, 'seq': dropped})
+        self.dead_records += len(dropped) + 1
+
+
+    def _append(self, record:dict):
+        """
+        Append a record to the events file. Must be called with self.lock held.
+        """
+        try:
+            if self.file is None: self.file = open(self.filepath, 'a', encoding='utf-8')
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+        except OSError as e:
+            # Data is still held in memory, it just won't survive a restart
+            Debug.logger.warning(f"Unable to write to API outbox {self.filepath}", exc_info=e)
+
+
+    def _load(self):
+        """
+        Load the activity snapshot and replay the events file to rebuild our state
+        """
+        self._load_activity()
+        if not path.exists(self.filepath): return
+
+        records:int = 0
+
+        try:
+            with open(self.filepath, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record:dict = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Most likely a partly written final line from a crash, nothing after it can be trusted
+                        Debug.logger.warning(f"Ignoring corrupt record in API outbox {self.filepath}")
+                        break
+
+                    records += 1
+                    self._replay(record)
+        except OSError as e:
+            Debug.logger.warning(f"Unable to load API outbox {self.filepath}", exc_info=e)
+            return
+
+        if self.events: Debug.logger.info(f"Loaded {len(self.events)} unsent events from API outbox for {self.url}")
+
+        # Start afresh with a file containing just the live records
+        if records > len(self.events) or len(self.events) > MAX_EVENTS:
+            with self.lock:
+                if len(self.events) > MAX_EVENTS: self._drop_oldest_events(len(self.events) - MAX_EVENTS)
+                self._compact()
+
+
+    def _load_activity(self):
+        """
+        Load the activity snapshot waiting to be sent, if there is one
+        """
+        if not path.exists(self.activity_filepath): return
+
+        try:
+            with open(self.activity_filepath, encoding='utf-8') as file:
+                record:dict = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            Debug.logger.warning(f"Unable to load API outbox activity {self.activity_filepath}", exc_info=e)
+            return
+
+        self.activity = record.get('data')
+        self.activity_seq = record.get('seq', 0)
+        self.next_seq = max(self.next_seq, self.activity_seq + 1)
+        if self.activity is not None: Debug.logger.info(f"Loaded unsent activity from API outbox for {self.url}")
+
+
+    def _replay(self, record:dict):
+        """
+        Apply a single record read from the events file
+        """
+        seq:int = record.get('seq', 0)
+
+        match record.get('op'):
+            case "event":
+                self.events[seq] = record.get('data', {})
+                self.event_times[seq] = record.get('time', time())
+            case "del":
+                for deleted_seq in seq:
+                    self.events.pop(deleted_seq, None)
+                    self.event_times.pop(deleted_seq, None)
+
+        if isinstance(seq, int): self.next_seq = max(self.next_seq, seq + 1)
+
+
+    def _compact_if_needed(self):
+        """
+        Compact the events file if enough of it is dead records. Must be called with self.lock held.
+        """
+        if self.dead_records >= COMPACT_MIN_DEAD_RECORDS and self.dead_records >= len(self.events) * COMPACT_DEAD_RATIO:
+            self._compact()
+
+
+    def _compact(self):
+        """
+        Rewrite the events file so it only contains live records. The new file is written alongside and then moved into
+        place, so the outbox is never left half-written. Must be called with self.lock held.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+        temp_filepath:str = self.filepath + ".tmp"
+
+        try:
+            with open(temp_filepath, 'w', encoding='utf-8') as file:
+                for seq, event in self.events.items():
+                    file.write(json.dumps({'op': RECORD_EVENT, 'seq': seq, 'time': self.event_times.get(seq, time()), 'data': event}) + "\n")
+
+            replace(temp_filepath, self.filepath)
+            self.dead_records = 0
+        except OSError as e:
+            Debug.logger.warning(f"Unable to compact API outbox {self.filepath}", exc_info=e)
+
+
+class CircuitBreaker:
+    """
+    Tracks failures sending to an endpoint. After each failure, further attempts are delayed with exponential backoff
+    and jitter. After several consecutive failures the circuit opens and the endpoint is left alone for a longer period,
+    after which a single trial request is allowed through. Any success closes the circuit again.
+    """
+
+    def __init__(self, name:str):
+        self.name:str = name
+        self.failures:int = 0
+        self.retry_time:float = 0 # Monotonic time before which no request should be sent
+
+
+    def allow_request(self) -> bool:
+        """
+        Return True if a request may be sent to the endpoint now
+        """
+        return monotonic() >= self.retry_time
+
+
+    def is_open(self) -> bool:
+        """
+        Return True if the circuit is open, i.e. the endpoint has failed repeatedly and we have stopped trying for now
+        """
+        return self.failures >= CIRCUIT_FAILURE_THRESHOLD and not self.allow_request()
+
+
+    def record_success(self):
+        """
+        A request to the endpoint has succeeded
+        """
+        if self.failures >= CIRCUIT_FAILURE_THRESHOLD: Debug.logger.info(f"Circuit closed for {self.name}")
+        self.failures = 0
+        self.retry_time = 0
+
+
+    def record_failure(self):
+        """
+        A request to the endpoint has failed
+        """
+        self.failures += 1
+
+        if self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+            if self.failures == CIRCUIT_FAILURE_THRESHOLD: Debug.logger.warning(f"Circuit opened for {self.name} after {self.failures} consecutive failures")
+            delay:float = TIME_CIRCUIT_OPEN_S
+        else:
+            # Exponential backoff, with jitter so that many clients don't all retry at once after an outage
+            delay:float = min(TIME_BACKOFF_BASE_S * (2 ** (self.failures - 1)), TIME_BACKOFF_MAX_S)
+            delay = uniform(delay / 2, delay)
+
+        self.retry_time = monotonic() + delay
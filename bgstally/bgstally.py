@@ -1,7 +1,6 @@
 import sys
+from datetime import datetime
 from os import mkdir, path
-from threading import Thread
-from time import sleep
 
 import semantic_version
 from companion import SERVER_LIVE, CAPIData
@@ -11,26 +10,29 @@ from bgstally.activity import Activity
 from bgstally.activitymanager import ActivityManager
 from bgstally.apimanager import APIManager
 from bgstally.config import Config
-from bgstally.constants import FOLDER_OTHER_DATA, UpdateUIPolicy
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, UpdateUIPolicy
 from bgstally.debug import Debug
 from bgstally.discord import Discord
 from bgstally.fleetcarrier import FleetCarrier
+from bgstally.journaldispatcher import JournalContext, JournalDispatcher, JournalHandler
+from bgstally.journalprofiler import JournalEventTimer, JournalProfiler
 from bgstally.formatters.default import DefaultActivityFormatter
 from bgstally.formattermanager import ActivityFormatterManager
 from bgstally.market import Market
 from bgstally.missionlog import MissionLog
 from bgstally.overlay import Overlay
+from bgstally.persistencemanager import PersistenceManager
 from bgstally.requestmanager import RequestManager
+from bgstally.scheduler import Scheduler
 from bgstally.state import State
 from bgstally.targetmanager import TargetManager
 from bgstally.tick import Tick
+from bgstally.tickdetector import TickDetector
 from bgstally.ui import UI
 from bgstally.updatemanager import UpdateManager
-from bgstally.utils import _, get_by_path
+from bgstally.utils import _
 from bgstally.webhookmanager import WebhookManager
-from config import appversion, config
-
-TIME_WORKER_PERIOD_S = 60
+from config import appversion
 
 
 class BGSTally:
@@ -41,6 +43,9 @@ class BGSTally:
         self.plugin_name:str = plugin_name
         self.version: semantic_version.Version = version
 
+        # The most recent journal entry that asked for a tick check, and its context, replayed if the check finds a new tick
+        self.tick_check_entry: tuple[dict, JournalContext]|None = None
+
 
     def plugin_start(self, plugin_dir: str):
         """
@@ -75,24 +80,26 @@ class BGSTally:
         if not path.exists(data_filepath): mkdir(data_filepath)
 
         # Main Classes
+        self.scheduler: Scheduler = Scheduler(self)
+        self.request_manager: RequestManager = RequestManager(self)
         self.state: State = State(self)
         self.mission_log: MissionLog = MissionLog(self)
         self.target_manager: TargetManager = TargetManager(self)
         self.discord: Discord = Discord(self)
         self.tick: Tick = Tick(self, True)
+        self.tick_detector: TickDetector = TickDetector(self)
         self.overlay: Overlay = Overlay(self)
         self.activity_manager: ActivityManager = ActivityManager(self)
         self.fleet_carrier: FleetCarrier = FleetCarrier(self)
         self.market: Market = Market(self)
-        self.request_manager: RequestManager = RequestManager(self)
         self.api_manager: APIManager = APIManager(self)
         self.webhook_manager: WebhookManager = WebhookManager(self)
         self.update_manager: UpdateManager = UpdateManager(self)
         self.ui: UI = UI(self)
         self.formatter_manager: ActivityFormatterManager = ActivityFormatterManager(self)
-        self.thread: Thread = Thread(target=self._worker, name="BGSTally Main worker")
-        self.thread.daemon = True
-        self.thread.start()
+        self.persistence_manager: PersistenceManager = PersistenceManager(self)
+        self.journal_profiler: JournalProfiler = JournalProfiler(self)
+        self.journal_dispatcher: JournalDispatcher = JournalDispatcher(self)
 
 
     def plugin_stop(self):
@@ -100,12 +107,16 @@ class BGSTally:
         The plugin is shutting down.
         """
         self.ui.shut_down()
-        self.save_data()
+        self.scheduler.shut_down()
+        self.overlay.shut_down()
+        self.request_manager.shut_down()
+        self.state.save_prefs()
+        self.persistence_manager.shut_down()
 
 
     def journal_entry(self, cmdr, is_beta, system, station, entry, state):
         """
-        Parse an incoming journal entry and store the data we need
+        Parse an incoming journal entry and pass it to the handlers registered for its event type
         """
 
         # Live galaxy check
@@ -115,166 +126,57 @@ class BGSTally:
             self.debug.logger.error(f"The EDMC Version is too old, please upgrade to v5.6.0 or later", exc_info=e)
             return
 
-        activity: Activity = self.activity_manager.get_current_activity()
-        dirty: bool = False
-
-        if entry.get('event') in ['StartUp', 'Location', 'FSDJump', 'CarrierJump']:
-            if self.check_tick(UpdateUIPolicy.IMMEDIATE):
-                # New activity will be generated with a new tick
-                activity = self.activity_manager.get_current_activity()
-
-            activity.system_entered(entry, self.state)
-            dirty = True
-
-        mission:dict = self.mission_log.get_mission(entry.get('MissionID'))
-
-        match entry.get('event'):
-            case 'ApproachSettlement' if state['Odyssey']:
-                activity.settlement_approached(entry, self.state)
-                dirty = True
-
-            case 'Bounty':
-                activity.bv_received(entry, self.state)
-                dirty = True
-
-            case 'CapShipBond':
-                activity.cap_ship_bond_received(entry)
-                dirty = True
-
-            case 'Cargo':
-                activity.cargo(entry)
-
-            case 'CarrierJumpCancelled':
-                self.fleet_carrier.jump_cancelled()
-
-            case 'CarrierJumpRequest':
-                self.fleet_carrier.jump_requested(entry)
-
-            case 'CarrierStats':
-                self.fleet_carrier.stats_received(entry)
-
-            case 'CarrierTradeOrder':
-                self.fleet_carrier.trade_order(entry)
-
-            case 'CollectCargo':
-                activity.cargo_collected(entry, self.state)
-                dirty = True
-
-            case 'CommitCrime':
-                activity.crime_committed(entry, self.state)
-                dirty = True
-
-            case 'Died':
-                self.target_manager.died(entry, system)
-
-            case 'Docked':
-                self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
-                self.state.station_type = entry.get('StationType', "")
-                dirty = True
-
-            case 'EjectCargo':
-                activity.cargo_ejected(entry)
-                dirty = True
-
-            case 'FactionKillBond' if state['Odyssey']:
-                activity.cb_received(entry, self.state)
-                dirty = True
-
-            case 'Friends' if entry.get('Status') == "Requested":
-                self.target_manager.friend_request(entry, system)
-
-            case 'Friends' if entry.get('Status') == "Added":
-                self.target_manager.friend_added(entry, system)
-
-            case 'Interdicted':
-                self.target_manager.interdicted(entry, system)
-
-            case 'Location' | 'StartUp' if entry.get('Docked') == True:
-                self.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], self.state.station_faction) # Default to existing value
-                self.state.station_type = entry.get('StationType', "")
-                dirty = True
-
-            case 'Market':
-                self.market.load()
-
-            case 'MarketBuy':
-                activity.trade_purchased(entry, self.state)
-                dirty = True
-
-            case 'MarketSell':
-                activity.trade_sold(entry, self.state)
-                dirty = True
+        # Only time the event if diagnostics are enabled, so there is no cost otherwise
+        profiling: bool = self.state.enable_diagnostics
+        if profiling: timer: JournalEventTimer = self.journal_profiler.start(entry.get('event'))
 
-            case 'MissionAbandoned':
-                self.mission_log.delete_mission_by_id(entry.get('MissionID'))
-                dirty = True
-
-            case 'MissionAccepted':
-                self.mission_log.add_mission(entry.get('Name', ""), entry.get('Faction', ""), entry.get('MissionID', ""), entry.get('Expiry', ""),
-                                             entry.get('DestinationSystem', ""), entry.get('DestinationSettlement', ""), system, station,
-                                             entry.get('Count', -1), entry.get('PassengerCount', -1), entry.get('KillCount', -1),
-                                             entry.get('TargetFaction', ""))
-                dirty = True
-
-            case 'MissionCompleted':
-                activity.mission_completed(entry, self.mission_log)
-                dirty = True
-
-            case 'MissionFailed':
-                activity.mission_failed(entry, self.mission_log)
-                dirty = True
-
-            case 'ReceiveText':
-                self.target_manager.received_text(entry, system)
-
-            case 'RedeemVoucher' if entry.get('Type') == 'bounty':
-                activity.bv_redeemed(entry, self.state)
-                dirty = True
-
-            case 'RedeemVoucher' if entry.get('Type') == 'CombatBond':
-                activity.cb_redeemed(entry, self.state)
-                dirty = True
-
-            case 'Resurrect':
-                activity.player_resurrected()
-                dirty = True
+        activity: Activity = self.activity_manager.get_current_activity()
+        handlers: list[JournalHandler]|None = self.journal_dispatcher.get_handlers(entry.get('event'))
 
-            case 'SearchAndRescue':
-                activity.search_and_rescue(entry, self.state)
-                dirty = True
+        if handlers is not None:
+            handlers = [handler for handler in handlers if handler.condition is None or handler.condition(entry, state)]
 
-            case 'SellExplorationData' | 'MultiSellExplorationData':
-                activity.exploration_data_sold(entry, self.state)
-                dirty = True
+        if not handlers:
+            # Nothing to do for most events, apart from passing them on to any API that wants them
+            if profiling: timer.start_section()
+            self.api_manager.send_event(entry, activity, cmdr, None)
+            if profiling: timer.end_section('api'); timer.finish()
+            return
 
-            case 'SellOrganicData':
-                activity.organic_data_sold(entry, self.state)
-                dirty = True
+        tick_check: bool = any(handler.needs_tick_check for handler in handlers)
 
-            case 'ShipTargeted':
-                activity.ship_targeted(entry, self.state)
-                self.target_manager.ship_targeted(entry, system)
-                dirty = True
+        if tick_check:
+            # Start any new tick the tick detector has already found, so the entry is recorded in the right activity
+            if profiling: timer.start_section()
+            if self.check_tick(UpdateUIPolicy.IMMEDIATE):
+                # New activity will be generated with a new tick
+                activity = self.activity_manager.get_current_activity()
+            if profiling: timer.end_section('tick')
 
-            case 'SupercruiseDestinationDrop':
-                activity.destination_dropped(entry, self.state)
-                dirty = True
+            # Also ask the tick detector for a fresh check. This doesn't wait for the result, so this entry is recorded in
+            # the current activity regardless. If the check finds a new tick, the entry is replayed into the new activity
+            # when the tick is started, see _replay_tick_check_entry().
+            self.tick_detector.check_now()
 
-            case 'SupercruiseEntry':
-                activity.supercruise(entry, self.state)
+        # Look up the mission before the handlers run, as they may remove it from the mission log
+        mission: dict|None = None
+        if any(handler.needs_mission for handler in handlers): mission = self.mission_log.get_mission(entry.get('MissionID'))
 
-            case 'Undocked' if entry.get('Taxi') == False:
-                self.state.station_faction = ""
-                self.state.station_type = ""
+        context: JournalContext = JournalContext(cmdr, system, station, state, mission)
+        if tick_check: self.tick_check_entry = (dict(entry), context)
 
-            case 'WingInvite':
-                self.target_manager.team_invite(entry, system)
+        dirty: bool = self.journal_dispatcher.run_handlers(handlers, activity, entry, context)
 
         if dirty:
-            self.save_data()
+            if profiling: timer.start_section()
+            self.persistence_manager.mark_dirty()
+            if profiling: timer.end_section('save'); timer.start_section()
             self.api_manager.send_activity(activity, cmdr)
+            if profiling: timer.end_section('api')
 
+        if profiling: timer.start_section()
         self.api_manager.send_event(entry, activity, cmdr, mission)
+        if profiling: timer.end_section('api'); timer.finish()
 
 
     def capi_fleetcarrier(self, data: CAPIData):
@@ -298,32 +200,63 @@ class BGSTally:
         return callable(appversion) and appversion() >= semantic_version.Version('5.8.0')
 
 
-    def check_tick(self, uipolicy: UpdateUIPolicy):
+    def check_tick(self, uipolicy: UpdateUIPolicy) -> bool:
+        """
+        Check whether the tick detector has found a new tick, and start it if so. Doesn't perform any I/O, so is safe to
+        call from the journal and Tk threads.
+        """
+        tick_time = self.tick_detector.get_new_tick_time()
+        if tick_time is None or not self.tick.tick_received(tick_time): return False
+
+        previous_activity: Activity = self.activity_manager.get_current_activity()
+        self.new_tick(False, uipolicy)
+        if self.activity_manager.get_current_activity() is not previous_activity: self._replay_tick_check_entry(tick_time)
+        return True
+
+
+    def _replay_tick_check_entry(self, tick_time: datetime):
         """
-        Check for a new tick
+        A new tick has been started. The tick detector doesn't hold up journal processing, so the entry that asked for the
+        check which found the tick, e.g. the jump into the first system after the tick, has already been recorded in the
+        previous tick's activity. If that entry happened after the tick, replay it into the new activity too.
         """
-        tick_success = self.tick.fetch_tick()
+        if self.tick_check_entry is None: return
+        entry, context = self.tick_check_entry
+        self.tick_check_entry = None
+
+        try:
+            if datetime.strptime(entry.get('timestamp', ""), DATETIME_FORMAT_JOURNAL) < tick_time: return
+        except ValueError:
+            return
 
-        if tick_success:
-            self.new_tick(False, uipolicy)
-            return True
-        else:
-            return tick_success
+        handlers: list[JournalHandler] = [handler for handler in self.journal_dispatcher.get_handlers(entry.get('event')) or []
+                                          if handler.needs_tick_check and (handler.condition is None or handler.condition(entry, context.game_state))]
+        activity: Activity = self.activity_manager.get_current_activity()
+
+        if self.journal_dispatcher.run_handlers(handlers, activity, entry, context):
+            self.persistence_manager.mark_dirty()
+            self.api_manager.send_activity(activity, context.cmdr)
 
 
-    def save_data(self):
+    def save_data(self) -> int:
         """
-        Save all data structures
+        Save all data structures. This is normally called via the persistence manager, which batches up changes and calls
+        this on its worker thread, rather than directly. Each store tracks its own changes and skips the write if clean.
+
+        Returns:
+            int: The number of bytes written to data files
         """
-        # TODO: Don't need to save all this all the time, be more selective
-        self.mission_log.save()
-        self.target_manager.save()
+        bytes_written: int = 0
+        bytes_written += self.mission_log.save()
+        bytes_written += self.target_manager.save()
         self.tick.save()
-        self.activity_manager.save()
+        bytes_written += self.activity_manager.save()
         self.state.save()
-        self.fleet_carrier.save()
-        self.api_manager.save()
-        self.webhook_manager.save()
+        bytes_written += self.fleet_carrier.save()
+        bytes_written += self.api_manager.save()
+        bytes_written += self.webhook_manager.save()
+
+        return bytes_written
 
 
     def new_tick(self, force: bool, uipolicy: UpdateUIPolicy):
@@ -333,6 +266,8 @@ class BGSTally:
         if force: self.tick.force_tick()
         if not self.activity_manager.new_tick(self.tick, force): return
 
+        self.persistence_manager.mark_dirty()
+
         match uipolicy:
             case UpdateUIPolicy.IMMEDIATE:
                 self.ui.update_plugin_frame()
@@ -340,19 +275,3 @@ class BGSTally:
                 self.ui.frame.after(1000, self.ui.update_plugin_frame())
 
         self.overlay.display_message("tickwarn", _("NEW TICK DETECTED!"), True, 180, "green") # LANG: Overlay message
-
-
-    def _worker(self) -> None:
-        """
-        Handle thread work
-        """
-        Debug.logger.debug("Starting Main Worker...")
-
-        while True:
-            if config.shutting_down:
-                Debug.logger.debug("Shutting down Main Worker...")
-                return
-
-            sleep(TIME_WORKER_PERIOD_S)
-
-            self.check_tick(UpdateUIPolicy.LATER) # Must not update UI directly from a thread
@@ -67,6 +67,18 @@ class Config(object):
         return result
 
 
+    def requests(self) -> dict:
+        """Fetch the request engine configuration
+
+        Returns:
+            dict: The configuration for the request engine, empty if there is none
+        """
+        try:
+            return dict(self.config['requests'])
+        except KeyError:
+            return {}
+
+
     def overlay_frame(self, name: str) -> dict | None:
         """Fetch all information about a given overlay panel
 
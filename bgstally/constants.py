@@ -69,6 +69,12 @@ class RequestMethod(Enum):
     OPTIONS = 'options'
 
 
+class RequestPriority(int, Enum):
+    INTERACTIVE = 0 # The user is waiting for the result, e.g. they clicked a "Post to Discord" button
+    NORMAL = 1
+    BACKGROUND = 2  # Nobody is waiting, e.g. API batches, Inara lookups and update checks
+
+
 class CmdrInteractionReason(int, Enum):
     SCANNED = 0
     FRIEND_REQUEST_RECEIVED = 1
@@ -81,6 +87,8 @@ class CmdrInteractionReason(int, Enum):
 
 DATETIME_FORMAT_JOURNAL: str = "%Y-%m-%dT%H:%M:%SZ"
 FILE_SUFFIX: str = ".json"
+FOLDER_ACTIVITYDATA: str = "activitydata"
+FOLDER_ACTIVITYDATA_ARCHIVE: str = "archive"
 FOLDER_ASSETS: str = "assets"
 FOLDER_BACKUPS: str = "backups"
 FOLDER_DATA: str = "data"
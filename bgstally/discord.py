@@ -3,7 +3,7 @@ from datetime import datetime
 
 from requests import Response
 
-from bgstally.constants import DiscordChannel, RequestMethod
+from bgstally.constants import DiscordChannel, RequestMethod, RequestPriority
 from bgstally.debug import Debug
 from bgstally.requestmanager import BGSTallyRequest
 from bgstally.utils import _, __, get_by_path
@@ -36,9 +36,9 @@ class Discord:
         self.bgstally = bgstally
 
 
-    def post_plaintext(self, discord_text:str, webhooks_data:dict|None, channel:DiscordChannel, callback:callable):
+    def post_plaintext(self, discord_text:str, webhooks_data:dict|None, channel:DiscordChannel, callback:callable, priority:RequestPriority = RequestPriority.NORMAL):
         """
-        Post plain text to Discord
+        Post plain text to Discord. Use RequestPriority.INTERACTIVE for posts the user has explicitly asked for.
         """
         # Start with latest webhooks from manager. Will contain True / False for each channel. Copy dict so we don't affect the webhook manager data.
         webhooks:dict = deepcopy(self.bgstally.webhook_manager.get_webhooks_as_dict(channel))
@@ -67,7 +67,7 @@ class Discord:
                 url:str = webhook_url
                 payload:dict = {'content': discord_text, 'username': self.bgstally.state.DiscordUsername.get(), 'embeds': []}
 
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, callback=self._request_complete, data=data)
+                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, callback=self._request_complete, data=data, bucket=webhook_url, priority=priority)
             else:
                 # Previous post
                 if discord_text != "":
@@ -75,14 +75,14 @@ class Discord:
                     url:str = f"{webhook_url}/messages/{previous_messageid}"
                     payload:dict = {'content': discord_text, 'username': self.bgstally.state.DiscordUsername.get(), 'embeds': []}
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data)
+                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data, bucket=webhook_url, coalesce_key=f"PATCH {url}", priority=priority)
                 else:
                     url:str = f"{webhook_url}/messages/{previous_messageid}"
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data)
+                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data, bucket=webhook_url, priority=priority)
 
 
-    def post_embed(self, title: str, description: str, fields: list, webhooks_data: dict|None, channel: DiscordChannel, callback: callable):
+    def post_embed(self, title: str, description: str, fields: list, webhooks_data: dict|None, channel: DiscordChannel, callback: callable, priority: RequestPriority = RequestPriority.NORMAL):
         """Post an embed to Discord. All fields are truncated to discord limits before posting.
 
         Args:
@@ -92,6 +92,7 @@ class Discord:
             webhooks_data (dict | None): Previous webhook state if reposting
             channel (DiscordChannel): The discord channel to post to
             callback (callable): A callback function to be called once the post is completed
+            priority (RequestPriority, optional): The request priority. Use INTERACTIVE for posts the user has explicitly asked for. Defaults to NORMAL.
         """
         # Start with latest webhooks from manager. Will contain True / False for each channel. Copy dict so we don't affect the webhook manager data.
         webhooks: dict = deepcopy(self.bgstally.webhook_manager.get_webhooks_as_dict(channel))
@@ -128,7 +129,7 @@ class Discord:
                     'avatar_url': URL_LOGO,
                     'embeds': [embed]}
 
-                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, params={'wait': 'true'}, callback=self._request_complete, data=data)
+                self.bgstally.request_manager.queue_request(url, RequestMethod.POST, payload=payload, params={'wait': 'true'}, callback=self._request_complete, data=data, bucket=webhook_url, priority=priority)
             else:
                 # Previous post
                 if fields is not None and fields != []:
@@ -140,11 +141,11 @@ class Discord:
                         'avatar_url': URL_LOGO,
                         'embeds': [embed]}
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data)
+                    self.bgstally.request_manager.queue_request(url, RequestMethod.PATCH, payload=payload, callback=self._request_complete, data=data, bucket=webhook_url, coalesce_key=f"PATCH {url}", priority=priority)
                 else:
                     url: str = f"{webhook_url}/messages/{previous_messageid}"
 
-                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data)
+                    self.bgstally.request_manager.queue_request(url, RequestMethod.DELETE, callback=self._request_complete, data=data, bucket=webhook_url, priority=priority)
 
 
     def _request_complete(self, success:bool, response:Response, request:BGSTallyRequest):
@@ -154,7 +155,7 @@ class Discord:
         if not success:
             if request.method == RequestMethod.PATCH:
                 # If a PATCH (message update) fails, we can try again with a POST (message create). Note the URL is not the same.
-                self.bgstally.request_manager.queue_request(get_by_path(request.data, ['webhookdata', 'url']), RequestMethod.POST, payload=request.payload, params={'wait': 'true'}, callback=self._request_complete, data=request.data)
+                self.bgstally.request_manager.queue_request(get_by_path(request.data, ['webhookdata', 'url']), RequestMethod.POST, payload=request.payload, params={'wait': 'true'}, callback=self._request_complete, data=request.data, bucket=request.bucket, priority=request.priority)
             else:
                 # If POSTs or DELETEs fail, we can't do anything more
                 Debug.logger.warning(f"Unable to post message to Discord. Reason: '{response.reason}' Content: '{response.content}' URL: '{request.endpoint}'")
@@ -0,0 +1,96 @@
+import re
+
+from bgstally.debug import Debug
+
+# Patterns that match any value, so there's no need to check the field at all
+PATTERNS_MATCH_ALL = ["", ".*", "^.*", ".*$", "^.*$"]
+
+
+class EventFilter:
+    """
+    A compiled filter for a single event type, built from the 'filters' for the event in the API discovery data. Each
+    filter is a field name and a regular expression that the field's value must match (from the start of the value) for
+    the event to be sent. Patterns are compiled once, up front, and the cheapest possible check is chosen for each field.
+    """
+
+    def __init__(self, event_name:str, filters:dict|None):
+        """Compile the filters for an event type
+
+        Args:
+            event_name (str): The event name
+            filters (dict | None): The filters, key = field name, value = regular expression. None for no filtering.
+        """
+        self.event_name:str = event_name
+        self.match_none:bool = False # True if the filters can never all match, so every event is filtered out
+
+        # Each check is a tuple of (field name, literal prefix or None, compiled regex match function or None, whether a
+        # missing field matches)
+        self.checks:list[tuple[str, str|None, callable|None, bool]] = []
+
+        if not isinstance(filters, dict): return
+
+        for field, pattern in filters.items():
+            pattern_str:str = str(pattern)
+            if pattern_str in PATTERNS_MATCH_ALL: continue
+
+            try:
+                regex:re.Pattern = re.compile(pattern_str)
+            except re.error as e:
+                # We can't honour a filter we can't understand, so don't send any events of this type
+                Debug.logger.warning(f"Invalid API filter for {event_name}.{field}: {pattern_str} ({e})")
+                self.match_none = True
+                self.checks = []
+                return
+
+            # A missing field is matched against an empty string, so we can work out the result now
+            matches_missing:bool = regex.match("") is not None
+
+            if re.escape(pattern_str) == pattern_str:
+                # No special characters, so this is just a prefix match
+                self.checks.append((field, pattern_str, None, matches_missing))
+            else:
+                self.checks.append((field, None, regex.match, matches_missing))
+
+        # Check literal prefixes first, as they are cheapest
+        self.checks.sort(key=lambda check: check[1] is None)
+
+
+    def matches(self, event:dict) -> bool:
+        """Check whether an event passes this filter and should be sent
+
+        Args:
+            event (dict): The event
+
+        Returns:
+            bool: True if the event passes all the filters
+        """
+        if self.match_none: return False
+
+        for field, prefix, regex_match, matches_missing in self.checks:
+            value = event.get(field)
+
+            if value is None and field not in event:
+                if matches_missing: continue
+                return False
+
+            value_str:str = value if isinstance(value, str) else str(value)
+
+            if prefix is not None:
+                if not value_str.startswith(prefix): return False
+            elif regex_match(value_str) is None:
+                return False
+
+        return True
+
+
+def compile_event_filters(events:dict) -> dict[str, EventFilter]:
+    """Compile the event filters for all event types in API discovery data
+
+    Args:
+        events (dict): The events from the discovery data, key = event name, value = dict optionally containing 'filters'
+
+    Returns:
+        dict[str, EventFilter]: The compiled filters, key = event name
+    """
+    return {event_name: EventFilter(event_name, event_data.get('filters') if isinstance(event_data, dict) else None)
+            for event_name, event_data in events.items()}
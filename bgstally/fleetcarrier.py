@@ -2,20 +2,23 @@ import csv
 import json
 from datetime import datetime
 from os import path, remove
+from threading import RLock
 
 from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_DATA, FOLDER_OTHER_DATA, DiscordChannel, FleetCarrierItemType
 from bgstally.debug import Debug
 from bgstally.discord import DATETIME_FORMAT
-from bgstally.utils import _, __, get_by_path
+from bgstally.persistencemanager import PersistentStore
+from bgstally.utils import _, __, get_by_path, write_json_text
 from thirdparty.colors import *
 
 FILENAME = "fleetcarrier.json"
 COMMODITIES_CSV_FILENAME = "commodity.csv"
 
 
-class FleetCarrier:
+class FleetCarrier(PersistentStore):
     def __init__(self, bgstally):
         self.bgstally = bgstally
+        self.lock:RLock = RLock() # Held while changing or serialising stored data, as saves are made on the scheduler thread
         self.data:dict = {}
         self.name:str = None
         self.callsign:str = None
@@ -42,13 +45,20 @@ class FleetCarrier:
                 Debug.logger.info(f"Unable to load {file}")
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save state to file
+        Save state to file, returning the number of bytes written
         """
+        if not self.dirty: return 0
+
+        with self.lock:
+            version:int = self.version
+            json_data:str = json.dumps(self._as_dict())
+
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(self._as_dict(), outfile)
+        bytes_written:int = write_json_text(file, json_data)
+        self.mark_saved(version)
+        return bytes_written
 
 
     def available(self):
@@ -62,53 +72,57 @@ class FleetCarrier:
         """
         Store the latest data
         """
-        # Data directly from CAPI response. Structure documented here:
-        # https://github.com/EDCD/FDevIDs/blob/master/Frontier%20API/FrontierDevelopments-CAPI-endpoints.md#fleetcarrier
+        with self.change():
+            # Data directly from CAPI response. Structure documented here:
+            # https://github.com/EDCD/FDevIDs/blob/master/Frontier%20API/FrontierDevelopments-CAPI-endpoints.md#fleetcarrier
 
-        # Store the whole data structure
-        self.data = data
+            # Store the whole data structure
+            self.data = data
+            self.dirty = True
 
-        # Name is encoded as hex string
-        self.name = bytes.fromhex(get_by_path(self.data, ['name', 'vanityName'], "----")).decode('utf-8')
-        self.callsign = get_by_path(self.data, ['name', 'callsign'], "----")
+            # Name is encoded as hex string
+            self.name = bytes.fromhex(get_by_path(self.data, ['name', 'vanityName'], "----")).decode('utf-8')
+            self.callsign = get_by_path(self.data, ['name', 'callsign'], "----")
 
-        # Sort microresource sell orders - a Dict of Dicts, or an empty list
-        materials:dict|list = get_by_path(self.data, ['orders', 'onfootmicroresources', 'sales'], [])
-        if materials is not None and type(materials) is dict and materials != {}:
-            self.onfoot_mats_selling = list(materials.values())
-        else:
-            self.onfoot_mats_selling = []
+            # Sort microresource sell orders - a Dict of Dicts, or an empty list
+            materials:dict|list = get_by_path(self.data, ['orders', 'onfootmicroresources', 'sales'], [])
+            if materials is not None and type(materials) is dict and materials != {}:
+                self.onfoot_mats_selling = list(materials.values())
+            else:
+                self.onfoot_mats_selling = []
 
-        # Sort microresource buy orders - a List of Dicts
-        materials = get_by_path(self.data, ['orders', 'onfootmicroresources', 'purchases'], [])
-        if materials is not None and materials != []:
-            self.onfoot_mats_buying = materials
-        else:
-            self.onfoot_mats_buying = []
+            # Sort microresource buy orders - a List of Dicts
+            materials = get_by_path(self.data, ['orders', 'onfootmicroresources', 'purchases'], [])
+            if materials is not None and materials != []:
+                self.onfoot_mats_buying = materials
+            else:
+                self.onfoot_mats_buying = []
 
-        # Sort commodity sell orders - a List of Dicts
-        commodities:list = get_by_path(self.data, ['orders', 'commodities', 'sales'], [])
-        if commodities is not None and commodities != []:
-            self.commodities_selling = commodities
-        else:
-            self.commodities_selling = []
+            # Sort commodity sell orders - a List of Dicts
+            commodities:list = get_by_path(self.data, ['orders', 'commodities', 'sales'], [])
+            if commodities is not None and commodities != []:
+                self.commodities_selling = commodities
+            else:
+                self.commodities_selling = []
 
-        # Sort commodity buy orders - a List of Dicts
-        commodities = get_by_path(self.data, ['orders', 'commodities', 'purchases'], [])
-        if commodities is not None and commodities != []:
-            self.commodities_buying = commodities
-        else:
-            self.commodities_buying = []
+            # Sort commodity buy orders - a List of Dicts
+            commodities = get_by_path(self.data, ['orders', 'commodities', 'purchases'], [])
+            if commodities is not None and commodities != []:
+                self.commodities_buying = commodities
+            else:
+                self.commodities_buying = []
 
 
     def stats_received(self, journal_entry: dict):
         """
         The user entered the carrier management screen
         """
-        if self.name is None:
-            self.name = journal_entry.get("Name")
-            self.callsign = journal_entry.get("Callsign")
-            self.data['dockingAccess'] = journal_entry.get("DockingAccess")
+        with self.change():
+            if self.name is None:
+                self.name = journal_entry.get("Name")
+                self.callsign = journal_entry.get("Callsign")
+                self.data['dockingAccess'] = journal_entry.get("DockingAccess")
+                self.dirty = True
 
 
     def jump_requested(self, journal_entry: dict):
@@ -154,36 +168,38 @@ class FleetCarrier:
             journal_entry (dict): The journal entry data
         """
 
-        # { "timestamp":"2024-02-17T16:33:10Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"imperialslaves", "Commodity_Localised":"Imperial Slaves", "SaleOrder":10, "Price":1749300 }
-        # { "timestamp":"2024-02-17T16:33:51Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"unstabledatacore", "Commodity_Localised":"Unstable Data Core", "PurchaseOrder":5, "Price":4516 }
-        # { "timestamp":"2024-02-17T16:35:57Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"unstabledatacore", "Commodity_Localised":"Unstable Data Core", "CancelTrade":true }
-
-        item_name:str = journal_entry.get('Commodity', "").lower()
-
-        if item_name in self.commodities:
-            # The order is for a commodity. Note we pass the item_name as the display name because Commodity_Localised is not always present for commodities,
-            # and anyway we don't get localised names in CAPI data so generally they are not present. So, we look display name up later for commodities.
-            if journal_entry.get('SaleOrder') is not None:
-                self._update_item(item_name, item_name, int(journal_entry.get('SaleOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.COMMODITIES_SELLING)
-                self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_BUYING)
-            elif journal_entry.get('PurchaseOrder') is not None:
-                self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_SELLING)
-                self._update_item(item_name, item_name, int(journal_entry.get('PurchaseOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.COMMODITIES_BUYING)
-            elif journal_entry.get('CancelTrade') == True:
-                self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_SELLING)
-                self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_BUYING)
-        else:
-            # The order is for a material.
-            item_display_name:str = journal_entry.get('Commodity_Localised', "")
-            if journal_entry.get('SaleOrder') is not None:
-                self._update_item(item_name, item_display_name, int(journal_entry.get('SaleOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.MATERIALS_SELLING)
-                self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_BUYING)
-            elif journal_entry.get('PurchaseOrder') is not None:
-                self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_SELLING)
-                self._update_item(item_name, item_display_name, int(journal_entry.get('PurchaseOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.MATERIALS_BUYING)
-            elif journal_entry.get('CancelTrade') == True:
-                self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_SELLING)
-                self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_BUYING)
+        with self.change():
+            # { "timestamp":"2024-02-17T16:33:10Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"imperialslaves", "Commodity_Localised":"Imperial Slaves", "SaleOrder":10, "Price":1749300 }
+            # { "timestamp":"2024-02-17T16:33:51Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"unstabledatacore", "Commodity_Localised":"Unstable Data Core", "PurchaseOrder":5, "Price":4516 }
+            # { "timestamp":"2024-02-17T16:35:57Z", "event":"CarrierTradeOrder", "CarrierID":3703308032, "BlackMarket":false, "Commodity":"unstabledatacore", "Commodity_Localised":"Unstable Data Core", "CancelTrade":true }
+
+            item_name:str = journal_entry.get('Commodity', "").lower()
+            self.dirty = True
+
+            if item_name in self.commodities:
+                # The order is for a commodity. Note we pass the item_name as the display name because Commodity_Localised is not always present for commodities,
+                # and anyway we don't get localised names in CAPI data so generally they are not present. So, we look display name up later for commodities.
+                if journal_entry.get('SaleOrder') is not None:
+                    self._update_item(item_name, item_name, int(journal_entry.get('SaleOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.COMMODITIES_SELLING)
+                    self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_BUYING)
+                elif journal_entry.get('PurchaseOrder') is not None:
+                    self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_SELLING)
+                    self._update_item(item_name, item_name, int(journal_entry.get('PurchaseOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.COMMODITIES_BUYING)
+                elif journal_entry.get('CancelTrade') == True:
+                    self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_SELLING)
+                    self._update_item(item_name, item_name, 0, 0, FleetCarrierItemType.COMMODITIES_BUYING)
+            else:
+                # The order is for a material.
+                item_display_name:str = journal_entry.get('Commodity_Localised', "")
+                if journal_entry.get('SaleOrder') is not None:
+                    self._update_item(item_name, item_display_name, int(journal_entry.get('SaleOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.MATERIALS_SELLING)
+                    self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_BUYING)
+                elif journal_entry.get('PurchaseOrder') is not None:
+                    self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_SELLING)
+                    self._update_item(item_name, item_display_name, int(journal_entry.get('PurchaseOrder', 0)), int(journal_entry.get('Price', 0)), FleetCarrierItemType.MATERIALS_BUYING)
+                elif journal_entry.get('CancelTrade') == True:
+                    self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_SELLING)
+                    self._update_item(item_name, item_display_name, 0, 0, FleetCarrierItemType.MATERIALS_BUYING)
 
 
     def get_items_plaintext(self, category: FleetCarrierItemType|None = None) -> str:
@@ -160,10 +160,10 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         # Force plain text if we are not posting to Discord
         fp: bool = not discord
 
-        activity_text += self._build_inf(faction['MissionPoints'], faction['MissionPointsSecondary'], faction['FactionState'], discord, lang)
+        activity_text += self._build_inf(faction['MissionPoints'], faction['MissionPointsSecondary'], faction['Totals'], faction['FactionState'], discord, lang)
         activity_text += red("BVs", fp=fp) + " " + green(human_format(faction['Bounties']), fp=fp) + " " if faction['Bounties'] != 0 else "" # LANG: Discord heading, abbreviation for bounty vouchers
         activity_text += red("CBs", fp=fp) + " " + green(human_format(faction['CombatBonds']), fp=fp) + " " if faction['CombatBonds'] != 0 else "" # LANG: Discord heading, abbreviation for combat bonds
-        activity_text += self._build_trade(faction['TradeBuy'], faction['TradeSell'], discord, lang)
+        activity_text += self._build_trade(faction['TradeBuy'], faction['TradeSell'], faction['Totals'], discord, lang)
         activity_text += cyan(__("TrdBMProfit", lang), fp=fp) + " " + green(human_format(faction['BlackMarketProfit']), fp=fp) + " " if faction['BlackMarketProfit'] != 0 else "" # LANG: Discord heading, abbreviation for trade black market profit
         activity_text += white(__("Expl", lang), fp=fp) + " " + green(human_format(faction['CartData']), fp=fp) + " " if faction['CartData'] != 0 else "" # LANG: Discord heading, abbreviation for exploration
         # activity_text += grey(__('Exo', lang), fp=fp) + " " + green(human_format(faction['ExoData']), fp=fp) + " " if faction['ExoData'] != 0 else "" # LANG: Discord heading, abbreviation for exobiology
@@ -236,8 +236,8 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
                 system_station['mission_count_total'] += faction_station['reactivate']
 
         # System-specific tally
-        kills: int = sum(system['TWKills'].values())
-        sandr: int = sum(int(d['delivered']) for d in system['TWSandR'].values())
+        kills: int = system['Totals']['TWKills']
+        sandr: int = system['Totals']['TWSandRDelivered']
         reactivate: int = system['TWReactivate']
         if kills > 0 or sandr > 0 or reactivate > 0:
             system_text += ("🍀 " if discord else "TW ") + __("System activity", lang) + "\n" # LANG: Discord heading
@@ -287,12 +287,13 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         return system_text
 
 
-    def _build_inf(self, inf_data: dict, secondary_inf_data: dict, faction_state: str, discord: bool, lang: str) -> str:
+    def _build_inf(self, inf_data: dict, secondary_inf_data: dict, totals: dict, faction_state: str, discord: bool, lang: str) -> str:
         """Create a complete summary of INF for the faction, including both primary and secondary if user has requested
 
         Args:
             inf_data (dict): Dict containing INF, key = '1' - '5' or 'm'
             secondary_inf_data (dict): Dict containing secondary INF, key = '1' - '5' or 'm'
+            totals (dict): The faction's running totals
             faction_state (str): Current faction state
             discord (bool): True if creating for Discord
             lang (str): The language code for this post.
@@ -304,8 +305,8 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         # Force plain text if we are not posting to Discord
         fp: bool = not discord
 
-        inf: int = sum((1 if k == 'm' else int(k)) * int(v) for k, v in inf_data.items())
-        inf_sec: int = sum((1 if k == 'm' else int(k)) * int(v) for k, v in secondary_inf_data.items())
+        inf: int = totals['Inf']
+        inf_sec: int = totals['InfSecondary']
 
         if inf != 0 or (inf_sec != 0 and self.bgstally.state.secondary_inf):
             if faction_state in STATES_ELECTION:
@@ -357,7 +358,7 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
         return text
 
 
-    def _build_trade(self, trade_buy: list, trade_sell: list, discord: bool, lang: str) -> str:
+    def _build_trade(self, trade_buy: list, trade_sell: list, totals: dict, discord: bool, lang: str) -> str:
         """Create a summary of trade, with detailed breakdown if user has requested
 
         Args:
@@ -365,6 +366,7 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
             trade_profit (int): Legacy total trade profit value (before trade was tracked in brackets).
             trade_buy (list): List of trade purchases with each entry corresponding to a trade bracket.
             trade_sell (list): List of trade sales with each entry corresponding to a trade bracket.
+            totals (dict): The faction's running totals
             discord (bool): True if creating for Discord
             lang (str): The language code for this post.
 
@@ -378,19 +380,19 @@ class DefaultActivityFormatter(FieldActivityFormatterInterface):
 
         if not self.bgstally.state.detailed_trade:
             # Modern, simple trade report - Combine buy at all brackets and profit at all brackets
-            buy_total: int = sum(int(d['value']) for d in trade_buy)
-            profit_total: int = sum(int(d['profit']) for d in trade_sell)
+            buy_total: int = totals['TradeBuy']
+            profit_total: int = totals['TradeProfit']
             text += cyan(__("TrdBuy", lang), fp=fp) + " " + green(human_format(buy_total), fp=fp) + " " if buy_total != 0 else "" # LANG: Discord heading, abbreviation for trade buy
             text += cyan(__("TrdProfit", lang), fp=fp) + " " + green(human_format(profit_total), fp=fp) + " " if profit_total != 0 else "" # LANG: Discord heading, abbreviation for trade profit
         else:
             # Modern, detailed trade report - Split into values per supply / demand bracket
-            if sum(int(d['value']) for d in trade_buy) > 0:
+            if totals['TradeBuy'] > 0:
                 # Buy brackets currently range from 1 - 3
                 text += cyan(__("TrdBuy", lang), fp=fp) + " "
                 if int(trade_buy[1]['value']) != 0: text += f"{'🅻' if discord else '[L]'}:{green(human_format(trade_buy[1]['value']), fp=fp)} "
                 if int(trade_buy[2]['value']) != 0: text += f"{'🅼' if discord else '[M]'}:{green(human_format(trade_buy[2]['value']), fp=fp)} "
                 if int(trade_buy[3]['value']) != 0: text += f"{'🅷' if discord else '[H]'}:{green(human_format(trade_buy[3]['value']), fp=fp)} "
-            if sum(int(d['value']) for d in trade_sell) > 0:
+            if totals['TradeSell'] > 0:
                 # Sell brackets currently range from 0 - 3
                 text += cyan(__("TrdProfit", lang), fp=fp) + " "
                 if int(trade_sell[0]['profit']) != 0: text += f"{'🆉' if discord else '[Z]'}:{green(human_format(trade_sell[0]['profit']), fp=fp)} "
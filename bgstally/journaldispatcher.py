@@ -0,0 +1,192 @@
+from typing import Callable
+
+from bgstally.activity import Activity
+from bgstally.debug import Debug
+from bgstally.utils import get_by_path
+
+
+class JournalContext:
+    """
+    The details passed by EDMC alongside a journal entry, plus the mission the entry refers to if any handler asked for it
+    """
+
+    def __init__(self, cmdr:str, system:str, station:str, game_state:dict, mission:dict|None):
+        self.cmdr:str = cmdr
+        self.system:str = system
+        self.station:str = station
+        self.game_state:dict = game_state
+        self.mission:dict|None = mission
+
+
+class JournalHandler:
+    """
+    A handler for one or more journal event types. The handler function is called as func(bgstally, activity, entry, context)
+    and its return value is ignored. The flags tell the dispatcher what to do around it, so handlers don't need to.
+    """
+
+    def __init__(self, func:Callable, condition:Callable[[dict, dict], bool]|None = None,
+                 dirties_activity:bool = False, needs_mission:bool = False, needs_tick_check:bool = False):
+        """Create a handler
+
+        Args:
+            func (Callable): The handler function, called as func(bgstally, activity, entry, context)
+            condition (Callable[[dict, dict], bool] | None, optional): Called as condition(entry, game_state), the handler only runs if this returns True. Defaults to None, always run.
+            dirties_activity (bool, optional): The handler changes data that needs saving and sending to APIs. Defaults to False.
+            needs_mission (bool, optional): The mission the entry refers to must be looked up before any handler runs. Defaults to False.
+            needs_tick_check (bool, optional): Check for a new tick before any handler runs, so the entry is recorded in the right activity. Defaults to False.
+        """
+        self.func:Callable = func
+        self.condition:Callable[[dict, dict], bool]|None = condition
+        self.dirties_activity:bool = dirties_activity
+        self.needs_mission:bool = needs_mission
+        self.needs_tick_check:bool = needs_tick_check
+
+
+class JournalDispatcher:
+    """
+    Registry of journal event handlers, keyed by event name. All of BGS-Tally's own journal handling is registered here,
+    and other code can add handlers for further events with register() without changing the main plugin class. Where
+    more than one handler is registered for an event, all those whose condition passes are run, in registration order.
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.handlers:dict[str, list[JournalHandler]] = {}
+        self._register_default_handlers()
+
+
+    def register(self, event_names:str|list[str], func:Callable, condition:Callable[[dict, dict], bool]|None = None,
+                 dirties_activity:bool = False, needs_mission:bool = False, needs_tick_check:bool = False) -> JournalHandler:
+        """Register a handler for one or more journal event types. See JournalHandler for details of the arguments.
+
+        Returns:
+            JournalHandler: The new handler, which can be passed to unregister()
+        """
+        handler:JournalHandler = JournalHandler(func, condition, dirties_activity, needs_mission, needs_tick_check)
+        if isinstance(event_names, str): event_names = [event_names]
+
+        for event_name in event_names:
+            self.handlers.setdefault(event_name, []).append(handler)
+
+        return handler
+
+
+    def unregister(self, handler:JournalHandler):
+        """
+        Remove a handler from all the event types it was registered for
+        """
+        for event_name in list(self.handlers.keys()):
+            handlers:list[JournalHandler] = [h for h in self.handlers[event_name] if h is not handler]
+            if handlers:
+                self.handlers[event_name] = handlers
+            else:
+                del self.handlers[event_name]
+
+
+    def get_handlers(self, event_name:str|None) -> list[JournalHandler]|None:
+        """
+        Get the handlers registered for an event type, or None if there are none
+        """
+        return self.handlers.get(event_name)
+
+
+    def run_handlers(self, handlers:list[JournalHandler], activity:Activity, entry:dict, context:JournalContext) -> bool:
+        """Run handlers for a journal entry. A handler that fails is logged and doesn't stop the others running.
+
+        Args:
+            handlers (list[JournalHandler]): The handlers to run, which must already have passed their conditions
+            activity (Activity): The current activity
+            entry (dict): The journal entry
+            context (JournalContext): The entry's context
+
+        Returns:
+            bool: True if any handler that ran dirties the activity
+        """
+        dirty:bool = False
+
+        # The handlers change the activity as one, so it is never saved with only some of them applied
+        with activity.change():
+            for handler in handlers:
+                try:
+                    handler.func(self.bgstally, activity, entry, context)
+                except Exception as e:
+                    Debug.logger.error(f"Error handling {entry.get('event')} journal event", exc_info=e)
+                    continue
+
+                if handler.dirties_activity: dirty = True
+
+        return dirty
+
+
+    def _register_default_handlers(self):
+        """
+        Register all of BGS-Tally's own journal event handlers
+        """
+        register = self.register
+
+        register(['StartUp', 'Location', 'FSDJump', 'CarrierJump'], lambda b, activity, entry, context: activity.system_entered(entry, b.state), dirties_activity=True, needs_tick_check=True)
+        register('ApproachSettlement', lambda b, activity, entry, context: activity.settlement_approached(entry, b.state), condition=lambda entry, game_state: game_state['Odyssey'], dirties_activity=True)
+        register('Bounty', lambda b, activity, entry, context: activity.bv_received(entry, b.state), dirties_activity=True)
+        register('CapShipBond', lambda b, activity, entry, context: activity.cap_ship_bond_received(entry), dirties_activity=True)
+        register('Cargo', lambda b, activity, entry, context: activity.cargo(entry))
+        register('CarrierJumpCancelled', lambda b, activity, entry, context: b.fleet_carrier.jump_cancelled())
+        register('CarrierJumpRequest', lambda b, activity, entry, context: b.fleet_carrier.jump_requested(entry))
+        register('CarrierStats', lambda b, activity, entry, context: b.fleet_carrier.stats_received(entry))
+        register('CarrierTradeOrder', lambda b, activity, entry, context: b.fleet_carrier.trade_order(entry))
+        register('CollectCargo', lambda b, activity, entry, context: activity.cargo_collected(entry, b.state), dirties_activity=True)
+        register('CommitCrime', lambda b, activity, entry, context: activity.crime_committed(entry, b.state), dirties_activity=True)
+        register('Died', lambda b, activity, entry, context: b.target_manager.died(entry, context.system))
+        register('Docked', _docked, dirties_activity=True)
+        register('EjectCargo', lambda b, activity, entry, context: activity.cargo_ejected(entry), dirties_activity=True)
+        register('FactionKillBond', lambda b, activity, entry, context: activity.cb_received(entry, b.state), condition=lambda entry, game_state: game_state['Odyssey'], dirties_activity=True)
+        register('Friends', lambda b, activity, entry, context: b.target_manager.friend_request(entry, context.system), condition=lambda entry, game_state: entry.get('Status') == "Requested")
+        register('Friends', lambda b, activity, entry, context: b.target_manager.friend_added(entry, context.system), condition=lambda entry, game_state: entry.get('Status') == "Added")
+        register('Interdicted', lambda b, activity, entry, context: b.target_manager.interdicted(entry, context.system))
+        register(['Location', 'StartUp'], _docked, condition=lambda entry, game_state: entry.get('Docked') == True, dirties_activity=True)
+        register('Market', lambda b, activity, entry, context: b.market.load())
+        register('MarketBuy', lambda b, activity, entry, context: activity.trade_purchased(entry, b.state), dirties_activity=True)
+        register('MarketSell', lambda b, activity, entry, context: activity.trade_sold(entry, b.state), dirties_activity=True)
+        register('MissionAbandoned', lambda b, activity, entry, context: b.mission_log.delete_mission_by_id(entry.get('MissionID')), dirties_activity=True, needs_mission=True)
+        register('MissionAccepted', _mission_accepted, dirties_activity=True)
+        register('MissionCompleted', lambda b, activity, entry, context: activity.mission_completed(entry, b.mission_log), dirties_activity=True)
+        register('MissionFailed', lambda b, activity, entry, context: activity.mission_failed(entry, b.mission_log), dirties_activity=True, needs_mission=True)
+        register('ReceiveText', lambda b, activity, entry, context: b.target_manager.received_text(entry, context.system))
+        register('RedeemVoucher', lambda b, activity, entry, context: activity.bv_redeemed(entry, b.state), condition=lambda entry, game_state: entry.get('Type') == 'bounty', dirties_activity=True)
+        register('RedeemVoucher', lambda b, activity, entry, context: activity.cb_redeemed(entry, b.state), condition=lambda entry, game_state: entry.get('Type') == 'CombatBond', dirties_activity=True)
+        register('Resurrect', lambda b, activity, entry, context: activity.player_resurrected(), dirties_activity=True)
+        register('SearchAndRescue', lambda b, activity, entry, context: activity.search_and_rescue(entry, b.state), dirties_activity=True)
+        register(['SellExplorationData', 'MultiSellExplorationData'], lambda b, activity, entry, context: activity.exploration_data_sold(entry, b.state), dirties_activity=True)
+        register('SellOrganicData', lambda b, activity, entry, context: activity.organic_data_sold(entry, b.state), dirties_activity=True)
+        register('ShipTargeted', lambda b, activity, entry, context: activity.ship_targeted(entry, b.state), dirties_activity=True)
+        register('ShipTargeted', lambda b, activity, entry, context: b.target_manager.ship_targeted(entry, context.system))
+        register('SupercruiseDestinationDrop', lambda b, activity, entry, context: activity.destination_dropped(entry, b.state), dirties_activity=True)
+        register('SupercruiseEntry', lambda b, activity, entry, context: activity.supercruise(entry, b.state))
+        register('Undocked', _undocked, condition=lambda entry, game_state: entry.get('Taxi') == False)
+        register('WingInvite', lambda b, activity, entry, context: b.target_manager.team_invite(entry, context.system))
+
+
+def _docked(bgstally, activity:Activity, entry:dict, context:JournalContext):
+    """
+    Docked at a station, or started up or arrived already docked
+    """
+    bgstally.state.station_faction = get_by_path(entry, ['StationFaction', 'Name'], bgstally.state.station_faction) # Default to existing value
+    bgstally.state.station_type = entry.get('StationType', "")
+
+
+def _undocked(bgstally, activity:Activity, entry:dict, context:JournalContext):
+    """
+    Undocked from a station
+    """
+    bgstally.state.station_faction = ""
+    bgstally.state.station_type = ""
+
+
+def _mission_accepted(bgstally, activity:Activity, entry:dict, context:JournalContext):
+    """
+    Accepted a mission
+    """
+    bgstally.mission_log.add_mission(entry.get('Name', ""), entry.get('Faction', ""), entry.get('MissionID', ""), entry.get('Expiry', ""),
+                                     entry.get('DestinationSystem', ""), entry.get('DestinationSettlement', ""), context.system, context.station,
+                                     entry.get('Count', -1), entry.get('PassengerCount', -1), entry.get('KillCount', -1),
+                                     entry.get('TargetFaction', ""))
@@ -0,0 +1,137 @@
+import json
+from datetime import datetime
+from os import path
+from threading import Lock
+from time import perf_counter
+
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA
+from bgstally.debug import Debug
+
+FILENAME = "journaltimings.json"
+SECTIONS = ['tick', 'save', 'api']
+
+
+class JournalEventTimer:
+    """
+    Times a single journal event as it is processed, split into named sections. Created by JournalProfiler.start() and
+    only ever used on the journal thread, so needs no locking.
+    """
+
+    def __init__(self, profiler, event_name:str):
+        self.profiler:JournalProfiler = profiler
+        self.event_name:str = event_name
+        self.sections:dict[str, float] = {}
+        self.time_start:float = perf_counter()
+        self.time_section:float = self.time_start
+
+
+    def start_section(self):
+        """
+        Start timing a section of the event processing
+        """
+        self.time_section = perf_counter()
+
+
+    def end_section(self, section:str):
+        """
+        Finish timing a section of the event processing, adding the time taken to the named section
+        """
+        self.sections[section] = self.sections.get(section, 0) + perf_counter() - self.time_section
+
+
+    def finish(self):
+        """
+        Finish timing the event, and record it with the profiler
+        """
+        self.profiler.record(self.event_name, perf_counter() - self.time_start, self.sections)
+
+
+class JournalProfiler:
+    """
+    Records how long each type of journal event takes to process, and how much of that is spent checking for and
+    starting new ticks, saving and building API data. Only used when diagnostics are enabled in preferences, the journal hot path doesn't touch
+    this at all otherwise.
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.lock:Lock = Lock()
+        self.stats:dict[str, dict] = {} # key = event name, value = timing stats for that event
+        self.since:str = datetime.utcnow().strftime(DATETIME_FORMAT_JOURNAL)
+
+
+    def start(self, event_name:str|None) -> JournalEventTimer:
+        """Start timing a journal event
+
+        Args:
+            event_name (str | None): The event name
+
+        Returns:
+            JournalEventTimer: The timer, call finish() on it once the event has been processed
+        """
+        return JournalEventTimer(self, str(event_name))
+
+
+    def record(self, event_name:str, total_s:float, sections:dict[str, float]):
+        """Record the time taken to process a journal event. Safe to call from any thread.
+
+        Args:
+            event_name (str): The event name
+            total_s (float): Total time taken, in seconds
+            sections (dict[str, float]): Time taken by each section of the processing, in seconds
+        """
+        with self.lock:
+            stats:dict|None = self.stats.get(event_name)
+            if stats is None:
+                stats = {'count': 0, 'total_s': 0, 'max_s': 0} | {f"{section}_s": 0 for section in SECTIONS}
+                self.stats[event_name] = stats
+
+            stats['count'] += 1
+            stats['total_s'] += total_s
+            if total_s > stats['max_s']: stats['max_s'] = total_s
+            for section, section_s in sections.items():
+                stats[f"{section}_s"] += section_s
+
+
+    def get_stats(self) -> dict[str, dict]:
+        """Get a copy of the timings recorded so far
+
+        Returns:
+            dict[str, dict]: key = event name, value = the number of events, and the total and maximum time taken and the total time in each section, in seconds
+        """
+        with self.lock:
+            return {event_name: dict(stats) for event_name, stats in self.stats.items()}
+
+
+    def reset(self):
+        """
+        Clear all recorded timings
+        """
+        with self.lock:
+            self.stats = {}
+            self.since = datetime.utcnow().strftime(DATETIME_FORMAT_JOURNAL)
+
+
+    def save(self) -> str:
+        """Save the recorded timings, along with counters from the other background services, to a JSON file
+
+        Returns:
+            str: The full path of the file written
+        """
+        with self.lock:
+            since:str = self.since
+
+        data:dict = {'version': str(self.bgstally.version),
+                     'since': since,
+                     'saved': datetime.utcnow().strftime(DATETIME_FORMAT_JOURNAL),
+                     'events': self.get_stats(),
+                     'persistence': self.bgstally.persistence_manager.get_stats(),
+                     'scheduler': self.bgstally.scheduler.get_stats()}
+
+        file:str = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
+        with open(file, 'w') as outfile:
+            json.dump(data, outfile, indent=4)
+
+        Debug.logger.info(f"Journal event timings saved to {file}")
+        return file
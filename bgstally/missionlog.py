@@ -1,24 +1,40 @@
+import heapq
 import json
-from os import path, remove
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import count
+from os import path, remove
+from threading import RLock
 
 from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA
 from bgstally.debug import Debug
+from bgstally.persistencemanager import PersistentStore
+from bgstally.utils import write_json_file
 
 FILENAME = "missionlog.json"
 FILENAME_LEGACY = "MissionLog.txt"
 TIME_MISSION_EXPIRY_D = 7
+TIME_EXPIRY_CHECK_MAX_S = 3600 # Longest between expiry checks, so we cope with the system clock changing
 
 
-class MissionLog:
+class MissionLog(PersistentStore):
     """
-    Handle a log of all in-progress missions
+    Handle a log of all in-progress missions. Missions are indexed by MissionID, in the order they were accepted, with a
+    heap of the times they are due to be removed and a count of missions in each system. Missions are kept for a while
+    after they expire, so we can log failed missions correctly, and are removed in the background once that time is up.
+    All access is protected by a lock, as missions are expired on the scheduler thread.
     """
     def __init__(self, bgstally):
         self.bgstally = bgstally
-        self.missionlog = []
+
+        self.lock:RLock = RLock()
+        self.missions:dict = {}                 # key = MissionID, value = mission dict as stored in the JSON file
+        self.expiry_heap:list[tuple] = []       # Entries are (removal time, sequence, MissionID, mission dict)
+        self.expiry_seq:count = count()         # Breaks ties in the heap, as MissionIDs aren't guaranteed to be comparable
+        self.system_counts:Counter = Counter()  # key = system name, value = number of missions in that system
+
         self.load()
-        self._expire_old_missions()
+        self.job = self.bgstally.scheduler.add_job("Mission Expiry", self._expire_old_missions)
 
 
     def load(self):
@@ -30,7 +46,7 @@ class MissionLog:
         if path.exists(file):
             try:
                 with open(file) as json_file:
-                    self.missionlog = json.load(json_file)
+                    self._set_missions(json.load(json_file))
                     return
             except Exception as e:
                 Debug.logger.info(f"Unable to load {file}")
@@ -40,26 +56,36 @@ class MissionLog:
         if path.exists(file):
             try:
                 with open(file) as json_file:
-                    self.missionlog = json.load(json_file)
+                    self._set_missions(json.load(json_file))
                 remove(file)
+                # Legacy file is gone, make sure the data is written to the new location
+                self.dirty = True
             except Exception as e:
                 Debug.logger.info(f"Unable to load and remove {file}")
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save state to file
+        Save state to file, returning the number of bytes written
         """
+        if not self.dirty: return 0
+
+        with self.lock:
+            version:int = self.version
+            missionlog:list = list(self.missions.values())
+
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(self.missionlog, outfile)
+        bytes_written:int = write_json_file(file, missionlog)
+        self.mark_saved(version)
+        return bytes_written
 
 
-    def get_missionlog(self):
+    def get_missionlog(self) -> list:
         """
-        Get the current missionlog
+        Get a copy of the current missionlog, in the order the missions were accepted
         """
-        return self.missionlog
+        with self.lock:
+            return list(self.missions.values())
 
 
     def get_mission(self, missionid: int):
@@ -68,9 +94,8 @@ class MissionLog:
         """
         if missionid is None: return None
 
-        for mission in self.missionlog:
-            if mission['MissionID'] == missionid: return mission
-        return None
+        with self.lock:
+            return self.missions.get(missionid)
 
 
     def add_mission(self, name: str, faction: str, missionid: str, expiry: str,
@@ -80,47 +105,109 @@ class MissionLog:
         """
         Add a mission to the missionlog
         """
-        self.missionlog.append({'Name': name, 'Faction': faction, 'MissionID': missionid, 'Expiry': expiry,
-                                'DestinationSystem': destination_system, 'DestinationSettlement': destination_settlement, 'System': system_name, 'Station': station_name,
-                                'CommodityCount': commodity_count, 'PassengerCount': passenger_count, 'KillCount': kill_count,
-                                'TargetFaction': target_faction})
+        with self.lock:
+            self._remove(missionid)
+            self._add({'Name': name, 'Faction': faction, 'MissionID': missionid, 'Expiry': expiry,
+                       'DestinationSystem': destination_system, 'DestinationSettlement': destination_settlement, 'System': system_name, 'Station': station_name,
+                       'CommodityCount': commodity_count, 'PassengerCount': passenger_count, 'KillCount': kill_count,
+                       'TargetFaction': target_faction})
+            self.dirty = True
 
 
     def delete_mission_by_id(self, missionid: str):
         """
         Delete the mission with the given id from the missionlog
         """
-        for i in range(len(self.missionlog)):
-            if self.missionlog[i]['MissionID'] == missionid:
-                self.missionlog.pop(i)
-                break
+        with self.lock:
+            if self._remove(missionid): self.dirty = True
 
 
     def delete_mission_by_index(self, missionindex: int):
         """
         Delete the mission at the given index from the missionlog
         """
-        self.missionlog.pop(missionindex)
+        with self.lock:
+            self._remove(list(self.missions.keys())[missionindex])
+            self.dirty = True
 
 
-    def get_active_systems(self):
+    def get_active_systems(self) -> list:
         """
         Return a list of systems that have currently active missions
         """
-        systems = [x['System'] for x in self.missionlog]
-        # De-dupe before returning
-        return list(dict.fromkeys(systems))
+        with self.lock:
+            return list(self.system_counts.keys())
 
 
-    def _expire_old_missions(self):
+    def _set_missions(self, missionlog:list):
         """
-        Clear out all missions older than 7 days from the mission log
+        Replace all missions with those from a loaded missionlog. If the same MissionID appears more than once, the first is kept.
         """
-        for mission in reversed(self.missionlog):
+        with self.lock:
+            self.missions = {}
+            self.expiry_heap = []
+            self.system_counts = Counter()
+
+            for mission in missionlog:
+                if mission.get('MissionID') not in self.missions: self._add(mission)
+
+
+    def _add(self, mission:dict):
+        """
+        Index a mission. Must be called with self.lock held, and the MissionID must not already be in the log.
+        """
+        try:
+            expiry:datetime = datetime.strptime(mission.get('Expiry', ""), DATETIME_FORMAT_JOURNAL)
+        except (TypeError, ValueError):
             # Old missions pre v1.11.0 and missions with missing expiry dates don't have Expiry stored. Set to 7 days ahead for safety
-            if not 'Expiry' in mission or mission['Expiry'] == "": mission['Expiry'] = (datetime.utcnow() + timedelta(days = TIME_MISSION_EXPIRY_D)).strftime(DATETIME_FORMAT_JOURNAL)
+            expiry = datetime.utcnow() + timedelta(days = TIME_MISSION_EXPIRY_D)
+            mission['Expiry'] = expiry.strftime(DATETIME_FORMAT_JOURNAL)
+            self.dirty = True
+
+        self.missions[mission.get('MissionID')] = mission
+        self.system_counts[mission.get('System')] += 1
+        heapq.heappush(self.expiry_heap, (expiry + timedelta(days = TIME_MISSION_EXPIRY_D), next(self.expiry_seq), mission.get('MissionID'), mission))
+
+
+    def _remove(self, missionid) -> bool:
+        """
+        Remove a mission from the index, if present. Its heap entry is left in place and skipped when it comes due. Must be
+        called with self.lock held.
+
+        Returns:
+            bool: True if the mission was present
+        """
+        mission:dict|None = self.missions.pop(missionid, None)
+        if mission is None: return False
+
+        system:str = mission.get('System')
+        self.system_counts[system] -= 1
+        if self.system_counts[system] <= 0: del self.system_counts[system]
+
+        # Rebuild the heap if it is mostly entries for missions that have already gone
+        if len(self.expiry_heap) > 2 * len(self.missions) + 64:
+            self.expiry_heap = [entry for entry in self.expiry_heap if self.missions.get(entry[2]) is entry[3]]
+            heapq.heapify(self.expiry_heap)
+
+        return True
+
+
+    def _expire_old_missions(self) -> float:
+        """Scheduled job. Clear out all missions that expired more than 7 days ago from the mission log.
+
+        Returns:
+            float: The delay until the next mission is due to be removed, in seconds
+        """
+        now:datetime = datetime.utcnow()
+
+        with self.lock:
+            while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                removal_time, seq, missionid, mission = heapq.heappop(self.expiry_heap)
+                # Skip entries for missions that have been deleted or replaced since they were added
+                if self.missions.get(missionid) is not mission: continue
+
+                self._remove(missionid)
+                self.dirty = True
 
-            timedifference = datetime.utcnow() - datetime.strptime(mission['Expiry'], DATETIME_FORMAT_JOURNAL)
-            if timedifference > timedelta(days = TIME_MISSION_EXPIRY_D):
-                # Keep missions for a while after they have expired, so we can log failed missions correctly
-                self.missionlog.remove(mission)
+            if not self.expiry_heap: return TIME_EXPIRY_CHECK_MAX_S
+            return min((self.expiry_heap[0][0] - now).total_seconds(), TIME_EXPIRY_CHECK_MAX_S)
@@ -1,4 +1,6 @@
 import textwrap
+from queue import Empty, Full, Queue
+from threading import Thread
 
 from bgstally.constants import CheckStates
 from bgstally.debug import Debug
@@ -18,18 +20,44 @@ MAX_LINES_PER_PANEL = 30
 WIDTH_OVERLAY = 1280  # Virtual screen width of overlay
 HEIGHT_OVERLAY = 960  # Virtual screen height of overlay
 
+MAX_QUEUED_SENDS = 500  # Sends waiting for EDMCOverlay beyond this are dropped, so a stuck overlay can't use up memory
+
 
 class Overlay:
     """
     Handles the game overlay. Provides purpose-agnostic functions to display information and data in frames on screen.
+    EDMCOverlay is sent messages over a socket, which can block, so the display functions only lay out the messages and
+    queue them, and they are sent on a thread of our own. The display functions can be called from any thread.
     """
     def __init__(self, bgstally):
         self.bgstally = bgstally
         self.edmcoverlay: Overlay = None
         self.problem_displaying: bool = False
+
+        self.queue: Queue = Queue(MAX_QUEUED_SENDS)
+        self.thread: Thread = Thread(target=self._worker, name="BGSTally Overlay worker")
+        self.thread.daemon = True
+        self.thread.start()
+
         self._check_overlay()
 
 
+    def shut_down(self):
+        """
+        Stop the overlay worker. A send in progress is allowed to finish, and any still queued are dropped.
+        """
+        try:
+            while True: self.queue.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            self.queue.put_nowait(None)
+        except Full:
+            # Something queued a send while we were emptying the queue, the thread is a daemon so will not hold up exit
+            pass
+
+
     def display_message(self, frame_name: str, message: str, fit_to_text: bool = False, ttl_override: int = None, text_colour_override: str = None, title_colour_override: str = None, text_includes_title: bool = False, title: str = None):
         """
         Display a message in the overlay
@@ -58,18 +86,18 @@ class Overlay:
 
             # Border
             if fi['border_colour'] and fi['fill_colour']:
-                self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", fi['border_colour'], fi['fill_colour'], int(fi['x']), int(fi['y']), message_width + 30 if fit_to_text else fi['w'], message_height + 10 if fit_to_text else fi['h'], ttl=ttl)
+                self._send(self.edmcoverlay.send_shape, f"bgstally-frame-{frame_name}", "rect", fi['border_colour'], fi['fill_colour'], int(fi['x']), int(fi['y']), message_width + 30 if fit_to_text else fi['w'], message_height + 10 if fit_to_text else fi['h'], ttl=ttl)
 
             yoffset: int = 0
             index: int = 0
 
             # Title
             if text_includes_title:
-                self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", segments[index], title_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size="large")
+                self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}-{index}", segments[index], title_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size="large")
                 yoffset += HEIGHT_CHARACTER_LARGE
                 index += 1
             elif title is not None:
-                self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", title, title_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size="large")
+                self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}-{index}", title, title_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size="large")
                 yoffset += HEIGHT_CHARACTER_LARGE
 
             # Text
@@ -77,19 +105,17 @@ class Overlay:
                 if index < len(segments):
                     if index < MAX_LINES_PER_PANEL:
                         # Line has content
-                        self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", segments[index], text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                        self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}-{index}", segments[index], text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
                     else:
                         # Last line
-                        self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "[...]", text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                        self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}-{index}", "[...]", text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
                 else:
                     # Unused line, clear
-                    self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}-{index}", "", text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
+                    self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}-{index}", "", text_colour, int(fi['x']) + 10, int(fi['y']) + 5 + yoffset, ttl=ttl, size=fi['text_size'])
 
                 yoffset += HEIGHT_CHARACTER_NORMAL if fi['text_size'] == "normal" else HEIGHT_CHARACTER_LARGE
                 index += 1
 
-            self.problem_displaying = False
-
         except Exception as e:
             if not self.problem_displaying:
                 # Only log a warning about failure once
@@ -111,7 +137,7 @@ class Overlay:
             ttl: int = ttl_override if ttl_override else int(fi['ttl'])
             fill_colour: str = fill_colour_override if fill_colour_override else fi['fill_colour']
             border_colour: str = border_colour_override if border_colour_override else fi['border_colour']
-            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", border_colour, fill_colour, int(fi['x']), int(fi['y']), int(fi['w']), int(fi['h']), ttl=ttl)
+            self._send(self.edmcoverlay.send_shape, f"bgstally-frame-{frame_name}", "rect", border_colour, fill_colour, int(fi['x']), int(fi['y']), int(fi['w']), int(fi['h']), ttl=ttl)
 
         except Exception as e:
             if not self.problem_displaying:
@@ -137,11 +163,9 @@ class Overlay:
 
             #vect:list = [{'x':int(cx+(coords['x']*hw)), 'y':int(cy-(coords['y']*hh))]
 
-            self.edmcoverlay.send_message(f"bgstally-msg-{frame_name}", message, fi['text_colour'], int(fi['x']) + 10, int(fi['y']) + 5, ttl=ttl, size=fi['text_size'])
-            self.edmcoverlay.send_shape(f"bgstally-bar-{frame_name}", "rect", "#ffffff", fi['fill_colour'], int(fi['x']) + 10, int(fi['y']) + 20, bar_width, bar_height, ttl=ttl)
-            self.edmcoverlay.send_shape(f"bgstally-frame-{frame_name}", "rect", "#ffffff", fi['border_colour'], int(fi['x']) + 10 + bar_width, int(fi['y']) + 20, int(fi['w']) - bar_width, bar_height, ttl=ttl)
-
-            self.problem_displaying = False
+            self._send(self.edmcoverlay.send_message, f"bgstally-msg-{frame_name}", message, fi['text_colour'], int(fi['x']) + 10, int(fi['y']) + 5, ttl=ttl, size=fi['text_size'])
+            self._send(self.edmcoverlay.send_shape, f"bgstally-bar-{frame_name}", "rect", "#ffffff", fi['fill_colour'], int(fi['x']) + 10, int(fi['y']) + 20, bar_width, bar_height, ttl=ttl)
+            self._send(self.edmcoverlay.send_shape, f"bgstally-frame-{frame_name}", "rect", "#ffffff", fi['border_colour'], int(fi['x']) + 10 + bar_width, int(fi['y']) + 20, int(fi['w']) - bar_width, bar_height, ttl=ttl)
 
         except Exception as e:
             if not self.problem_displaying:
@@ -150,6 +174,36 @@ class Overlay:
                 Debug.logger.warning(f"Could not display overlay message", exc_info=e)
 
 
+    def _send(self, func: callable, *args, **kwargs):
+        """
+        Queue a call to the EDMCOverlay client, to be made on the overlay worker thread
+        """
+        try:
+            self.queue.put_nowait((func, args, kwargs))
+        except Full:
+            # EDMCOverlay isn't keeping up, drop the send. Overlay messages are transient so nothing is lost for long.
+            pass
+
+
+    def _worker(self):
+        """
+        Send queued calls to EDMCOverlay, until shut down
+        """
+        while True:
+            item: tuple|None = self.queue.get()
+            if item is None: return
+
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+                self.problem_displaying = False
+            except Exception as e:
+                if not self.problem_displaying:
+                    # Only log a warning about failure once
+                    self.problem_displaying = True
+                    Debug.logger.warning(f"Could not display overlay message", exc_info=e)
+
+
     def _check_overlay(self):
         """
         Ensure overlay is running and available
@@ -0,0 +1,204 @@
+from contextlib import contextmanager
+from threading import Lock, get_ident
+from time import monotonic
+
+from bgstally.debug import Debug
+
+TIME_DEBOUNCE_S = 2
+TIME_MAX_LATENCY_S = 10
+
+
+class PersistentStore:
+    """
+    Mixin providing a common dirty / version protocol for anything that persists data. Every change bumps a version number
+    and a save records the version that it wrote, so a change made while a save is in progress is never lost. Classes using
+    this must have a `bgstally` attribute, and should set `dirty = True` in every method that changes persisted data.
+
+    That only holds if the version is bumped after the data has changed. Stores changed on one thread and saved on another
+    must also have a `lock` (an RLock), make their changes inside `with self.change():`, and take their version and
+    serialise their data with the lock held. Inside a change, `dirty = True` can be set at any point, as the version is
+    only bumped once the outermost change has completed.
+    """
+    _version:int = 0
+    _saved_version:int = 0
+    _change_depth:int = 0
+    _change_thread:int|None = None
+    _change_dirty:bool = False
+
+
+    @property
+    def dirty(self) -> bool:
+        """
+        True if there are changes that have not yet been saved
+        """
+        return self._version != self._saved_version
+
+
+    @dirty.setter
+    def dirty(self, dirty:bool):
+        if dirty:
+            if self._change_thread == get_ident():
+                # Part way through a change, the version is bumped when it completes
+                self._change_dirty = True
+            else:
+                self._bump_version()
+        else:
+            self._saved_version = self._version
+
+
+    @contextmanager
+    def change(self):
+        """
+        Context manager for a change to persisted data. Holds the store's lock for the duration, and defers any version bump
+        until the outermost change has completed, so a save never sees a new version with part-changed data. Can be nested.
+        """
+        with self.lock:
+            self._change_depth += 1
+            self._change_thread = get_ident()
+            try:
+                yield
+            finally:
+                self._change_depth -= 1
+                if self._change_depth == 0:
+                    self._change_thread = None
+                    if self._change_dirty:
+                        self._change_dirty = False
+                        self._bump_version()
+
+
+    @property
+    def version(self) -> int:
+        """
+        The current data version. Take a copy of this before serialising, and pass it to mark_saved() once written.
+        """
+        return self._version
+
+
+    def mark_saved(self, version:int):
+        """
+        Record that all changes up to and including the given version have been saved
+        """
+        self._saved_version = version
+
+
+    def _bump_version(self):
+        """
+        Record a change to the data and ask for it to be saved
+        """
+        self._version += 1
+
+        # The persistence manager is created after the stores, so won't exist yet while they are loading
+        persistence_manager:PersistenceManager|None = getattr(self.bgstally, 'persistence_manager', None)
+        if persistence_manager is not None: persistence_manager.mark_dirty()
+
+
+class PersistenceManager:
+    """
+    Handles write-behind persistence of all plugin data. Callers notify us that data has changed, and we coalesce those
+    notifications into a single save on the scheduler thread, once things have been quiet for a short debounce period or
+    a maximum latency has passed since the first unsaved change, whichever comes first.
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.lock:Lock = Lock()
+        self.flush_lock:Lock = Lock()
+        self.first_dirty:float|None = None
+        self.last_dirty:float|None = None
+
+        # Counters, exposed via get_stats()
+        self.flushes:int = 0
+        self.dirty_notifications:int = 0
+        self.coalesced_writes:int = 0
+        self.bytes_written:int = 0
+
+        self.job = self.bgstally.scheduler.add_job("Persistence", self._flush_if_due, None)
+
+
+    def mark_dirty(self):
+        """
+        Some data has changed and needs saving. Safe to call from any thread.
+        """
+        with self.lock:
+            now:float = monotonic()
+            self.dirty_notifications += 1
+
+            if self.first_dirty is None:
+                self.first_dirty = now
+            else:
+                # A save is already pending, this change will be written as part of it
+                self.coalesced_writes += 1
+
+            self.last_dirty = now
+            delay:float = self._get_due() - now
+
+        self.job.reschedule(delay)
+
+
+    def flush(self):
+        """
+        Save all data immediately, on the calling thread
+        """
+        with self.lock:
+            self.first_dirty = None
+            self.last_dirty = None
+
+        with self.flush_lock:
+            try:
+                bytes_written:int = self.bgstally.save_data()
+            except Exception as e:
+                # Most likely data being modified on another thread while we were serialising it. Leave it dirty and try again later.
+                Debug.logger.warning(f"Unable to save data, will retry", exc_info=e)
+                with self.lock:
+                    if self.first_dirty is None:
+                        self.first_dirty = self.last_dirty = monotonic()
+                self.job.reschedule(TIME_MAX_LATENCY_S)
+                return
+
+            self.flushes += 1
+            self.bytes_written += bytes_written
+
+
+    def shut_down(self):
+        """
+        Stop scheduled saves and perform a final flush of all data
+        """
+        self.job.cancel()
+        self.flush()
+
+
+    def get_stats(self) -> dict:
+        """Get persistence counters
+
+        Returns:
+            dict: The number of flushes, dirty notifications received, writes coalesced into an already pending flush and total bytes written
+        """
+        return {'flushes': self.flushes,
+                'dirty_notifications': self.dirty_notifications,
+                'coalesced_writes': self.coalesced_writes,
+                'bytes_written': self.bytes_written}
+
+
+    def _get_due(self) -> float:
+        """
+        Get the time the pending save is due, once things have been quiet for the debounce period or the maximum latency
+        has passed since the first unsaved change. Must be called with self.lock held, and only when a save is pending.
+        """
+        return min(self.last_dirty + TIME_DEBOUNCE_S, self.first_dirty + TIME_MAX_LATENCY_S)
+
+
+    def _flush_if_due(self) -> float|None:
+        """Scheduled job. Save all data if a save is pending and due.
+
+        Returns:
+            float | None: The delay until the pending save is due, or None if there is nothing to save
+        """
+        with self.lock:
+            if self.first_dirty is None: return None
+            now:float = monotonic()
+            due:float = self._get_due()
+            if now < due: return due - now
+
+        self.flush()
+        return None
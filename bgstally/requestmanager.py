@@ -1,24 +1,34 @@
-from queue import Queue
+import gzip
+import json
+from collections import deque
 from re import IGNORECASE, compile, match
-from threading import Thread
-from time import sleep
+from threading import Condition, Thread
+from time import monotonic
+from urllib.parse import urlsplit
 
 import requests
 from requests import Response
 
-from bgstally.constants import RequestMethod
+from bgstally.constants import RequestMethod, RequestPriority
 from bgstally.debug import Debug
 from config import config
 
-TIME_WORKER_PERIOD_S = 1
 TIMEOUT_S = 10
+TIME_IDLE_WAKE_S = 5
+WORKERS_DEFAULT = 4
+MAX_PER_HOST_DEFAULT = 2
+MAX_RATE_LIMIT_RETRIES = 5
+TIME_RATE_LIMIT_DEFAULT_S = 1 # Used if a 429 response doesn't tell us how long to wait
+TIME_PRIORITY_AGING_S = 10 # A waiting request is promoted by one priority class for every this many seconds it has waited
+COMPRESS_MIN_BYTES = 1024 # Payloads smaller than this aren't worth compressing
+COMPRESS_LEVEL = 6        # gzip compression level, a good balance between CPU time and size
 
 
 class BGSTallyRequest:
     """
     Encapsulates a request that can be queued and processed in a thread
     """
-    def __init__(self, endpoint:str, method:RequestMethod, callback:callable, params:dict, headers:dict, stream:bool, payload:dict|None, data:dict|None):
+    def __init__(self, endpoint:str, method:RequestMethod, callback:callable, params:dict, headers:dict, stream:bool, payload:dict|None, data:dict|None, bucket:str|None = None, coalesce_key:str|None = None, priority:RequestPriority = RequestPriority.NORMAL, compress:bool = False):
         # The endpoint to call
         self.endpoint:str = endpoint
         # The type of request
@@ -35,6 +45,21 @@ class BGSTallyRequest:
         self.payload:dict|None = payload
         # Any additional data required to be passed to the callback function when the response is received
         self.data:dict|None = data
+        # The host this request is sent to, used to limit concurrent requests per host
+        self.host:str = urlsplit(endpoint).netloc.lower()
+        # The rate limit bucket this request belongs to, or None if the request is not rate limited. Requests in the same
+        # bucket are sent one at a time, and are held back while the server tells us the bucket is exhausted.
+        self.bucket:str|None = bucket
+        # If set, a newer request with the same key replaces this one if this one hasn't been sent yet
+        self.coalesce_key:str|None = coalesce_key
+        # Priority class. Higher priority requests are sent first, but lower priority requests are promoted as they wait
+        self.priority:RequestPriority = priority
+        # True if the server accepts gzip compressed payloads
+        self.compress:bool = compress
+        # When this request was queued, as a monotonic time
+        self.queued_time:float = monotonic()
+        # Number of times this request has been retried after being rate limited
+        self.retries:int = 0
 
     def __str__(self):
         """
@@ -47,12 +72,19 @@ class BGSTallyRequest:
                     f"  headers: {self.headers} \n" \
                     f"  stream: {self.stream} \n" \
                     f"  payload: {self.payload} \n" \
-                    f"  data: {self.data} \n"
+                    f"  data: {self.data} \n" \
+                    f"  bucket: {self.bucket} \n" \
+                    f"  coalesce_key: {self.coalesce_key} \n" \
+                    f"  priority: {self.priority} \n" \
+                    f"  compress: {self.compress} \n"
 
 
 class RequestManager:
     """
-    Handles the queuing and processing of requests
+    Handles the queuing and processing of requests. Requests are processed by a pool of worker threads, with a limit
+    on the number of concurrent requests to any one host, so a slow host can't hold up requests to other hosts.
+    Connections are kept alive and re-used via a session per host in each worker. requests.Session isn't thread-safe, so
+    sessions are never shared between workers.
     """
     def __init__(self, bgstally):
         self.bgstally = bgstally
@@ -63,16 +95,37 @@ class RequestManager:
             r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})' # ...or ip
             r'(?::\d+)?' # optional port
             r'(?:/?|[/?]\S+)$', IGNORECASE)
-        self.request_queue:Queue = Queue()
 
-        self.request_thread: Thread = Thread(target=self._worker, name="BGSTally Request worker")
-        self.request_thread.daemon = True
-        self.request_thread.start()
+        request_config:dict = self.bgstally.config.requests()
+        self.num_workers:int = max(1, int(request_config.get('workers', WORKERS_DEFAULT)))
+        self.max_per_host:int = max(1, int(request_config.get('max_per_host', MAX_PER_HOST_DEFAULT)))
 
+        # All the following are protected by self.condition
+        self.condition:Condition = Condition()
+        self.pending:deque[BGSTallyRequest] = deque()
+        self.active_per_host:dict[str, int] = {}
+        self.active_buckets:set[str] = set()
+        self.blocked_until:dict[str, float] = {} # Key is a bucket, or a host for host-wide limits. Value is a monotonic time.
+        self.coalesced:int = 0 # Number of unsent requests that have been replaced by a newer one
+        self.queue_wait_stats:dict[RequestPriority, dict] = {priority: {'count': 0, 'total_s': 0.0, 'max_s': 0.0} for priority in RequestPriority}
+        self.compression_stats:dict = {'count': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self.stopped:bool = False
 
-    def queue_request(self, endpoint:str, method:RequestMethod, callback:callable = None, params:dict = {}, headers:dict = {}, stream:bool = False, payload:dict|None = None, data:dict|None = None):
+        self.request_threads:list[Thread] = []
+        for i in range(self.num_workers):
+            request_thread: Thread = Thread(target=self._worker, name=f"BGSTally Request worker {i + 1}")
+            request_thread.daemon = True
+            request_thread.start()
+            self.request_threads.append(request_thread)
+
+
+    def queue_request(self, endpoint:str, method:RequestMethod, callback:callable = None, params:dict = {}, headers:dict = {}, stream:bool = False, payload:dict|None = None, data:dict|None = None, bucket:str|None = None, coalesce_key:str|None = None, priority:RequestPriority = RequestPriority.NORMAL, compress:bool = False):
         """
-        Add a request to the queue
+        Add a request to the queue. If a rate limit bucket is given, the request is scheduled around the rate limits
+        reported by the server for that bucket, and automatically retried if it is rate limited. If a coalesce key is given
+        and an unsent request with the same key is already queued, this request replaces it in its place in the queue, and
+        the callback for the replaced request is never called. Requests are sent in priority order, oldest first within a
+        priority. If compress is True, the payload is gzip compressed when sent, if it is large enough to be worth it.
         """
         if not self.url_valid(endpoint):
             Debug.logger.info(f"Attempted to call {endpoint} which is not a well-formed URL")
@@ -80,7 +133,47 @@ class RequestManager:
 
         headers:dict = {'User-Agent': f"{self.bgstally.plugin_name}/{self.bgstally.version}"} | headers
 
-        self.request_queue.put(BGSTallyRequest(endpoint, method, callback, params, headers, stream, payload, data))
+        request:BGSTallyRequest = BGSTallyRequest(endpoint, method, callback, params, headers, stream, payload, data, bucket, coalesce_key, priority, compress)
+
+        with self.condition:
+            index:int|None = self._find_coalesce_index(coalesce_key)
+
+            if index is None:
+                self.pending.append(request)
+            else:
+                # The replacement inherits the age and, if higher, the priority of the request it replaces
+                replaced:BGSTallyRequest = self.pending[index]
+                request.queued_time = replaced.queued_time
+                request.priority = min(request.priority, replaced.priority)
+                self.pending[index] = request
+                self.coalesced += 1
+
+            self.condition.notify()
+
+
+    def shut_down(self):
+        """
+        Stop the request workers. Requests already being sent are allowed to finish, but no further requests are started.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+    def get_stats(self) -> dict:
+        """Get queue statistics
+
+        Returns:
+            dict: The number of requests coalesced, for each priority class the number of requests sent and their average
+            and maximum time waiting in the queue, and the number of payloads compressed and their total size before and after
+        """
+        with self.condition:
+            return {'coalesced': self.coalesced,
+                    'compression': dict(self.compression_stats),
+                    'queue_wait': {priority.name.lower(): {'count': stats['count'],
+                                                           'average_s': stats['total_s'] / stats['count'] if stats['count'] > 0 else 0.0,
+                                                           'max_s': stats['max_s']}
+                                   for priority, stats in self.queue_wait_stats.items()}}
 
 
     def url_valid(self, url:str) -> bool:
@@ -91,50 +184,233 @@ class RequestManager:
         return match(self.re_url, url) is not None
 
 
+    def _next_request(self) -> BGSTallyRequest|None:
+        """
+        Remove and return the highest priority pending request whose host has spare capacity and whose rate limit bucket
+        is not in use or exhausted. Requests are promoted as they wait, so low priority requests are never starved. Must be
+        called with self.condition held.
+        """
+        now:float = monotonic()
+        best_request:BGSTallyRequest|None = None
+        best_priority:float = 0
+
+        for request in self.pending:
+            if self.active_per_host.get(request.host, 0) >= self.max_per_host: continue
+            if self.blocked_until.get(request.host, 0) > now: continue
+            if request.bucket is not None:
+                if request.bucket in self.active_buckets: continue
+                if self.blocked_until.get(request.bucket, 0) > now: continue
+
+            # Lower is higher priority. Strictly less than, so the oldest request wins a tie.
+            effective_priority:float = request.priority - (now - request.queued_time) / TIME_PRIORITY_AGING_S
+            if best_request is None or effective_priority < best_priority:
+                best_request = request
+                best_priority = effective_priority
+
+        if best_request is None: return None
+
+        self.pending.remove(best_request)
+        self.active_per_host[best_request.host] = self.active_per_host.get(best_request.host, 0) + 1
+        if best_request.bucket is not None: self.active_buckets.add(best_request.bucket)
+
+        stats:dict = self.queue_wait_stats[best_request.priority]
+        wait_s:float = now - best_request.queued_time
+        stats['count'] += 1
+        stats['total_s'] += wait_s
+        stats['max_s'] = max(stats['max_s'], wait_s)
+
+        return best_request
+
+
+    def _find_coalesce_index(self, coalesce_key:str|None) -> int|None:
+        """
+        Find the position in the queue of the pending request with the given coalesce key. Must be called with
+        self.condition held.
+        """
+        if coalesce_key is None: return None
+
+        for index, request in enumerate(self.pending):
+            if request.coalesce_key == coalesce_key: return index
+
+        return None
+
+
+    def _get_wait_time(self) -> float:
+        """
+        Get how long a worker should wait for something to change when there are no runnable requests. This is until the
+        earliest rate limit expires, if there is one. Must be called with self.condition held.
+        """
+        now:float = monotonic()
+
+        # Tidy up any limits that have expired
+        for key in [key for key, until in self.blocked_until.items() if until <= now]:
+            del self.blocked_until[key]
+
+        if not self.blocked_until: return TIME_IDLE_WAKE_S
+        return min(min(self.blocked_until.values()) - now, TIME_IDLE_WAKE_S)
+
+
     def _worker(self) -> None:
         """
         Handle request thread work
         """
         Debug.logger.debug("Starting Request Worker...")
 
+        # This worker's keep-alive sessions, key = host. Only ever used by this thread.
+        sessions:dict[str, requests.Session] = {}
+
         while True:
-            if config.shutting_down:
-                Debug.logger.debug("Shutting down RequestManager Worker...")
-                return
+            with self.condition:
+                request:BGSTallyRequest|None = None
+
+                while request is None:
+                    if self.stopped or config.shutting_down:
+                        Debug.logger.debug("Shutting down RequestManager Worker...")
+                        for session in sessions.values(): session.close()
+                        return
+
+                    request = self._next_request()
+                    # Either nothing is pending, or every pending request is held back by a host or rate limit
+                    if request is None: self.condition.wait(self._get_wait_time())
+
+            session:requests.Session|None = sessions.get(request.host)
+            if session is None:
+                session = requests.Session()
+                sessions[request.host] = session
+
+            try:
+                self._process_request(request, session)
+            except Exception as e:
+                Debug.logger.error(f"Unexpected error processing request {request.endpoint}", exc_info=e)
+            finally:
+                with self.condition:
+                    self.active_per_host[request.host] -= 1
+                    if request.bucket is not None: self.active_buckets.discard(request.bucket)
+                    # A slot has freed up for this host and bucket, so a request that was waiting on it may now be runnable
+                    self.condition.notify_all()
+
+
+    def _process_request(self, request:BGSTallyRequest, session:requests.Session):
+        """
+        Send a request and call its callback with the result
+        """
+        Debug.logger.info(f"Processing {request.method} request {request.endpoint}")
+
+        response:Response = None
+        try:
+            match request.method:
+                case RequestMethod.GET | RequestMethod.DELETE | RequestMethod.HEAD | RequestMethod.OPTIONS:
+                    response = session.request(request.method.value, request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
+                case RequestMethod.POST | RequestMethod.PUT | RequestMethod.PATCH if request.compress:
+                    body, headers = self._encode_payload(request)
+                    response = session.request(request.method.value, request.endpoint, params=request.params, headers=headers, stream=request.stream, data=body, timeout=TIMEOUT_S)
+                case RequestMethod.POST | RequestMethod.PUT | RequestMethod.PATCH:
+                    response = session.request(request.method.value, request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
+                case _:
+                    Debug.logger.warning(f"Invalid request method {request.method}")
+                    if request.callback: request.callback(False, response, request)
+                    return
+
+            if request.bucket is not None and self._rate_limited(request, response): return
+
+            response.raise_for_status()
+
+        except requests.exceptions.RequestException as e:
+            Debug.logger.info(f"Request failure {request.endpoint}: {str(e)}")
+            if request.callback: request.callback(False, response, request)
 
-            sleep(TIME_WORKER_PERIOD_S)
+        else:
+            # Success
+            Debug.logger.info(f"Request success {request.endpoint}")
+            if request.callback: request.callback(True, response, request)
 
-            # Fetch from the queue. Blocks indefinitely until an item is available.
-            request:BGSTallyRequest = self.request_queue.get()
 
-            if not isinstance(request, BGSTallyRequest):
-                Debug.logger.error(f"Queued request was not an instance of BGSTallyRequest")
-                continue
+    def _encode_payload(self, request:BGSTallyRequest) -> tuple[bytes, dict]:
+        """Serialise a request payload to JSON, and gzip compress it if it is large enough
+
+        Args:
+            request (BGSTallyRequest): The request
+
+        Raises:
+            requests.exceptions.InvalidJSONError: If the payload can't be serialised
+
+        Returns:
+            tuple[bytes, dict]: The request body and the headers to send with it
+        """
+        try:
+            body:bytes = json.dumps(request.payload, allow_nan=False).encode('utf-8')
+        except (ValueError, TypeError) as e:
+            # Match the behaviour of requests when given an invalid json payload
+            raise requests.exceptions.InvalidJSONError(e)
 
-            Debug.logger.info(f"Processing {request.method} request {request.endpoint}")
+        headers:dict = request.headers | {'Content-Type': "application/json"}
+        if len(body) < COMPRESS_MIN_BYTES: return body, headers
+
+        compressed_body:bytes = gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+
+        with self.condition:
+            self.compression_stats['count'] += 1
+            self.compression_stats['bytes_in'] += len(body)
+            self.compression_stats['bytes_out'] += len(compressed_body)
+
+        headers['Content-Encoding'] = "gzip"
+        return compressed_body, headers
+
+
+    def _rate_limited(self, request:BGSTallyRequest, response:Response) -> bool:
+        """Record the rate limit state reported in a response, and requeue the request if it was rate limited. Follows
+        the Discord rate limit headers: https://discord.com/developers/docs/topics/rate-limits
+
+        Args:
+            request (BGSTallyRequest): The request
+            response (Response): The response received
+
+        Returns:
+            bool: True if the request was rate limited and has been requeued to retry
+        """
+        now:float = monotonic()
+        blocked_key:str = request.bucket
+        blocked_until:float|None = None
+
+        try:
+            if int(response.headers.get('X-RateLimit-Remaining', 1)) <= 0:
+                blocked_until = now + float(response.headers.get('X-RateLimit-Reset-After', TIME_RATE_LIMIT_DEFAULT_S))
+        except ValueError:
+            pass
+
+        if response.status_code == 429:
+            retry_after:float = TIME_RATE_LIMIT_DEFAULT_S
+            is_global:bool = response.headers.get('X-RateLimit-Global', "").lower() == "true"
 
-            response:Response = None
             try:
-                match request.method:
-                    case RequestMethod.GET: response = requests.get(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.POST: response = requests.post(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.PUT: response = requests.put(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.PATCH: response = requests.patch(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, json=request.payload, timeout=TIMEOUT_S)
-                    case RequestMethod.DELETE: response = requests.delete(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.HEAD: response = requests.head(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case RequestMethod.OPTIONS: response = requests.options(request.endpoint, params=request.params, headers=request.headers, stream=request.stream, timeout=TIMEOUT_S)
-                    case _:
-                        Debug.logger.warning(f"Invalid request method {request.type}")
-                        if request.callback: request.callback(False, response, request)
-                        continue
-
-                response.raise_for_status()
-
-            except requests.exceptions.RequestException as e:
-                Debug.logger.info(f"Request failure {request.endpoint}: {str(e)}")
-                if request.callback: request.callback(False, response, request)
+                response_json:dict = response.json()
+                retry_after = float(response_json.get('retry_after', retry_after))
+                is_global = is_global or response_json.get('global', False) == True
+            except (ValueError, AttributeError):
+                try:
+                    retry_after = float(response.headers.get('Retry-After', retry_after))
+                except ValueError:
+                    pass
 
-            else:
-                # Success
-                Debug.logger.info(f"Request success {request.endpoint}")
-                if request.callback: request.callback(True, response, request)
+            blocked_until = now + retry_after
+            # A global limit applies to everything we send to this host, not just this bucket
+            if is_global: blocked_key = request.host
+
+        if blocked_until is None: return False
+
+        with self.condition:
+            self.blocked_until[blocked_key] = max(self.blocked_until.get(blocked_key, 0), blocked_until)
+
+            if response.status_code != 429 or request.retries >= MAX_RATE_LIMIT_RETRIES: return False
+
+            if self._find_coalesce_index(request.coalesce_key) is not None:
+                # A newer request has superseded this one while it was in flight, so there's no point retrying it
+                self.coalesced += 1
+                return True
+
+            Debug.logger.info(f"Rate limited on {request.endpoint}, retrying in {blocked_until - now:.2f}s")
+            request.retries += 1
+            # Put it back at the front so it's the first request sent from this bucket once the limit expires
+            self.pending.appendleft(request)
+
+        return True
@@ -0,0 +1,251 @@
+import heapq
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic
+from typing import Callable
+
+from bgstally.debug import Debug
+from config import config
+
+TIME_IDLE_WAKE_S = 5        # Longest the worker sleeps before re-checking for shutdown
+TIME_ERROR_RETRY_S = 30     # Delay before re-running a job that raised an exception
+
+
+class ScheduledJob:
+    """
+    A job registered with the scheduler. The job function is called on the scheduler thread and returns the number of
+    seconds until it should next run, or None to stay idle until it is woken or rescheduled. Job functions must not block
+    for long, as every job shares the one thread.
+    """
+
+    def __init__(self, scheduler, name:str, func:Callable[[], float|None]):
+        self.scheduler:Scheduler = scheduler
+        self.name:str = name
+        self.func:Callable[[], float|None] = func
+
+        # All of these are protected by the scheduler's condition
+        self.due:float|None = None          # Monotonic time the job should next run, or None if idle
+        self.entry_seq:int|None = None      # Sequence number of the job's live entry in the heap, if it has one
+        self.entry_due:float|None = None    # Due time of the job's live entry in the heap
+        self.pending_due:float|None = None  # Earliest due time requested while the job was running
+        self.running:bool = False
+        self.cancelled:bool = False
+
+
+    def wake(self):
+        """
+        Run the job as soon as possible. Safe to call from any thread. If the job is running, it is run again as soon as it
+        has finished.
+        """
+        self.scheduler._set_due(self, 0, earlier_only=True)
+
+
+    def reschedule(self, delay:float):
+        """
+        Run the job after the given number of seconds, replacing any earlier or later due time. Safe to call from any thread.
+        """
+        self.scheduler._set_due(self, delay, earlier_only=False)
+
+
+    def cancel(self):
+        """
+        Stop the job running again. A run that is already in progress is allowed to finish.
+        """
+        self.scheduler._cancel(self)
+
+
+class Scheduler:
+    """
+    Runs all periodic and on-demand background jobs on a single thread, so the number of threads stays the same however
+    many APIs and other services are configured. Jobs are held in a heap ordered by due time. Entries are invalidated
+    lazily, so waking or rescheduling a job is cheap and never has to search the heap.
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.condition:Condition = Condition()
+        self.heap:list[tuple[float, int, ScheduledJob]] = []
+        self.sequence = count()
+        self.jobs:list[ScheduledJob] = []
+        self.stopped:bool = False
+
+        # Counters, exposed via get_stats()
+        self.runs:int = 0
+        self.errors:int = 0
+        self.max_lateness_s:float = 0
+
+        self.thread:Thread = Thread(target=self._worker, name="BGSTally Scheduler worker")
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def add_job(self, name:str, func:Callable[[], float|None], delay:float|None = 0) -> ScheduledJob:
+        """Register a new job
+
+        Args:
+            name (str): A name for the job, used in logging
+            func (Callable[[], float | None]): The job function. Returns the delay in seconds until it should next run, or None to stay idle until woken.
+            delay (float | None, optional): Delay in seconds until the first run, or None to stay idle until woken. Defaults to 0.
+
+        Returns:
+            ScheduledJob: The job, which can be used to wake, reschedule or cancel it
+        """
+        job:ScheduledJob = ScheduledJob(self, name, func)
+
+        with self.condition:
+            self.jobs.append(job)
+
+        if delay is not None: job.reschedule(delay)
+        return job
+
+
+    def shut_down(self):
+        """
+        Stop the scheduler. Any job that is running is allowed to finish, but no further jobs are started.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+
+    def get_stats(self) -> dict:
+        """Get scheduler counters
+
+        Returns:
+            dict: The number of jobs, total job runs, runs that raised an exception and the latest any job has started after its due time
+        """
+        with self.condition:
+            return {'jobs': len(self.jobs),
+                    'runs': self.runs,
+                    'errors': self.errors,
+                    'max_lateness_s': self.max_lateness_s}
+
+
+    def _set_due(self, job:ScheduledJob, delay:float, earlier_only:bool):
+        """
+        Set the time a job should next run
+        """
+        with self.condition:
+            if job.cancelled: return
+            due:float = monotonic() + delay
+
+            if job.running:
+                # Applied when the run finishes, so it isn't overwritten by the job's own return value
+                if job.pending_due is None or due < job.pending_due: job.pending_due = due
+                return
+
+            if earlier_only and job.due is not None and job.due <= due: return
+
+            job.due = due
+            if self._push(job): self.condition.notify()
+
+
+    def _cancel(self, job:ScheduledJob):
+        """
+        Cancel a job. Its heap entry, if it has one, is discarded when it reaches the top of the heap.
+        """
+        with self.condition:
+            job.cancelled = True
+            job.due = None
+            job.pending_due = None
+            if job in self.jobs: self.jobs.remove(job)
+
+
+    def _push(self, job:ScheduledJob) -> bool:
+        """
+        Make sure the job has a heap entry no later than its due time. An existing earlier entry is left in place and moved
+        when it reaches the top of the heap, so pushing a job's due time back doesn't add an entry. Must be called with
+        self.condition held.
+
+        Returns:
+            bool: True if a new entry was added to the heap
+        """
+        if job.entry_seq is not None and job.entry_due <= job.due: return False
+
+        job.entry_seq = next(self.sequence)
+        job.entry_due = job.due
+        heapq.heappush(self.heap, (job.due, job.entry_seq, job))
+        return True
+
+
+    def _next_job(self) -> ScheduledJob|None:
+        """
+        Wait for the next job to become due and mark it as running. Must be called with self.condition held.
+
+        Returns:
+            ScheduledJob | None: The job to run, or None if we are shutting down
+        """
+        while True:
+            if self.stopped or config.shutting_down: return None
+
+            if not self.heap:
+                self.condition.wait(TIME_IDLE_WAKE_S)
+                continue
+
+            entry_due, entry_seq, job = self.heap[0]
+
+            if entry_seq != job.entry_seq:
+                # Superseded by an earlier entry for the same job
+                heapq.heappop(self.heap)
+                continue
+
+            if job.cancelled or job.due is None:
+                heapq.heappop(self.heap)
+                job.entry_seq = None
+                continue
+
+            if job.due > entry_due:
+                # The job has been pushed back since this entry was added
+                heapq.heappop(self.heap)
+                job.entry_seq = None
+                self._push(job)
+                continue
+
+            now:float = monotonic()
+            if entry_due > now:
+                self.condition.wait(min(entry_due - now, TIME_IDLE_WAKE_S))
+                continue
+
+            heapq.heappop(self.heap)
+            job.entry_seq = None
+            job.due = None
+            job.pending_due = None
+            job.running = True
+            self.max_lateness_s = max(self.max_lateness_s, now - entry_due)
+            return job
+
+
+    def _worker(self) -> None:
+        """
+        Handle thread work
+        """
+        Debug.logger.debug("Starting Scheduler Worker...")
+
+        while True:
+            with self.condition:
+                job:ScheduledJob|None = self._next_job()
+
+            if job is None:
+                Debug.logger.debug("Shutting down Scheduler Worker...")
+                return
+
+            try:
+                delay:float|None = job.func()
+            except Exception as e:
+                Debug.logger.error(f"Error running scheduled job {job.name}", exc_info=e)
+                delay = TIME_ERROR_RETRY_S
+                with self.condition: self.errors += 1
+
+            with self.condition:
+                job.running = False
+                self.runs += 1
+                if job.cancelled: continue
+
+                due:float|None = None if delay is None else monotonic() + delay
+                if job.pending_due is not None and (due is None or job.pending_due < due): due = job.pending_due
+                job.pending_due = None
+
+                if due is not None:
+                    job.due = due
+                    self._push(job)
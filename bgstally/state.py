@@ -35,6 +35,7 @@ class State:
         self.DetailedInf:tk.StringVar = tk.StringVar(value=config.get_str('BGST_DetailedInf', default=CheckStates.STATE_OFF))
         self.DetailedTrade:tk.StringVar = tk.StringVar(value=config.get_str('BGST_DetailedTrade', default=CheckStates.STATE_ON))
         self.DiscordActivity:tk.StringVar = tk.StringVar(value=config.get_str('BGST_DiscordActivity', default=DiscordActivity.BOTH))
+        self.EnableDiagnostics:tk.StringVar = tk.StringVar(value=config.get_str('BGST_EnableDiagnostics', default=CheckStates.STATE_OFF))
 
         # TODO: Legacy values, used to migrate initial state, remove in future version
         self.DiscordBGSWebhook:tk.StringVar = tk.StringVar(value=config.get_str('XDiscordWebhook', default=""))
@@ -49,6 +50,7 @@ class State:
         self.station_type:str = config.get_str('XStationType', default ="")
         self.discord_lang:str|None = config.get_str('BGST_DiscordLang', default="")
         self.discord_formatter:str|None = config.get_str('BGST_DiscordFormatter', default="")
+        self.saved_values:tuple = self._get_persistent_values()
 
         # Non-persistent values
         self.last_settlement_approached:dict = {}
@@ -77,13 +79,31 @@ class State:
         self.detailed_inf:bool = (self.DetailedInf.get() == CheckStates.STATE_ON)
         self.detailed_trade:bool = (self.DetailedTrade.get() == CheckStates.STATE_ON)
 
+        self.enable_diagnostics:bool = (self.EnableDiagnostics.get() == CheckStates.STATE_ON)
+
 
     def save(self):
         """
-        Save our state
+        Save our persistent values, if any have changed since they were last saved. Safe to call from any thread.
         """
+        # These are plain attributes, set directly from many places, so compare against what was last saved rather than
+        # tracking changes as they are made
+        values:tuple = self._get_persistent_values()
+        if values == self.saved_values: return
 
-        # UI preference fields
+        current_system_id, station_faction, station_type, discord_lang, discord_formatter = values
+        config.set('XCurrentSystemID', current_system_id)
+        config.set('XStationFaction', station_faction)
+        config.set('XStationType', station_type)
+        config.set('BGST_DiscordLang', discord_lang)
+        config.set('BGST_DiscordFormatter', discord_formatter)
+        self.saved_values = values
+
+
+    def save_prefs(self):
+        """
+        Save our UI preference fields. These are tk variables so this must only be called from the main thread.
+        """
         config.set('BGST_Status', self.Status.get())
         config.set('XShowZeroActivity', self.ShowZeroActivitySystems.get())
         config.set('XAbbreviate', self.AbbreviateFactionNames.get())
@@ -100,10 +120,15 @@ class State:
         config.set('BGST_DetailedInf', self.DetailedInf.get())
         config.set('BGST_DetailedTrade', self.DetailedTrade.get())
         config.set('BGST_DiscordActivity', self.DiscordActivity.get())
+        config.set('BGST_EnableDiagnostics', self.EnableDiagnostics.get())
 
-        # Persistent values
-        config.set('XCurrentSystemID', self.current_system_id if self.current_system_id != None else "")
-        config.set('XStationFaction', self.station_faction if self.station_faction != None else "")
-        config.set('XStationType', self.station_type if self.station_type != None else "")
-        config.set('BGST_DiscordLang', self.discord_lang if self.discord_lang != None else "")
-        config.set('BGST_DiscordFormatter', self.discord_formatter if self.discord_formatter != None else "")
+
+    def _get_persistent_values(self) -> tuple:
+        """
+        Get a snapshot of our persistent values, as they should be stored
+        """
+        return (self.current_system_id if self.current_system_id != None else "",
+                self.station_faction if self.station_faction != None else "",
+                self.station_type if self.station_type != None else "",
+                self.discord_lang if self.discord_lang != None else "",
+                self.discord_formatter if self.discord_formatter != None else "")
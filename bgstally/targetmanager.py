@@ -6,10 +6,11 @@ from datetime import datetime, timedelta
 
 from requests import Response
 
-from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, CmdrInteractionReason, RequestMethod
+from bgstally.constants import DATETIME_FORMAT_JOURNAL, FOLDER_OTHER_DATA, CmdrInteractionReason, RequestMethod, RequestPriority
 from bgstally.debug import Debug
+from bgstally.persistencemanager import PersistentStore
 from bgstally.requestmanager import BGSTallyRequest
-from bgstally.utils import _, __
+from bgstally.utils import _, __, write_json_file
 from thirdparty.colors import *
 
 FILENAME = "targetlog.json"
@@ -18,7 +19,7 @@ URL_INARA_API = "https://inara.cz/inapi/v1/"
 DATETIME_FORMAT_INARA = "%Y-%m-%dT%H:%M:%SZ"
 
 
-class TargetManager:
+class TargetManager(PersistentStore):
     """
     Handle a log of all targeted players
     """
@@ -45,13 +46,17 @@ class TargetManager:
                 Debug.logger.info(f"Unable to load {file}")
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save state to file
+        Save state to file, returning the number of bytes written
         """
+        if not self.dirty: return 0
+
+        version:int = self.version
         file = os.path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(self.targetlog, outfile)
+        bytes_written:int = write_json_file(file, self.targetlog)
+        self.mark_saved(version)
+        return bytes_written
 
 
     def get_targetlog(self):
@@ -107,7 +112,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending:self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -127,7 +132,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -151,7 +156,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -173,7 +178,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -201,7 +206,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
             cmdr_data, different, pending = self._fetch_cmdr_info(killer_name[5:], cmdr_data)
-            if different and not pending: self.targetlog.append(cmdr_data)
+            if different and not pending: self._add_target(cmdr_data)
             if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -224,7 +229,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -244,7 +249,7 @@ class TargetManager:
                     'Timestamp': journal_entry['timestamp']}
 
         cmdr_data, different, pending = self._fetch_cmdr_info(cmdr_name, cmdr_data)
-        if different and not pending: self.targetlog.append(cmdr_data)
+        if different and not pending: self._add_target(cmdr_data)
         if not pending: self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -344,7 +349,7 @@ class TargetManager:
             ]
         }
 
-        self.bgstally.request_manager.queue_request(URL_INARA_API, RequestMethod.POST, callback=self._inara_data_received, payload=payload, data=cmdr_data)
+        self.bgstally.request_manager.queue_request(URL_INARA_API, RequestMethod.POST, callback=self._inara_data_received, payload=payload, data=cmdr_data, priority=RequestPriority.BACKGROUND)
 
         return cmdr_data, True, True
 
@@ -368,7 +373,7 @@ class TargetManager:
 
         # In all cases (even Inara failure) add the CMDR to the cache and log because we will at least have in-game data for them
         self.cmdr_cache[cmdr_data['TargetName']] = cmdr_data
-        self.targetlog.append(cmdr_data)
+        self._add_target(cmdr_data)
         self.bgstally.ui.show_cmdr_report(cmdr_data)
 
 
@@ -380,3 +385,12 @@ class TargetManager:
             timedifference = datetime.utcnow() - datetime.strptime(target['Timestamp'], DATETIME_FORMAT_JOURNAL)
             if timedifference > timedelta(days = TIME_TARGET_LOG_EXPIRY_D):
                 self.targetlog.remove(target)
+                self.dirty = True
+
+
+    def _add_target(self, cmdr_data:dict):
+        """
+        Add a CMDR to the target log
+        """
+        self.targetlog.append(cmdr_data)
+        self.dirty = True
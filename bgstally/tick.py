@@ -1,63 +1,48 @@
 import hashlib
 from datetime import datetime, timedelta
 from secrets import token_hex
+from threading import RLock
 
-import plug
-import requests
-
-from bgstally.debug import Debug
-from bgstally.utils import _
+from bgstally.persistencemanager import PersistentStore
 from config import config
 
 DATETIME_FORMAT_TICK_DETECTOR = "%Y-%m-%dT%H:%M:%S.%fZ"
 DATETIME_FORMAT_DISPLAY = "%Y-%m-%d %H:%M:%S"
 TICKID_UNKNOWN = "unknown_tickid"
-URL_TICK_DETECTOR = "http://tick.infomancer.uk/galtick.json"
 
 
-class Tick:
+class Tick(PersistentStore):
     """
     Information about a tick
     """
 
     def __init__(self, bgstally, load: bool = False):
         self.bgstally = bgstally
+        self.lock: RLock = RLock() # Held while changing or reading stored data, as saves are made on the scheduler thread
         self.tick_id: str = TICKID_UNKNOWN
         self.tick_time: datetime = (datetime.utcnow() - timedelta(days = 30)) # Default to a tick a month old
         if load: self.load()
 
 
-    def fetch_tick(self):
-        """
-        Tick check and counter reset
-        """
-        try:
-            response = requests.get(URL_TICK_DETECTOR, timeout=10)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            Debug.logger.error(f"Unable to fetch latest tick from {URL_TICK_DETECTOR}: {str(e)}")
-            plug.show_error(_("{plugin_name} WARNING: Unable to fetch latest tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
-            return None
-        else:
-            tick_data: dict[str, str] = response.json()
-            tick_time_raw: str = tick_data.get('lastGalaxyTick')
-
-            if tick_time_raw is None:
-                Debug.logger.error(f"Invalid tick data from {URL_TICK_DETECTOR}: {tick_data}")
-                plug.show_error(_("{plugin_name} WARNING: Unable to fetch latest tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
-                return None
+    def tick_received(self, tick_time: datetime) -> bool:
+        """Latest tick time received from the tick detector
 
-            tick_time: datetime = datetime.strptime(tick_time_raw, DATETIME_FORMAT_TICK_DETECTOR)
+        Args:
+            tick_time (datetime): The tick time
 
-            if tick_time > self.tick_time:
-                # There is a newer tick
-                self.tick_time = tick_time
-                h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
-                self.tick_id = f"zoy-{h.hexdigest(10)}"
+        Returns:
+            bool: True if this is a newer tick than our current one
+        """
+        if tick_time <= self.tick_time: return False
 
-                return True
+        # There is a newer tick
+        with self.change():
+            self.tick_time = tick_time
+            h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
+            self.tick_id = f"zoy-{h.hexdigest(10)}"
+            self.dirty = True
 
-        return False
+        return True
 
 
     def force_tick(self):
@@ -65,9 +50,11 @@ class Tick:
         Force a new tick, user-initiated
         """
         # Set the tick time to the current datetime and generate a new 24-digit tick id prefixed with "frc-" to signify a forced tick
-        self.tick_time = datetime.now()
-        h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
-        self.tick_id = f"frc-{h.hexdigest(10)}"
+        with self.change():
+            self.tick_time = datetime.now()
+            h = hashlib.shake_128(self.get_formatted().encode("utf-8"), usedforsecurity=False)
+            self.tick_id = f"frc-{h.hexdigest(10)}"
+            self.dirty = True
 
 
     def load(self):
@@ -82,8 +69,16 @@ class Tick:
         """
         Save tick status to config
         """
-        config.set('XLastTick', self.tick_id)
-        config.set('XTickTime', self.tick_time.strftime(DATETIME_FORMAT_TICK_DETECTOR))
+        if not self.dirty: return
+
+        with self.lock:
+            version:int = self.version
+            tick_id:str = self.tick_id
+            tick_time:str = self.tick_time.strftime(DATETIME_FORMAT_TICK_DETECTOR)
+
+        config.set('XLastTick', tick_id)
+        config.set('XTickTime', tick_time)
+        self.mark_saved(version)
 
 
     def get_formatted(self, format: str = DATETIME_FORMAT_DISPLAY) -> str:
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from queue import Empty, Queue
+from threading import Lock
+from time import monotonic
+
+import plug
+from requests import Response
+
+from bgstally.constants import RequestMethod
+from bgstally.debug import Debug
+from bgstally.requestmanager import BGSTallyRequest
+from bgstally.tick import DATETIME_FORMAT_TICK_DETECTOR
+from bgstally.utils import _
+
+URL_TICK_DETECTOR = "http://tick.infomancer.uk/galtick.json"
+TIME_CACHE_TTL_S = 30           # A cached result younger than this is never refreshed, however often we are asked
+TIME_POLL_MIN_S = 60            # Polling period when a tick is due, overdue, or after an error
+TIME_POLL_MAX_S = 900           # Polling period when the next tick is a long way off
+TIME_POLL_WINDOW_S = 2 * 60 * 60 # How long before the predicted tick time we start polling at the minimum period
+TIME_FETCH_STALE_S = 120        # A fetch with no response after this long is assumed lost, and another is allowed
+EVENT_NEW_TICK = "<<BGSTallyNewTick>>"
+
+
+class TickDetector:
+    """
+    Scheduled job that watches the tick detector for new ticks. Polling is adaptive - it is infrequent just after a
+    tick and ramps up as the next predicted tick approaches. Requests are conditional, so an unchanged tick costs a 304.
+
+    New tick times are delivered to the main thread through a queue, which is drained by calling get_new_tick_time().
+    This never performs any I/O, so is safe to call from the journal and Tk threads.
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.etag:str|None = None
+        self.last_modified:str|None = None
+
+        # Cached result of the most recent successful fetch
+        self.lock:Lock = Lock()
+        self.tick_time:datetime|None = None
+        self.fetched:float|None = None
+        self.fetch_started:float|None = None # Set while a fetch is queued or in progress
+
+        self.tick_queue:Queue = Queue()
+
+        self.job = self.bgstally.scheduler.add_job("Tick Detector", self._poll)
+
+
+    def get_new_tick_time(self) -> datetime|None:
+        """Fetch the latest tick time detected since the last call. Does not perform any I/O.
+
+        Returns:
+            datetime | None: The most recent tick time detected, or None if there has been no new tick
+        """
+        tick_time:datetime|None = None
+
+        while True:
+            try:
+                queued_tick_time:datetime = self.tick_queue.get_nowait()
+            except Empty:
+                return tick_time
+
+            if tick_time is None or queued_tick_time > tick_time: tick_time = queued_tick_time
+
+
+    def get_cached_tick_time(self) -> datetime|None:
+        """Get the most recently fetched tick time, without performing any I/O
+
+        Returns:
+            datetime | None: The tick time, or None if we have not yet successfully fetched it
+        """
+        with self.lock:
+            return self.tick_time
+
+
+    def check_now(self):
+        """
+        Request a check for a new tick as soon as possible. This returns immediately, and the check is skipped if our
+        cached result is still fresh.
+        """
+        self.job.wake()
+
+
+    def _poll(self) -> float|None:
+        """Scheduled job. Make a conditional request for the latest tick, unless our cached result is still fresh.
+
+        Returns:
+            float | None: The delay until the next poll, or None if a fetch is in progress, which reschedules us when it completes
+        """
+        with self.lock:
+            now:float = monotonic()
+            if self.fetch_started is not None and now - self.fetch_started < TIME_FETCH_STALE_S: return None
+            if self.fetched is not None and now - self.fetched < TIME_CACHE_TTL_S: return self._get_poll_period()
+            self.fetch_started = now
+
+        headers:dict = {}
+        if self.etag is not None: headers['If-None-Match'] = self.etag
+        if self.last_modified is not None: headers['If-Modified-Since'] = self.last_modified
+
+        self.bgstally.request_manager.queue_request(URL_TICK_DETECTOR, RequestMethod.GET, headers=headers, callback=self._tick_received)
+        return None
+
+
+    def _tick_received(self, success:bool, response:Response, request:BGSTallyRequest):
+        """
+        The tick detector request has completed. Called on a request worker thread.
+        """
+        try:
+            success = self._process_response(success, response)
+        finally:
+            with self.lock: self.fetch_started = None
+            self.job.reschedule(self._get_poll_period() if success else TIME_POLL_MIN_S)
+
+
+    def _process_response(self, success:bool, response:Response) -> bool:
+        """Process the response to a tick detector request, and queue the tick if it is new
+
+        Returns:
+            bool: True if the request succeeded, whether or not the tick had changed
+        """
+        if not success:
+            Debug.logger.error(f"Unable to fetch latest tick from {URL_TICK_DETECTOR}")
+            plug.show_error(_("{plugin_name} WARNING: Unable to fetch latest tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
+            return False
+
+        if response.status_code == 304:
+            # Not modified since our last fetch
+            with self.lock: self.fetched = monotonic()
+            return True
+
+        try:
+            tick_data:dict[str, str] = response.json()
+            tick_time:datetime = datetime.strptime(tick_data['lastGalaxyTick'], DATETIME_FORMAT_TICK_DETECTOR)
+        except (ValueError, KeyError, TypeError):
+            Debug.logger.error(f"Invalid tick data from {URL_TICK_DETECTOR}: {response.text}")
+            plug.show_error(_("{plugin_name} WARNING: Unable to fetch latest tick").format(plugin_name=self.bgstally.plugin_name)) # LANG: Main window error message
+            return False
+
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+
+        with self.lock:
+            previous_tick_time:datetime|None = self.tick_time
+            self.tick_time = tick_time
+            self.fetched = monotonic()
+
+        if previous_tick_time is None or tick_time > previous_tick_time:
+            self.tick_queue.put(tick_time)
+            self._notify_main_thread()
+
+        return True
+
+
+    def _get_poll_period(self) -> float:
+        """Work out how long to wait until the next poll, based on when the next tick is predicted
+
+        Returns:
+            float: The number of seconds to wait
+        """
+        time_to_tick:timedelta = self.bgstally.tick.next_predicted() - datetime.utcnow()
+        time_to_window:float = time_to_tick.total_seconds() - TIME_POLL_WINDOW_S
+
+        # Inside the window or overdue, poll frequently. Otherwise wake up at the start of the window at the latest.
+        return min(max(time_to_window, TIME_POLL_MIN_S), TIME_POLL_MAX_S)
+
+
+    def _notify_main_thread(self):
+        """
+        Let the main thread know there is a new tick waiting in the queue. Must not touch the UI directly from this thread.
+        """
+        ui = getattr(self.bgstally, 'ui', None)
+        if ui is None or ui.frame is None:
+            # No UI yet. The tick stays queued and will be picked up by the next call to check_tick()
+            return
+
+        try:
+            ui.frame.event_generate(EVENT_NEW_TICK, when='tail')
+        except Exception as e:
+            Debug.logger.info(f"Unable to notify main thread of new tick", exc_info=e)
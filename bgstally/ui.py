@@ -2,11 +2,9 @@ import tkinter as tk
 from datetime import datetime, timedelta
 from functools import partial
 from os import path
-from threading import Thread
-from time import sleep
 from tkinter import PhotoImage, ttk
 from tkinter.messagebox import askyesno
-from typing import List, Optional
+from typing import List
 
 import myNotebook as nb
 from ttkHyperlinkLabel import HyperlinkLabel
@@ -15,14 +13,15 @@ import l10n
 from bgstally.activity import Activity
 from bgstally.constants import FOLDER_ASSETS, FONT_HEADING_2, FONT_SMALL, CheckStates, DiscordActivity, DiscordPostStyle, UpdateUIPolicy
 from bgstally.debug import Debug
+from bgstally.tickdetector import EVENT_NEW_TICK
 from bgstally.utils import _, available_langs, get_by_path
 from bgstally.widgets import EntryPlus
 from bgstally.windows.activity import WindowActivity
 from bgstally.windows.api import WindowAPI
 from bgstally.windows.cmdrs import WindowCMDRs
+from bgstally.windows.diagnostics import WindowDiagnostics
 from bgstally.windows.fleetcarrier import WindowFleetCarrier
 from bgstally.windows.legend import WindowLegend
-from config import config
 from thirdparty.tksheet import Sheet
 from thirdparty.Tooltip import ToolTip
 
@@ -63,21 +62,21 @@ class UI:
         self.window_cmdrs:WindowCMDRs = WindowCMDRs(self.bgstally)
         self.window_fc:WindowFleetCarrier = WindowFleetCarrier(self.bgstally)
         self.window_legend:WindowLegend = WindowLegend(self.bgstally)
+        self.window_diagnostics:WindowDiagnostics = WindowDiagnostics(self.bgstally)
         # TODO: When we support multiple APIs, this will no longer be a single instance window
         self.window_api:WindowAPI = WindowAPI(self.bgstally, self.bgstally.api_manager.apis[0])
 
         # Multi-instance windows
         self.window_activity:dict = {}
 
-        self.thread: Optional[Thread] = Thread(target=self._worker, name="BGSTally UI worker")
-        self.thread.daemon = True
-        self.thread.start()
+        self.overlay_job = self.bgstally.scheduler.add_job("UI Overlay", self._update_overlay)
 
 
     def shut_down(self):
         """
-        Shut down all worker threads.
+        Shut down all scheduled jobs.
         """
+        self.overlay_job.cancel()
 
 
     def get_plugin_frame(self, parent_frame: tk.Frame) -> tk.Frame:
@@ -116,6 +115,11 @@ class UI:
             self.btn_carrier: tk.Button = None
         current_row += 1
 
+        # New ticks are detected on a background thread, which notifies us via a virtual event. Also pick up any tick that
+        # was detected before we had a frame to notify.
+        self.frame.bind(EVENT_NEW_TICK, self._new_tick_detected)
+        self.frame.after_idle(self._new_tick_detected)
+
         return self.frame
 
 
@@ -266,6 +270,11 @@ class UI:
         nb.Label(frame, text=_("Integrations"), font=FONT_HEADING_2).grid(row=current_row, column=0, padx=10, sticky=tk.NW) # LANG: Preferences heading
         tk.Button(frame, text=_("Configure Remote Server"), command=partial(self._show_api_window, parent_frame)).grid(row=current_row, column=1, padx=10, sticky=tk.W); current_row += 1 # LANG: Preferences button label
 
+        ttk.Separator(frame, orient=tk.HORIZONTAL).grid(row=current_row, columnspan=2, padx=10, pady=1, sticky=tk.EW); current_row += 1
+        nb.Label(frame, text=_("Diagnostics"), font=FONT_HEADING_2).grid(row=current_row, column=0, padx=10, sticky=tk.NW) # LANG: Preferences heading
+        nb.Checkbutton(frame, text=_("Record Journal Event Timings"), variable=self.bgstally.state.EnableDiagnostics, onvalue=CheckStates.STATE_ON, offvalue=CheckStates.STATE_OFF, command=self.bgstally.state.refresh).grid(row=current_row, column=1, padx=10, sticky=tk.W); current_row += 1 # LANG: Preferences checkbox label
+        tk.Button(frame, text=_("Show Journal Event Timings"), command=self.window_diagnostics.show).grid(row=current_row, column=1, padx=10, sticky=tk.W); current_row += 1 # LANG: Preferences button label
+
         ttk.Separator(frame, orient=tk.HORIZONTAL).grid(row=current_row, columnspan=2, padx=10, pady=1, sticky=tk.EW); current_row += 1
         nb.Label(frame, text=_("Advanced"), font=FONT_HEADING_2).grid(row=current_row, column=0, padx=10, sticky=tk.NW) # LANG: Preferences heading
         tk.Button(frame, text=_("Force Tick"), command=self._confirm_force_tick, bg="red", fg="white").grid(row=current_row, column=1, padx=10, sticky=tk.W); current_row += 1 # LANG: Preferences button label
@@ -277,6 +286,7 @@ class UI:
         """
         Preferences frame has been saved (from EDMC core or any plugin)
         """
+        self.bgstally.state.save_prefs()
         self.update_plugin_frame()
 
 
@@ -350,82 +360,78 @@ class UI:
         self.bgstally.state.discord_formatter = formatters_by_name.get(self.formatter.get())
 
 
-    def _worker(self) -> None:
-        """
-        Handle thread work for overlay
-        """
-        Debug.logger.debug("Starting UI Worker...")
-
-        while True:
-            if config.shutting_down:
-                Debug.logger.debug("Shutting down UI Worker...")
-                return
-
-            current_activity:Activity = self.bgstally.activity_manager.get_current_activity()
-
-            # Current Tick Time
-            if self.bgstally.state.enable_overlay_current_tick:
-                self.bgstally.overlay.display_message("tick", _("Curr Tick:") + " " + self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY), True) # Overlay tick message
-
-            # Tick Warning
-            minutes_delta:int = int((datetime.utcnow() - self.bgstally.tick.next_predicted()) / timedelta(minutes=1))
-            if self.bgstally.state.enable_overlay_current_tick:
-                if datetime.utcnow() > self.bgstally.tick.next_predicted() + timedelta(minutes = TIME_TICK_ALERT_M):
-                    self.bgstally.overlay.display_message("tickwarn", _("Tick {minutes_delta}m Overdue (Estimated)").format(minutes_delta=minutes_delta), True) # Overlay tick message
-                elif datetime.utcnow() > self.bgstally.tick.next_predicted():
-                    self.bgstally.overlay.display_message("tickwarn", _("Past Estimated Tick Time"), True, text_colour_override="#FFA500") # Overlay tick message
-                elif datetime.utcnow() > self.bgstally.tick.next_predicted() - timedelta(minutes = TIME_TICK_ALERT_M):
-                    self.bgstally.overlay.display_message("tickwarn", _("Within {minutes_to_tick}m of Next Tick (Estimated)").format(minutes_to_tick=TIME_TICK_ALERT_M), True, text_colour_override="yellow") # Overlay tick message
-
-            # Activity Indicator
-            if self.bgstally.state.enable_overlay_activity and self.indicate_activity:
-                self.bgstally.overlay.display_indicator("indicator")
-                self.indicate_activity = False
-
-            # Thargoid War Progress Report
-            if self.bgstally.state.enable_overlay_tw_progress and current_activity is not None:
-                current_system:dict = current_activity.get_current_system()
-                if current_system and current_system.get('tw_status') is not None:
-                    progress:float = float(get_by_path(current_system, ['tw_status', 'WarProgress'], 0))
-                    percent:float = round(progress * 100, 2)
-
-                    self.bgstally.overlay.display_progress_bar("tw", _("TW War Progress in {current_system}: {percent}%").format(current_system=current_system.get('System', 'Unknown'), percent=percent), progress) # Overlay TW report message
-
-            # System Information
-            if self.bgstally.state.enable_overlay_system and current_activity is not None:
-                if self.report_system_address is not None:
-                    # Report recent activity in a designated system, overrides pinned systems
-                    report_system:dict = current_activity.get_system_by_address(self.report_system_address)
-                    if report_system is not None:
-                        self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, [report_system['System']], lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True)
-                    self.report_system_address = None
-                else:
-                    # Report pinned systems
-                    pinned_systems:list = current_activity.get_pinned_systems()
-                    if len(pinned_systems) == 1:
-                        self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True, ttl_override=TIME_WORKER_PERIOD_S + 2)
-                    elif len(pinned_systems) > 1:
-                        self.bgstally.overlay.display_message("system_info", _("Pinned Systems") + "\n" + self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True, ttl_override=TIME_WORKER_PERIOD_S + 2) # Overlay pinned systems message
-
-            # CMDR Information
-            if self.bgstally.state.enable_overlay_cmdr and self.report_cmdr_data is not None:
-                # Report recent interaction with a CMDR
-                display_text: str = self.bgstally.target_manager.get_human_readable_reason(self.report_cmdr_data.get('Reason', 0), False) + ": " + self.report_cmdr_data.get('TargetName', _("Unknown")) + "\n" # LANG: Overlay CMDR information report message
-                display_text += _("In system: {system}").format(system=self.report_cmdr_data.get('System', _("Unknown"))) + "  " # LANG: Overlay CMDR information report message
-                display_text += _("Squadron ID: {squadron}").format(squadron=self.report_cmdr_data.get('SquadronID', _("Unknown"))) + "\n" # LANG: Overlay CMDR information report message
-                display_text += _("In ship: {ship}").format(ship=self.report_cmdr_data.get('Ship', _("Unknown"))) + "  " # LANG: Overlay CMDR information report message
-                display_text += _("Legal status: {legal}").format(legal=self.report_cmdr_data.get('LegalStatus', _("Unknown"))) + "\n" # LANG: Overlay CMDR information report message
-                if 'ranks' in self.report_cmdr_data: display_text += _("INARA INFORMATION AVAILABLE") # LANG: Overlay CMDR information report message
-
-                self.bgstally.overlay.display_message("cmdr_info", display_text, fit_to_text=True, text_includes_title=True)
-                self.report_cmdr_data = None
-
-            # Warning
-            if self.bgstally.state.enable_overlay_warning and self.warning is not None:
-                self.bgstally.overlay.display_message("warning", self.warning, fit_to_text=True)
-                self.warning = None
-
-            sleep(TIME_WORKER_PERIOD_S)
+    def _update_overlay(self) -> float:
+        """Scheduled job. Update the in-game overlay. This only lays out the overlay messages, they are sent to EDMCOverlay
+        on the overlay's own thread, so the job never blocks on the overlay's socket.
+
+        Returns:
+            float: The number of seconds until the next update
+        """
+        current_activity:Activity = self.bgstally.activity_manager.get_current_activity()
+
+        # Current Tick Time
+        if self.bgstally.state.enable_overlay_current_tick:
+            self.bgstally.overlay.display_message("tick", _("Curr Tick:") + " " + self.bgstally.tick.get_formatted(DATETIME_FORMAT_OVERLAY), True) # Overlay tick message
+
+        # Tick Warning
+        minutes_delta:int = int((datetime.utcnow() - self.bgstally.tick.next_predicted()) / timedelta(minutes=1))
+        if self.bgstally.state.enable_overlay_current_tick:
+            if datetime.utcnow() > self.bgstally.tick.next_predicted() + timedelta(minutes = TIME_TICK_ALERT_M):
+                self.bgstally.overlay.display_message("tickwarn", _("Tick {minutes_delta}m Overdue (Estimated)").format(minutes_delta=minutes_delta), True) # Overlay tick message
+            elif datetime.utcnow() > self.bgstally.tick.next_predicted():
+                self.bgstally.overlay.display_message("tickwarn", _("Past Estimated Tick Time"), True, text_colour_override="#FFA500") # Overlay tick message
+            elif datetime.utcnow() > self.bgstally.tick.next_predicted() - timedelta(minutes = TIME_TICK_ALERT_M):
+                self.bgstally.overlay.display_message("tickwarn", _("Within {minutes_to_tick}m of Next Tick (Estimated)").format(minutes_to_tick=TIME_TICK_ALERT_M), True, text_colour_override="yellow") # Overlay tick message
+
+        # Activity Indicator
+        if self.bgstally.state.enable_overlay_activity and self.indicate_activity:
+            self.bgstally.overlay.display_indicator("indicator")
+            self.indicate_activity = False
+
+        # Thargoid War Progress Report
+        if self.bgstally.state.enable_overlay_tw_progress and current_activity is not None:
+            current_system:dict = current_activity.get_current_system()
+            if current_system and current_system.get('tw_status') is not None:
+                progress:float = float(get_by_path(current_system, ['tw_status', 'WarProgress'], 0))
+                percent:float = round(progress * 100, 2)
+
+                self.bgstally.overlay.display_progress_bar("tw", _("TW War Progress in {current_system}: {percent}%").format(current_system=current_system.get('System', 'Unknown'), percent=percent), progress) # Overlay TW report message
+
+        # System Information
+        if self.bgstally.state.enable_overlay_system and current_activity is not None:
+            if self.report_system_address is not None:
+                # Report recent activity in a designated system, overrides pinned systems
+                report_system:dict = current_activity.get_system_by_address(self.report_system_address)
+                if report_system is not None:
+                    self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, [report_system['System']], lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True)
+                self.report_system_address = None
+            else:
+                # Report pinned systems
+                pinned_systems:list = current_activity.get_pinned_systems()
+                if len(pinned_systems) == 1:
+                    self.bgstally.overlay.display_message("system_info", self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True, ttl_override=TIME_WORKER_PERIOD_S + 2)
+                elif len(pinned_systems) > 1:
+                    self.bgstally.overlay.display_message("system_info", _("Pinned Systems") + "\n" + self.bgstally.formatter_manager.get_default_formatter().get_overlay(current_activity, DiscordActivity.BOTH, pinned_systems, lang=self.bgstally.state.discord_lang), fit_to_text=True, text_includes_title=True, ttl_override=TIME_WORKER_PERIOD_S + 2) # Overlay pinned systems message
+
+        # CMDR Information
+        if self.bgstally.state.enable_overlay_cmdr and self.report_cmdr_data is not None:
+            # Report recent interaction with a CMDR
+            display_text: str = self.bgstally.target_manager.get_human_readable_reason(self.report_cmdr_data.get('Reason', 0), False) + ": " + self.report_cmdr_data.get('TargetName', _("Unknown")) + "\n" # LANG: Overlay CMDR information report message
+            display_text += _("In system: {system}").format(system=self.report_cmdr_data.get('System', _("Unknown"))) + "  " # LANG: Overlay CMDR information report message
+            display_text += _("Squadron ID: {squadron}").format(squadron=self.report_cmdr_data.get('SquadronID', _("Unknown"))) + "\n" # LANG: Overlay CMDR information report message
+            display_text += _("In ship: {ship}").format(ship=self.report_cmdr_data.get('Ship', _("Unknown"))) + "  " # LANG: Overlay CMDR information report message
+            display_text += _("Legal status: {legal}").format(legal=self.report_cmdr_data.get('LegalStatus', _("Unknown"))) + "\n" # LANG: Overlay CMDR information report message
+            if 'ranks' in self.report_cmdr_data: display_text += _("INARA INFORMATION AVAILABLE") # LANG: Overlay CMDR information report message
+
+            self.bgstally.overlay.display_message("cmdr_info", display_text, fit_to_text=True, text_includes_title=True)
+            self.report_cmdr_data = None
+
+        # Warning
+        if self.bgstally.state.enable_overlay_warning and self.warning is not None:
+            self.bgstally.overlay.display_message("warning", self.warning, fit_to_text=True)
+            self.warning = None
+
+        return TIME_WORKER_PERIOD_S
 
 
     def _previous_ticks_popup(self):
@@ -477,6 +483,13 @@ class UI:
         self.window_api.show(parent_frame)
 
 
+    def _new_tick_detected(self, event: tk.Event = None):
+        """
+        The tick detector has found a new tick
+        """
+        self.bgstally.check_tick(UpdateUIPolicy.IMMEDIATE)
+
+
     def _confirm_force_tick(self):
         """
         Force a tick when user clicks button
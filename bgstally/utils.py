@@ -1,4 +1,5 @@
 import functools
+import json
 from os import listdir
 from os.path import join
 
@@ -88,6 +89,37 @@ def get_by_path(dic: dict[str, any], keys: list[str], default: any = None) -> an
     return dic
 
 
+def write_json_file(filepath: str, data: any) -> int:
+    """Serialise data to JSON and write it to a file. The data is fully serialised before the file is opened, so a failure
+    during serialisation never leaves a truncated file behind.
+
+    Args:
+        filepath (str): The full path to the file
+        data (any): The data to serialise
+
+    Returns:
+        int: The number of bytes written
+    """
+    return write_json_text(filepath, json.dumps(data))
+
+
+def write_json_text(filepath: str, text: str) -> int:
+    """Write already serialised JSON to a file. Use this to serialise data while holding a lock, and write it afterwards.
+
+    Args:
+        filepath (str): The full path to the file
+        text (str): The serialised JSON
+
+    Returns:
+        int: The number of bytes written
+    """
+    with open(filepath, 'w') as outfile:
+        outfile.write(text)
+
+    # json.dumps() escapes all non-ASCII characters by default, so characters and bytes are equivalent
+    return len(text)
+
+
 def human_format(num: int) -> str:
     """Format a number into a shortened human-readable string, using abbreviations for larger values, e.g. 1300 -> 1.3K.
 
@@ -4,12 +4,14 @@ from secrets import token_hex
 
 from bgstally.constants import DiscordChannel, FOLDER_OTHER_DATA
 from bgstally.debug import Debug
+from bgstally.persistencemanager import PersistentStore
+from bgstally.utils import write_json_file
 from thirdparty.colors import *
 
 FILENAME = "webhooks.json"
 
 
-class WebhookManager:
+class WebhookManager(PersistentStore):
     """
     Handle the user's Discord webhooks
     """
@@ -54,15 +56,20 @@ class WebhookManager:
                          DiscordChannel.FLEETCARRIER_OPERATIONS: False, DiscordChannel.CMDR_INFORMATION: True}
                     ]
             }
+            self.dirty = True
 
 
-    def save(self):
+    def save(self) -> int:
         """
-        Save state to file
+        Save state to file, returning the number of bytes written
         """
+        if not self.dirty: return 0
+
+        version:int = self.version
         file = path.join(self.bgstally.plugin_dir, FOLDER_OTHER_DATA, FILENAME)
-        with open(file, 'w') as outfile:
-            json.dump(self._as_dict(), outfile)
+        bytes_written:int = write_json_file(file, self._as_dict())
+        self.mark_saved(version)
+        return bytes_written
 
 
     def set_webhooks_from_list(self, data: list):
@@ -73,10 +80,9 @@ class WebhookManager:
             data (list): A list containing the webhooks, each webhook being a list
         """
         self.data['webhooks'] = []
+        self.dirty = True
 
-        if data is None or data == []:
-            self.save()
-            return
+        if data is None or data == []: return
 
         for webhook in data:
             if len(webhook) == 8:
@@ -91,8 +97,6 @@ class WebhookManager:
                     DiscordChannel.CMDR_INFORMATION: webhook[7]
                 })
 
-        self.save()
-
 
     def get_webhooks_as_dict(self, channel:DiscordChannel|None = None) -> list:
         """
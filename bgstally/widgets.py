@@ -351,6 +351,9 @@ class TreeviewPlus(ttk.Treeview):
     def _sort_by_num(self, column, reverse):
         self._sort(column, reverse, int, self._sort_by_num)
 
+    def _sort_by_float(self, column, reverse):
+        self._sort(column, reverse, float, self._sort_by_float)
+
     def _sort_by_name(self, column, reverse):
         self._sort(column, reverse, str, self._sort_by_name)
 
@@ -7,7 +7,7 @@ from ttkHyperlinkLabel import HyperlinkLabel
 
 from bgstally.activity import STATES_WAR, Activity
 from bgstally.constants import (COLOUR_HEADING_1, FOLDER_ASSETS, FONT_HEADING_1, FONT_HEADING_2, FONT_TEXT, CheckStates, CZs, DiscordActivity, DiscordChannel,
-                                DiscordPostStyle)
+                                DiscordPostStyle, RequestPriority)
 from bgstally.debug import Debug
 from bgstally.formatters.base import BaseActivityFormatterInterface
 from bgstally.utils import _, __, human_format
@@ -393,18 +393,18 @@ class WindowActivity:
         if formatter.get_mode() == DiscordPostStyle.TEXT:
             if self.bgstally.state.DiscordActivity.get() != DiscordActivity.THARGOIDWAR:
                 discord_text: str = formatter.get_text(activity, DiscordActivity.BGS, lang=self.bgstally.state.discord_lang)
-                self.bgstally.discord.post_plaintext(discord_text, activity.discord_webhook_data, DiscordChannel.BGS, self.discord_post_complete)
+                self.bgstally.discord.post_plaintext(discord_text, activity.discord_webhook_data, DiscordChannel.BGS, self.discord_post_complete, RequestPriority.INTERACTIVE)
             if self.bgstally.state.DiscordActivity.get() != DiscordActivity.BGS:
                 discord_text = formatter.get_text(activity, DiscordActivity.THARGOIDWAR, lang=self.bgstally.state.discord_lang)
-                self.bgstally.discord.post_plaintext(discord_text, activity.discord_webhook_data, DiscordChannel.THARGOIDWAR, self.discord_post_complete)
+                self.bgstally.discord.post_plaintext(discord_text, activity.discord_webhook_data, DiscordChannel.THARGOIDWAR, self.discord_post_complete, RequestPriority.INTERACTIVE)
         else:
             description = "" if activity.discord_notes is None else activity.discord_notes
             if self.bgstally.state.DiscordActivity.get() != DiscordActivity.THARGOIDWAR:
                 discord_fields: dict = formatter.get_fields(activity, DiscordActivity.BGS, lang=self.bgstally.state.discord_lang)
-                self.bgstally.discord.post_embed(__("BGS Activity after Tick: {tick_time}", lang=self.bgstally.state.discord_lang).format(tick_time=activity.get_title(True)), description, discord_fields, activity.discord_webhook_data, DiscordChannel.BGS, self.discord_post_complete) # LANG: Discord post title
+                self.bgstally.discord.post_embed(__("BGS Activity after Tick: {tick_time}", lang=self.bgstally.state.discord_lang).format(tick_time=activity.get_title(True)), description, discord_fields, activity.discord_webhook_data, DiscordChannel.BGS, self.discord_post_complete, RequestPriority.INTERACTIVE) # LANG: Discord post title
             if self.bgstally.state.DiscordActivity.get() != DiscordActivity.BGS:
                 discord_fields = formatter.get_fields(activity, DiscordActivity.THARGOIDWAR, lang=self.bgstally.state.discord_lang)
-                self.bgstally.discord.post_embed(__("TW Activity after Tick: {tick_time}", lang=self.bgstally.state.discord_lang).format(tick_time=activity.get_title(True)), description, discord_fields, activity.discord_webhook_data, DiscordChannel.THARGOIDWAR, self.discord_post_complete) # LANG: Discord post title
+                self.bgstally.discord.post_embed(__("TW Activity after Tick: {tick_time}", lang=self.bgstally.state.discord_lang).format(tick_time=activity.get_title(True)), description, discord_fields, activity.discord_webhook_data, DiscordChannel.THARGOIDWAR, self.discord_post_complete, RequestPriority.INTERACTIVE) # LANG: Discord post title
 
         activity.dirty = True # Because discord post ID has been changed
 
@@ -425,9 +425,12 @@ class WindowActivity:
         uuid:str = webhook_data.get('uuid')
         if uuid is None: return
 
-        activity_webhook_data:dict = self.activity.discord_webhook_data.get(uuid, webhook_data) # Fetch current activity webhook data, default to data from callback.
-        activity_webhook_data[channel] = messageid                                              # Store the returned messageid against the channel
-        self.activity.discord_webhook_data[uuid] = activity_webhook_data                        # Store the webhook dict back to the activity
+        # Called on a request worker thread
+        with self.activity.change():
+            activity_webhook_data:dict = self.activity.discord_webhook_data.get(uuid, webhook_data) # Fetch current activity webhook data, default to data from callback.
+            activity_webhook_data[channel] = messageid                                              # Store the returned messageid against the channel
+            self.activity.discord_webhook_data[uuid] = activity_webhook_data                        # Store the webhook dict back to the activity
+            self.activity.dirty = True
 
 
     def _pin_overlay_change(self, chk_pin_to_overlay:ttk.Checkbutton, system:dict):
@@ -438,17 +441,21 @@ class WindowActivity:
             chk_pin_to_overlay (ttk.Checkbutton): The pin to overlay CheckButton
             system (dict): The system state dict
         """
-        system['PinToOverlay'] = CheckStates.STATE_ON if chk_pin_to_overlay.instate(['selected']) else CheckStates.STATE_OFF
+        with self.activity.change():
+            system['PinToOverlay'] = CheckStates.STATE_ON if chk_pin_to_overlay.instate(['selected']) else CheckStates.STATE_OFF
+            self.activity.dirty = True
 
 
     def _discord_notes_change(self, DiscordNotesText, activity: Activity, *args):
         """
         Callback when the user edits the Discord notes field
         """
-        activity.discord_notes = DiscordNotesText.get("1.0", "end-1c")
+        with activity.change():
+            activity.discord_notes = DiscordNotesText.get("1.0", "end-1c")
+            activity.dirty = True
+
         self._update_discord_field(activity)
         DiscordNotesText.edit_modified(False) # Ensures the <<Modified>> event is triggered next edit
-        activity.dirty = True
 
 
     def _option_change(self, activity: Activity):
@@ -464,46 +471,54 @@ class WindowActivity:
         """
         Callback for when a Faction Enable Checkbutton is changed
         """
-        faction['Enabled'] = CheckStates.STATE_ON if FactionEnableCheckbuttons[faction_index].instate(['selected']) else CheckStates.STATE_OFF
+        with activity.change():
+            faction['Enabled'] = CheckStates.STATE_ON if FactionEnableCheckbuttons[faction_index].instate(['selected']) else CheckStates.STATE_OFF
+            activity.system_changed(system['SystemAddress'])
+            activity.dirty = True
+
         self._update_enable_all_factions_checkbutton(notebook, tab_index, EnableAllCheckbutton, FactionEnableCheckbuttons, system)
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _enable_all_factions_change(self, notebook: ScrollableNotebook, tab_index: int, EnableAllCheckbutton, FactionEnableCheckbuttons, activity: Activity, system, *args):
         """
         Callback for when the Enable All Factions Checkbutton is changed
         """
-        x = 0
-        for faction in system['Factions'].values():
-            if EnableAllCheckbutton.instate(['selected']):
-                try:
-                    FactionEnableCheckbuttons[x].state(['selected'])
-                except:
-                    # Will happen if we're hiding BGS checkboxes in a TW system
-                    pass
-                faction['Enabled'] = CheckStates.STATE_ON
-            else:
-                try:
-                    FactionEnableCheckbuttons[x].state(['!selected'])
-                except:
-                    # Will happen if we're hiding BGS checkboxes in a TW system
-                    pass
-                faction['Enabled'] = CheckStates.STATE_OFF
-            x += 1
+        with activity.change():
+            x = 0
+            for faction in system['Factions'].values():
+                if EnableAllCheckbutton.instate(['selected']):
+                    try:
+                        FactionEnableCheckbuttons[x].state(['selected'])
+                    except:
+                        # Will happen if we're hiding BGS checkboxes in a TW system
+                        pass
+                    faction['Enabled'] = CheckStates.STATE_ON
+                else:
+                    try:
+                        FactionEnableCheckbuttons[x].state(['!selected'])
+                    except:
+                        # Will happen if we're hiding BGS checkboxes in a TW system
+                        pass
+                    faction['Enabled'] = CheckStates.STATE_OFF
+                x += 1
+
+            activity.system_changed(system['SystemAddress'])
+            activity.dirty = True
 
         self._update_tab_image(notebook, tab_index, EnableAllCheckbutton, system)
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _enable_settlement_change(self, SettlementCheckbutton, settlement_name, activity: Activity, faction, faction_index, *args):
         """
         Callback for when a Settlement Enable Checkbutton is changed
         """
-        faction['GroundCZSettlements'][settlement_name]['enabled'] = CheckStates.STATE_ON if SettlementCheckbutton.instate(['selected']) else CheckStates.STATE_OFF
+        with activity.change():
+            faction['GroundCZSettlements'][settlement_name]['enabled'] = CheckStates.STATE_ON if SettlementCheckbutton.instate(['selected']) else CheckStates.STATE_OFF
+            activity.dirty = True
+
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _update_enable_all_factions_checkbutton(self, notebook: ScrollableNotebook, tab_index: int, EnableAllCheckbutton, FactionEnableCheckbuttons, system):
@@ -550,50 +565,54 @@ class WindowActivity:
         """
         Callback (set as a variable trace) for when a CZ Variable is changed
         """
-        if cz_type == CZs.SPACE_LOW:
-            faction['SpaceCZ']['l'] = CZVar.get()
-        elif cz_type == CZs.SPACE_MED:
-            faction['SpaceCZ']['m'] = CZVar.get()
-        elif cz_type == CZs.SPACE_HIGH:
-            faction['SpaceCZ']['h'] = CZVar.get()
-        elif cz_type == CZs.GROUND_LOW:
-            faction['GroundCZ']['l'] = CZVar.get()
-        elif cz_type == CZs.GROUND_MED:
-            faction['GroundCZ']['m'] = CZVar.get()
-        elif cz_type == CZs.GROUND_HIGH:
-            faction['GroundCZ']['h'] = CZVar.get()
-
-        activity.recalculate_zero_activity()
+        with activity.change():
+            if cz_type == CZs.SPACE_LOW:
+                faction['SpaceCZ']['l'] = CZVar.get()
+            elif cz_type == CZs.SPACE_MED:
+                faction['SpaceCZ']['m'] = CZVar.get()
+            elif cz_type == CZs.SPACE_HIGH:
+                faction['SpaceCZ']['h'] = CZVar.get()
+            elif cz_type == CZs.GROUND_LOW:
+                faction['GroundCZ']['l'] = CZVar.get()
+            elif cz_type == CZs.GROUND_MED:
+                faction['GroundCZ']['m'] = CZVar.get()
+            elif cz_type == CZs.GROUND_HIGH:
+                faction['GroundCZ']['h'] = CZVar.get()
+
+            activity.system_changed(system['SystemAddress'])
+            activity.recalculate_zero_activity()
+            activity.dirty = True
+
         self._update_tab_image(notebook, tab_index, EnableAllCheckbutton, system)
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _mission_points_change(self, notebook: ScrollableNotebook, tab_index: int, MissionPointsVar: tk.IntVar, primary, EnableAllCheckbutton, activity: Activity, system, faction, faction_index, *args):
         """
         Callback (set as a variable trace) for when a mission points Variable is changed
         """
-        if primary:
-            faction['MissionPoints']['m'] = MissionPointsVar.get()
-        else:
-            faction['MissionPointsSecondary']['m'] = MissionPointsVar.get()
+        with activity.change():
+            activity.set_manual_mission_points(faction, MissionPointsVar.get(), primary)
+            activity.system_changed(system['SystemAddress'])
+            activity.recalculate_zero_activity()
+            activity.dirty = True
 
-        activity.recalculate_zero_activity()
         self._update_tab_image(notebook, tab_index, EnableAllCheckbutton, system)
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _scenarios_change(self, notebook: ScrollableNotebook, tab_index: int, ScenariosVar: tk.IntVar, EnableAllCheckbutton, activity: Activity, system, faction, faction_index, *args):
         """
         Callback (set as a variable trace) for when the scenarios Variable is changed
         """
-        faction['Scenarios'] = ScenariosVar.get()
+        with activity.change():
+            faction['Scenarios'] = ScenariosVar.get()
+            activity.system_changed(system['SystemAddress'])
+            activity.recalculate_zero_activity()
+            activity.dirty = True
 
-        activity.recalculate_zero_activity()
         self._update_tab_image(notebook, tab_index, EnableAllCheckbutton, system)
         self._update_discord_field(activity)
-        activity.dirty = True
 
 
     def _update_tab_image(self, notebook: ScrollableNotebook, tab_index: int, EnableAllCheckbutton, system: dict):
@@ -165,6 +165,7 @@ class WindowAPI:
         self.api.key = self.entry_apikey.get()
         self.api.activities_enabled = self.cb_apiactivities.instate(['selected'])
         self.api.events_enabled = self.cb_apievents.instate(['selected'])
+        self.bgstally.api_manager.api_changed()
         self._update()
 
 
@@ -240,6 +241,7 @@ class WindowAPI:
         User has clicked the approve button
         """
         self.api.user_approved = True
+        self.bgstally.api_manager.api_changed()
         self._update()
         self.toplevel.after(1000, partial(self.toplevel.destroy))
 
@@ -253,5 +255,6 @@ class WindowAPI:
         User has clicked the don't approve button
         """
         self.api.user_approved = False
+        self.bgstally.api_manager.api_changed()
         self._update()
         self.toplevel.after(1000, partial(self.toplevel.destroy))
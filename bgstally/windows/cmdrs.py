@@ -6,7 +6,7 @@ from urllib.parse import quote
 
 from ttkHyperlinkLabel import HyperlinkLabel
 
-from bgstally.constants import COLOUR_HEADING_1, DATETIME_FORMAT_JOURNAL, FONT_HEADING_1, FONT_HEADING_2, DiscordChannel
+from bgstally.constants import COLOUR_HEADING_1, DATETIME_FORMAT_JOURNAL, FONT_HEADING_1, FONT_HEADING_2, DiscordChannel, RequestPriority
 from bgstally.debug import Debug
 from bgstally.utils import _, __
 from bgstally.widgets import TreeviewPlus
@@ -224,7 +224,7 @@ class WindowCMDRs:
         fields: list = self._get_cmdr_as_discord_fields(self.selected_cmdr)
         description: str = f"```ansi\n{self.bgstally.target_manager.get_human_readable_reason(self.selected_cmdr.get('Reason'), True)}\n```"
 
-        self.bgstally.discord.post_embed(f"CMDR {self.selected_cmdr.get('TargetName')}", description, fields, None, DiscordChannel.CMDR_INFORMATION, None)
+        self.bgstally.discord.post_embed(f"CMDR {self.selected_cmdr.get('TargetName')}", description, fields, None, DiscordChannel.CMDR_INFORMATION, None, RequestPriority.INTERACTIVE)
 
 
     def _post_multiple_CMDRs_to_discord(self):
@@ -242,7 +242,7 @@ class WindowCMDRs:
                 if int(cmdr['index']) == int(selected_iid):
                     text += self._get_cmdr_as_text(cmdr) + "\n"
 
-        self.bgstally.discord.post_plaintext(text, None, DiscordChannel.CMDR_INFORMATION, None)
+        self.bgstally.discord.post_plaintext(text, None, DiscordChannel.CMDR_INFORMATION, None, RequestPriority.INTERACTIVE)
 
 
     def _get_cmdr_as_discord_fields(self, cmdr_info: dict) -> list:
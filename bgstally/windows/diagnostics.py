@@ -0,0 +1,118 @@
+import tkinter as tk
+from functools import partial
+from tkinter import ttk
+from tkinter.messagebox import showerror, showinfo
+
+from bgstally.constants import COLOUR_HEADING_1, FONT_HEADING_1
+from bgstally.debug import Debug
+from bgstally.utils import _
+from bgstally.widgets import TreeviewPlus
+
+
+class WindowDiagnostics:
+    """
+    Handles a window showing how long each type of journal event takes to process
+    """
+
+    def __init__(self, bgstally):
+        self.bgstally = bgstally
+
+        self.toplevel:tk.Toplevel = None
+
+
+    def show(self):
+        """
+        Show the window
+        """
+        if self.toplevel is not None and self.toplevel.winfo_exists():
+            self.toplevel.lift()
+            return
+
+        self.toplevel = tk.Toplevel(self.bgstally.ui.frame)
+        self.toplevel.title(_("{plugin_name} - Journal Event Timings").format(plugin_name=self.bgstally.plugin_name)) # LANG: Diagnostics window title
+        self.toplevel.iconphoto(False, self.bgstally.ui.image_logo_bgstally_32, self.bgstally.ui.image_logo_bgstally_16)
+        self.toplevel.geometry("900x500")
+        self.toplevel.minsize(600, 300)
+
+        container_frame:ttk.Frame = ttk.Frame(self.toplevel)
+        container_frame.pack(fill=tk.BOTH, expand=1)
+
+        ttk.Label(container_frame, text=_("Journal Event Timings"), font=FONT_HEADING_1, foreground=COLOUR_HEADING_1).pack(anchor=tk.W, padx=5, pady=[5, 0]) # LANG: Heading on diagnostics window
+        self.label_status:ttk.Label = ttk.Label(container_frame, text="")
+        self.label_status.pack(anchor=tk.W, padx=5)
+
+        list_frame:ttk.Frame = ttk.Frame(container_frame)
+        list_frame.pack(fill=tk.BOTH, padx=5, pady=5, expand=1)
+
+        buttons_frame:ttk.Frame = ttk.Frame(container_frame)
+        buttons_frame.pack(fill=tk.X, padx=5, pady=5, side=tk.BOTTOM)
+
+        column_info = [{'title': _("Event"), 'type': "name", 'align': tk.W, 'stretch': tk.YES, 'width': 200}, # LANG: Diagnostics window column title
+                       {'title': _("Count"), 'type': "num", 'align': tk.E, 'stretch': tk.NO, 'width': 70}, # LANG: Diagnostics window column title
+                       {'title': _("Total (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}, # LANG: Diagnostics window column title
+                       {'title': _("Mean (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}, # LANG: Diagnostics window column title
+                       {'title': _("Max (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}, # LANG: Diagnostics window column title
+                       {'title': _("Tick (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}, # LANG: Diagnostics window column title
+                       {'title': _("Save (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}, # LANG: Diagnostics window column title
+                       {'title': _("API (ms)"), 'type': "float", 'align': tk.E, 'stretch': tk.NO, 'width': 90}] # LANG: Diagnostics window column title
+
+        self.treeview:TreeviewPlus = TreeviewPlus(list_frame, columns=[d['title'] for d in column_info], show="headings", callback=None, datetime_format=None)
+        vsb:tk.Scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.treeview.yview)
+        vsb.pack(fill=tk.Y, side=tk.RIGHT)
+        self.treeview.configure(yscrollcommand=vsb.set)
+        self.treeview.pack(fill=tk.BOTH, expand=1)
+
+        for column in column_info:
+            self.treeview.heading(column['title'], text=column['title'], sort_by=column['type'])
+            self.treeview.column(column['title'], anchor=column['align'], stretch=column['stretch'], width=column['width'])
+
+        tk.Button(buttons_frame, text=_("Refresh"), command=self._refresh).pack(side=tk.LEFT, padx=5, pady=5) # LANG: Button on diagnostics window
+        tk.Button(buttons_frame, text=_("Reset"), command=self._reset).pack(side=tk.LEFT, padx=5, pady=5) # LANG: Button on diagnostics window
+        tk.Button(buttons_frame, text=_("Save to File"), command=partial(self._save, self.toplevel)).pack(side=tk.RIGHT, padx=5, pady=5) # LANG: Button on diagnostics window
+
+        self._refresh()
+
+
+    def _refresh(self):
+        """
+        Reload the timings into the table, slowest event types first
+        """
+        self.treeview.delete(*self.treeview.get_children())
+
+        stats:dict[str, dict] = self.bgstally.journal_profiler.get_stats()
+        for event_name, event_stats in sorted(stats.items(), key=lambda item: item[1]['total_s'], reverse=True):
+            self.treeview.insert("", 'end', values=[event_name,
+                                                    event_stats['count'],
+                                                    f"{event_stats['total_s'] * 1000:.1f}",
+                                                    f"{event_stats['total_s'] * 1000 / event_stats['count']:.3f}",
+                                                    f"{event_stats['max_s'] * 1000:.3f}",
+                                                    f"{event_stats['tick_s'] * 1000:.1f}",
+                                                    f"{event_stats['save_s'] * 1000:.1f}",
+                                                    f"{event_stats['api_s'] * 1000:.1f}"])
+
+        if self.bgstally.state.enable_diagnostics:
+            self.label_status['text'] = _("Timings recorded since {date_time} (game)").format(date_time=self.bgstally.journal_profiler.since) # LANG: Label on diagnostics window
+        else:
+            self.label_status['text'] = _("Recording is off. Turn on 'Record Journal Event Timings' in preferences to collect timings.") # LANG: Label on diagnostics window
+
+
+    def _reset(self):
+        """
+        Clear all recorded timings
+        """
+        self.bgstally.journal_profiler.reset()
+        self._refresh()
+
+
+    def _save(self, parent:tk.Toplevel):
+        """
+        Save the recorded timings to a file, and tell the user where it is
+        """
+        try:
+            file:str = self.bgstally.journal_profiler.save()
+        except OSError as e:
+            Debug.logger.warning(f"Unable to save journal event timings", exc_info=e)
+            showerror(title=_("Save Failed"), message=str(e), parent=parent) # LANG: Diagnostics window message title
+            return
+
+        showinfo(title=_("Timings Saved"), message=_("Journal event timings saved to {file}").format(file=file), parent=parent) # LANG: Diagnostics window message
@@ -0,0 +1,9 @@
+"""
+Shared pytest setup. The tests run BGS-Tally outside EDMC, using the EDMC stand-in modules from the benchmarks folder.
+"""
+import sys
+from os import path
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), "benchmarks"))
+
+import benchutils # Makes the plugin and the EDMC stand-in modules importable
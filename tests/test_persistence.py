@@ -0,0 +1,180 @@
+"""
+Tests of when plugin data is saved. Most check that journal events which don't change any persisted data never cause a
+file write, running journal streams through BGSTally.journal_entry() with all the real data stores, and stand-ins for the
+UI, network and tick detector.
+"""
+import builtins
+from os import mkdir, path, symlink
+from types import SimpleNamespace
+
+import pytest
+import semantic_version
+
+from bgstally.activitymanager import ActivityManager
+from bgstally.apimanager import APIManager
+from bgstally.bgstally import BGSTally
+from bgstally.constants import FOLDER_DATA, FOLDER_OTHER_DATA
+from bgstally.fleetcarrier import FleetCarrier
+from bgstally.journaldispatcher import JournalDispatcher
+from bgstally.missionlog import MissionLog
+from bgstally.persistencemanager import PersistenceManager
+from bgstally.scheduler import Scheduler
+from bgstally.state import State
+from bgstally.targetmanager import TargetManager
+from bgstally.tick import Tick
+from bgstally.webhookmanager import WebhookManager
+from config import config
+from journalgen import JournalGenerator
+
+import benchutils
+
+CMDR = "Test Cmdr"
+GAME_STATE = {'Odyssey': True}
+STORES = ['mission_log', 'target_manager', 'tick', 'activity_manager', 'state', 'fleet_carrier', 'api_manager', 'webhook_manager']
+
+
+class StringVar:
+    """
+    Stand-in for tk.StringVar, which needs a Tk root window
+    """
+    def __init__(self, value:str = ""):
+        self.value:str = value
+
+    def get(self) -> str:
+        return self.value
+
+    def set(self, value:str):
+        self.value = value
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    """
+    A BGSTally object with all the real data stores, saving to a temporary folder
+    """
+    monkeypatch.setattr("bgstally.state.tk.StringVar", StringVar)
+    monkeypatch.setattr(config, 'values', {'XLastTick': "test-tick"})
+    mkdir(path.join(tmp_path, FOLDER_OTHER_DATA))
+    symlink(path.join(benchutils.PLUGIN_DIR, FOLDER_DATA), path.join(tmp_path, FOLDER_DATA))
+
+    stand_ins:SimpleNamespace = benchutils.make_bgstally()
+
+    plugin:BGSTally = BGSTally(stand_ins.plugin_name, semantic_version.Version("0.0.0-test"))
+    plugin.plugin_dir = str(tmp_path)
+    plugin.ui = stand_ins.ui
+    plugin.config = SimpleNamespace(apikey_inara=lambda: None, requests=lambda: {})
+    plugin.request_manager = SimpleNamespace(queue_request=lambda *args, **kwargs: None, url_valid=lambda url: False)
+    plugin.market = SimpleNamespace(available=lambda market_id: False, load=lambda: None)
+    plugin.tick_detector = SimpleNamespace(check_now=lambda: None, get_new_tick_time=lambda: None)
+
+    plugin.scheduler = Scheduler(plugin)
+    plugin.state = State(plugin)
+    plugin.mission_log = MissionLog(plugin)
+    plugin.target_manager = TargetManager(plugin)
+    plugin.tick = Tick(plugin, True)
+    plugin.activity_manager = ActivityManager(plugin)
+    plugin.fleet_carrier = FleetCarrier(plugin)
+    plugin.api_manager = APIManager(plugin)
+    plugin.webhook_manager = WebhookManager(plugin)
+    plugin.persistence_manager = PersistenceManager(plugin)
+    plugin.journal_dispatcher = JournalDispatcher(plugin)
+
+    yield plugin
+
+    plugin.scheduler.shut_down()
+
+
+@pytest.fixture
+def writes(monkeypatch) -> list:
+    """
+    Record every file opened for writing and every config value set. Each entry is the file path or config key.
+    """
+    writes:list = []
+    real_open = builtins.open
+
+    def recording_open(file, mode:str = 'r', *args, **kwargs):
+        if any(c in mode for c in "wax+"): writes.append(file)
+        return real_open(file, mode, *args, **kwargs)
+
+    def recording_set(key:str, value):
+        writes.append(key)
+        config.values[key] = value
+
+    monkeypatch.setattr(builtins, 'open', recording_open)
+    monkeypatch.setattr(config, 'set', recording_set)
+    return writes
+
+
+def feed(plugin:BGSTally, generator:JournalGenerator, events:list[dict]):
+    """
+    Pass journal events to the plugin, as EDMC would
+    """
+    for event in events:
+        plugin.journal_entry(CMDR, False, generator.system['StarSystem'], None, event, GAME_STATE)
+
+
+def populate(plugin:BGSTally, generator:JournalGenerator):
+    """
+    Record some activity in every store that journal events change, then save it all
+    """
+    events:list[dict] = [generator.fsd_jump(), generator.docked()]
+    events += [generator.mission_accepted() for _ in range(3)]
+    events += [generator.market_sell(), generator.ship_targeted(), generator.bounty()]
+    while (event := generator.mission_completed()) is not None: events.append(event)
+
+    feed(plugin, generator, events)
+    plugin.persistence_manager.flush()
+
+
+def non_mutating_events(generator:JournalGenerator) -> list[dict]:
+    """
+    Journal events that don't change any persisted data: events with no handler, and events whose handlers only update
+    transient state or make no change
+    """
+    return [generator._event('Music', {'MusicTrack': "Supercruise"}),
+            generator._event('FSSSignalDiscovered', {'SignalName': "Test Signal", 'SystemAddress': generator.system['SystemAddress']}),
+            generator._event('ReceiveText', {'From': "Test NPC", 'Message': "Hello", 'Channel': "npc"}),
+            generator._event('Cargo', {'Vessel': "Ship", 'Count': 4}),
+            generator.bounty(), # Bounty vouchers are only recorded when they are redeemed
+            generator._event('SupercruiseEntry', {'StarSystem': generator.system['StarSystem']})]
+
+
+def test_non_mutating_events_write_nothing(plugin, writes):
+    generator:JournalGenerator = JournalGenerator(10)
+    populate(plugin, generator)
+    writes.clear()
+
+    feed(plugin, generator, non_mutating_events(generator))
+
+    saved:dict = {store: getattr(plugin, store).save() for store in STORES}
+    assert all(not bytes_written for bytes_written in saved.values()), saved
+
+    plugin.persistence_manager.flush()
+    assert writes == []
+    assert plugin.persistence_manager.get_stats()['bytes_written'] > 0 # Only from populating
+
+
+def test_mutating_event_writes_only_its_store(plugin, writes):
+    generator:JournalGenerator = JournalGenerator(10)
+    populate(plugin, generator)
+    writes.clear()
+
+    feed(plugin, generator, [generator.market_sell()])
+
+    saved:dict = {store: getattr(plugin, store).save() for store in STORES}
+    assert saved['activity_manager'] > 0
+    assert all(not bytes_written for store, bytes_written in saved.items() if store != 'activity_manager'), saved
+
+
+def test_version_bumped_once_change_completes(plugin):
+    activity = plugin.activity_manager.get_current_activity()
+    version:int = activity.version
+
+    with activity.change():
+        activity.dirty = True
+        with activity.change():
+            activity.dirty = True
+        assert activity.version == version # A save now would be of part-changed data, so mustn't look up to date
+
+    assert activity.version == version + 1
+    assert activity.dirty